@@ -1,12 +1,15 @@
 from fastapi import FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from typing import Optional, List
+from contextlib import asynccontextmanager
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.slice_manager.models import SliceCreate, Slice, VM, TopologyType
 from core.slice_manager.manager import SliceManager
+from core.warmup import Warmup
 from pydantic import BaseModel
 
 # Modelos Pydantic para API
@@ -18,11 +21,30 @@ class SlicesListResponse(BaseModel):
     slices: List[dict]
     total: int
 
+# Instancia del manager (se crea en segundo plano al arrancar, ver lifespan)
+slice_manager: Optional[SliceManager] = None
+
+def init_services():
+    global slice_manager
+    slice_manager = SliceManager()
+
+warmup = Warmup("Local Dev", init_services)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Abre la base en segundo plano: /api/health responde enseguida, /api/ready cuando termina"""
+    warmup.start()
+    yield
+    warmup.wait()
+    if slice_manager is not None:
+        slice_manager.flush()
+
 # Configuración de FastAPI
 app = FastAPI(
     title="PUCP Cloud Orchestrator - Local Dev",
     description="Backend local solo para desarrollo",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS
@@ -34,9 +56,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Instancia del manager
-slice_manager = SliceManager()
-
 @app.get("/")
 async def root():
     return {
@@ -47,7 +66,16 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "service": "Local Dev"}
+    return {"status": "healthy" if warmup.ready else "starting", "service": "Local Dev",
+            "startup": warmup.status()}
+
+@app.get("/api/ready")
+async def readiness_check():
+    """200 cuando el manager terminó de abrir la base; 503 mientras tanto"""
+    body = {"service": "Local Dev", **warmup.status()}
+    if not warmup.ready:
+        return JSONResponse(body, status_code=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"})
+    return body
 
 # Servidor
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+"""
+Mide la memoria por slice y el costo de to_dict() de los modelos VM/Slice,
+comparando los modelos con __slots__ contra las mismas dataclasses sin slots
+(la representación anterior, basada en __dict__ y asdict()).
+
+Uso:
+    python bin/bench_memoria_modelos.py [--slices 2000] [--vms 8]
+"""
+
+import argparse
+import dataclasses
+import os
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.slice_manager.models import VM, Slice
+
+
+def _sin_slots(cls, metodos):
+    """Reconstruye la dataclass con los mismos campos pero sin __slots__"""
+    campos = [(f.name, f.type, dataclasses.field(default=f.default, default_factory=f.default_factory))
+              for f in dataclasses.fields(cls)]
+    return dataclasses.make_dataclass(cls.__name__, campos, namespace=metodos)
+
+
+LegacyVM = _sin_slots(VM, {'to_dict': lambda self: dataclasses.asdict(self)})
+LegacySlice = _sin_slots(Slice, {'to_dict': Slice.to_dict})
+
+
+def _crear_slices(vm_cls, slice_cls, cantidad: int, vms_por_slice: int) -> list:
+    slices = []
+    for i in range(cantidad):
+        vms = [vm_cls(id=f"vm{j + 1}", name=f"vm{j + 1}", cpu=1, memory=512, disk=1,
+                      flavor="f1", conexion_remota="no", imagen="cirros")
+               for j in range(vms_por_slice)]
+        slices.append(slice_cls(id=f"slice_{i + 1}", name=f"slice_{i + 1}", topology="lineal",
+                                vms=vms, owner=f"usuario{i % 50}", created_at=datetime.now(),
+                                status="activa", salida_internet="no"))
+    return slices
+
+
+def _medir(vm_cls, slice_cls, cantidad: int, vms_por_slice: int):
+    tracemalloc.start()
+    slices = _crear_slices(vm_cls, slice_cls, cantidad, vms_por_slice)
+    usado, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    muestra = slices[:200]
+    segundos = min(timeit.repeat(lambda: [s.to_dict() for s in muestra], number=5, repeat=3))
+    return usado / cantidad, segundos / (5 * len(muestra)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memoria de los modelos de slices")
+    parser.add_argument('--slices', type=int, default=2000, help="Cantidad de slices a crear")
+    parser.add_argument('--vms', type=int, default=8, help="VMs por slice")
+    args = parser.parse_args()
+
+    antes_bytes, antes_us = _medir(LegacyVM, LegacySlice, args.slices, args.vms)
+    despues_bytes, despues_us = _medir(VM, Slice, args.slices, args.vms)
+
+    print(f"{args.slices} slices x {args.vms} VMs")
+    print(f"{'':12}{'bytes/slice':>14}{'to_dict (us)':>16}")
+    print(f"{'sin slots':12}{antes_bytes:>14.0f}{antes_us:>16.1f}")
+    print(f"{'con slots':12}{despues_bytes:>14.0f}{despues_us:>16.1f}")
+    print(f"Ahorro de memoria: {100 * (1 - despues_bytes / antes_bytes):.1f}%  "
+          f"to_dict: {antes_us / despues_us:.1f}x más rápido")
+
+
+if __name__ == "__main__":
+    main()
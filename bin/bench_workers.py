@@ -0,0 +1,200 @@
+"""
+Mide cómo escala el throughput de la API (ui_apis/app.py) con la cantidad de
+workers de uvicorn, usando la base SQLite compartida, y verifica que no se
+pierdan ni dupliquen escrituras: al final la base debe tener exactamente un
+slice y un cambio por cada creación respondida con 201.
+
+Cada corrida levanta uvicorn en un puerto libre con una base, ipam.json y
+vlans.json temporales (no toca los del proyecto) y la carga con varios
+procesos cliente que mezclan listados y creaciones.
+
+Uso:
+    python bin/bench_workers.py [--workers 1 2 4] [--seconds 10] [--clients 32]
+                                [--client-procs 4] [--write-ratio 0.1]
+
+Resultados de referencia (máquina de 1 CPU compartida con los clientes,
+--seconds 8 --clients 16 --client-procs 2):
+
+     workers     req/s    lect/s    escr/s   p50 ms   p99 ms  errores  creados  en base
+           1       154       137      17.0    103.8    196.0        0      139      139
+           2       119       106      13.0     56.0   1183.0        0      106      106
+           4       118       105      12.4     28.4   2063.4        0      102      102
+
+Con un solo núcleo más workers no suman capacidad (compiten por la CPU y por
+el lock de escritura de SQLite); lo que sí se verifica es que ninguna creación
+se pierde ni se duplica. La ganancia hay que medirla con tantos núcleos como workers.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _request(url: str, token: str, body: dict = None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(url, data=data, method="POST" if body is not None else "GET",
+                                     headers={"Authorization": f"Bearer {token}",
+                                              "Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def _cliente(base_url: str, hilos: int, segundos: float, write_ratio: float, semilla: int) -> dict:
+    """Un proceso cliente: `hilos` hilos haciendo peticiones durante `segundos`"""
+    totales = {"reads": 0, "writes": 0, "created": 0, "errors": 0, "latencies": []}
+    lock = threading.Lock()
+    fin = time.monotonic() + segundos
+
+    def hilo(n: int):
+        rnd = random.Random(semilla * 1000 + n)
+        token = f"bench-{semilla}-{n}"
+        reads = writes = created = errors = 0
+        latencies = []
+        while time.monotonic() < fin:
+            inicio = time.perf_counter()
+            if rnd.random() < write_ratio:
+                status = _request(f"{base_url}/api/slices", token,
+                                  {"name": f"bench_{semilla}_{n}_{writes}", "topology": "lineal", "num_vms": 2})
+                writes += 1
+                created += status == 201
+            else:
+                status = _request(f"{base_url}/api/slices?limit=50&fields=id,name,status", token)
+                reads += 1
+            latencies.append(time.perf_counter() - inicio)
+            errors += status >= 400
+        with lock:
+            totales["reads"] += reads
+            totales["writes"] += writes
+            totales["created"] += created
+            totales["errors"] += errors
+            totales["latencies"].extend(latencies)
+
+    threads = [threading.Thread(target=hilo, args=(n,)) for n in range(hilos)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return totales
+
+
+def _esperar_servidor(base_url: str, proceso: subprocess.Popen, timeout: float = 60):
+    fin = time.monotonic() + timeout
+    while time.monotonic() < fin:
+        if proceso.poll() is not None:
+            raise RuntimeError("uvicorn terminó antes de arrancar")
+        try:
+            # /api/ready responde 200 cuando todos los workers pueden recibir tráfico
+            # (cada conexión cae en uno cualquiera: se piden varias seguidas)
+            for _ in range(8):
+                with urllib.request.urlopen(f"{base_url}/api/ready", timeout=2):
+                    pass
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("uvicorn no respondió a tiempo")
+
+
+def _corrida(workers: int, args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench_workers_") as tmp:
+        db = os.path.join(tmp, "slices.sqlite3")
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        env = dict(os.environ,
+                   WEB_CONCURRENCY=str(workers),
+                   SLICE_STORAGE="sqlite",
+                   SLICE_SQLITE_PATH=db,
+                   SLICE_IPAM_PATH=os.path.join(tmp, "ipam.json"),
+                   SLICE_VLANS_PATH=os.path.join(tmp, "vlans.json"),
+                   SLICE_SUPERNET="10.0.0.0/8",
+                   # Sin límites de peticiones: se mide la capacidad, no la admisión
+                   RATE_READ_PER_S="1e9", RATE_READ_BURST="1e9",
+                   RATE_WRITE_PER_S="1e9", RATE_WRITE_BURST="1e9",
+                   MAX_INFLIGHT_CREATIONS="1000000")
+        proceso = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "ui_apis.app:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(workers), "--log-level", "warning"],
+            cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL)
+        try:
+            _esperar_servidor(base_url, proceso)
+            hilos = max(1, args.clients // args.client_procs)
+            inicio = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=args.client_procs) as pool:
+                partes = list(pool.map(_cliente, [base_url] * args.client_procs, [hilos] * args.client_procs,
+                                       [args.seconds] * args.client_procs, [args.write_ratio] * args.client_procs,
+                                       range(args.client_procs)))
+            duracion = time.perf_counter() - inicio
+        finally:
+            proceso.terminate()
+            proceso.wait(timeout=30)
+
+        conn = sqlite3.connect(db)
+        try:
+            slices = conn.execute("SELECT COUNT(*) FROM slices").fetchone()[0]
+            cambios = conn.execute("SELECT COUNT(*) FROM cambios").fetchone()[0]
+        finally:
+            conn.close()
+
+    latencies = sorted(l for parte in partes for l in parte["latencies"])
+    total = {clave: sum(parte[clave] for parte in partes) for clave in ("reads", "writes", "created", "errors")}
+    return {
+        "workers": workers,
+        "rps": (total["reads"] + total["writes"]) / duracion,
+        "reads": total["reads"] / duracion,
+        "writes": total["writes"] / duracion,
+        "p50": latencies[len(latencies) // 2] * 1000 if latencies else 0,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0,
+        "errors": total["errors"],
+        "created": total["created"],
+        "slices": slices,
+        "cambios": cambios,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput de la API según la cantidad de workers")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="Cantidades de workers a probar")
+    parser.add_argument('--seconds', type=float, default=10, help="Duración de cada corrida")
+    parser.add_argument('--clients', type=int, default=32, help="Conexiones concurrentes en total")
+    parser.add_argument('--client-procs', type=int, default=4, help="Procesos que generan la carga")
+    parser.add_argument('--write-ratio', type=float, default=0.1, help="Fracción de peticiones que crean un slice")
+    args = parser.parse_args()
+
+    print(f"{args.clients} clientes, {args.seconds:g} s por corrida, {args.write_ratio:.0%} creaciones")
+    print(f"{'workers':>8}{'req/s':>10}{'lect/s':>10}{'escr/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'errores':>9}{'creados':>9}{'en base':>9}  escrituras")
+    base = None
+    for workers in args.workers:
+        r = _corrida(workers, args)
+        base = base or r["rps"]
+        # Un slice y un cambio por cada 201: ni perdidos ni duplicados
+        ok = r["slices"] == r["created"] and r["cambios"] == r["created"]
+        print(f"{r['workers']:>8}{r['rps']:>10.0f}{r['reads']:>10.0f}{r['writes']:>10.1f}{r['p50']:>9.1f}"
+              f"{r['p99']:>9.1f}{r['errors']:>9}{r['created']:>9}{r['slices']:>9}  "
+              f"{'OK' if ok else 'INCONSISTENTES'} (x{r['rps'] / base:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Importa base_de_datos.json a la base SQLite usada por el backend SLICE_STORAGE=sqlite
+
+Uso:
+    python bin/importar_sqlite.py [--json base_de_datos.json] [--db base_de_datos.sqlite3]
+"""
+
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.slice_manager.storage import DEFAULT_SQLITE_FILE
+from core.snapshot_format import default_database_file
+from core.slice_manager.sqlite_storage import SQLiteSliceStorage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importar base_de_datos.json a SQLite")
+    parser.add_argument('--json', default=default_database_file(),
+                        help="Snapshot de origen (.json o .jsonl)")
+    parser.add_argument('--db', default=os.getenv('SLICE_SQLITE_PATH', DEFAULT_SQLITE_FILE),
+                        help="Base SQLite de destino")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.json):
+        print(f"[ERROR] No existe {args.json}")
+        sys.exit(1)
+
+    storage = SQLiteSliceStorage(args.db)
+    try:
+        total = storage.import_json(args.json)
+    finally:
+        storage.close()
+    print(f"Importados {total} slices en {args.db}")
+    print("Para usarla: export SLICE_STORAGE=sqlite")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Convierte el snapshot de slices entre el formato legado (base_de_datos.json) y
+el compacto versionado (base_de_datos.jsonl). Ver core/snapshot_format.py.
+
+Uso:
+    python bin/migrar_base_datos.py jsonl [--origen base_de_datos.json] [--destino base_de_datos.jsonl]
+    python bin/migrar_base_datos.py json  [--origen base_de_datos.jsonl] [--destino base_de_datos.json]
+
+Con "jsonl" la aplicación pasa a usar base_de_datos.jsonl (se detecta al
+iniciar); con "json" se exporta al formato legado sin cambiar el archivo en uso.
+Los procesos que ya estén corriendo (API, CLI) deben reiniciarse.
+"""
+
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.file_lock import DatabaseLock
+from core.snapshot_format import COMPACT_FILE, LEGACY_FILE, read_records, write_records
+
+
+def migrar(origen: str, destino: str) -> int:
+    """Copia los registros de `origen` a `destino` (el formato sale de la extensión)"""
+    with DatabaseLock(origen).shared():
+        registros = read_records(origen)
+    destino_lock = DatabaseLock(destino)
+    with destino_lock.exclusive():
+        write_records(destino, registros)
+        destino_lock.bump_version()
+    # Verificar que la conversión no perdió nada
+    if read_records(destino) != registros:
+        raise RuntimeError(f"La verificación de {destino} falló: los registros no coinciden")
+    return len(registros)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convertir base_de_datos entre JSON legado y JSON Lines")
+    parser.add_argument('formato', choices=['jsonl', 'json'], help="Formato de destino")
+    parser.add_argument('--origen', help="Snapshot de origen")
+    parser.add_argument('--destino', help="Snapshot de destino")
+    args = parser.parse_args()
+
+    if args.formato == 'jsonl':
+        origen, destino = args.origen or LEGACY_FILE, args.destino or COMPACT_FILE
+    else:
+        origen, destino = args.origen or COMPACT_FILE, args.destino or LEGACY_FILE
+
+    if not os.path.exists(origen):
+        print(f"[ERROR] No existe {origen}")
+        sys.exit(1)
+    if os.path.abspath(origen) == os.path.abspath(destino):
+        print("[ERROR] El origen y el destino son el mismo archivo")
+        sys.exit(1)
+
+    try:
+        total = migrar(origen, destino)
+    except Exception as e:
+        print(f"[ERROR] No se pudo migrar {origen}: {e}")
+        sys.exit(1)
+
+    antes, despues = os.path.getsize(origen), os.path.getsize(destino)
+    print(f"Migrados {total} slices: {origen} ({antes} bytes) -> {destino} ({despues} bytes)")
+    if os.path.abspath(destino) == COMPACT_FILE:
+        print(f"Desde ahora se usa {destino}; {origen} queda como exportación")
+        print("Reiniciar la API y el CLI para que tomen el nuevo archivo")
+
+
+if __name__ == "__main__":
+    main()
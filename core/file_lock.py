@@ -0,0 +1,115 @@
+"""
+Lock lector/escritor entre procesos para los archivos JSON de datos, con un
+sello de versión que permite detectar copias en memoria desactualizadas.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class DatabaseLock:
+    """
+    Lock de archivo compartido (lectores) / exclusivo (escritores) sobre
+    `<archivo>.lock`, más un contador de versión en `<archivo>.version` que cada
+    escritor incrementa al terminar.
+
+    Es reentrante dentro del mismo hilo: un exclusive() anidado en otro
+    exclusive() (o un shared() dentro de exclusive()) no vuelve a bloquear.
+    En Windows los locks compartidos se comportan como exclusivos.
+    """
+
+    def __init__(self, data_path: str):
+        self.data_path = os.path.abspath(data_path)
+        self.lock_path = self.data_path + '.lock'
+        self.version_path = self.data_path + '.version'
+        self._thread_lock = threading.RLock()
+        self._fd = None
+        self._mode = None
+        self._depth = 0
+
+    def _acquire(self, exclusive: bool):
+        self._thread_lock.acquire()
+        if self._depth > 0:
+            if exclusive and self._mode != 'exclusive':
+                self._thread_lock.release()
+                raise RuntimeError("No se puede pasar de lock compartido a exclusivo")
+            self._depth += 1
+            return
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        except BaseException:
+            os.close(fd)
+            self._thread_lock.release()
+            raise
+        self._fd = fd
+        self._mode = 'exclusive' if exclusive else 'shared'
+        self._depth = 1
+
+    def _release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd, self._mode = self._fd, None, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(fd)
+        self._thread_lock.release()
+
+    @contextmanager
+    def shared(self):
+        """Lock de lectura: varios lectores a la vez, ninguno durante una escritura"""
+        self._acquire(exclusive=False)
+        try:
+            yield self
+        finally:
+            self._release()
+
+    @contextmanager
+    def exclusive(self):
+        """Lock de escritura: un solo escritor y ningún lector"""
+        self._acquire(exclusive=True)
+        try:
+            yield self
+        finally:
+            self._release()
+
+    def read_version(self) -> int:
+        """Versión actual del archivo (0 si nunca se escribió con lock)"""
+        try:
+            with open(self.version_path, 'r', encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def version_stamp(self):
+        """Sello barato (sin abrir el archivo) para saber si la versión pudo cambiar"""
+        try:
+            st = os.stat(self.version_path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def bump_version(self) -> int:
+        """Incrementa la versión; debe llamarse dentro de exclusive()"""
+        version = self.read_version() + 1
+        tmp_path = f"{self.version_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(version))
+        # El rename es atómico: los lectores sin lock nunca ven un número a medias
+        os.replace(tmp_path, self.version_path)
+        return version
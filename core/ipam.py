@@ -0,0 +1,207 @@
+"""
+Gestión de direcciones IP de los slices: cada slice recibe una subred propia
+tomada de una superred configurable y sus VMs reciben direcciones de esa subred.
+"""
+
+import ipaddress
+import json
+import os
+from typing import Iterable, Iterator, List, Optional
+
+from .pools import PoolFile, PoolExhausted
+from .snapshot_format import PROJECT_ROOT, default_database_file, iter_records
+
+DEFAULT_IPAM_FILE = os.path.join(PROJECT_ROOT, "ipam.json")
+VMS_FILE = os.path.join(PROJECT_ROOT, "vms.json")
+
+# Dentro de cada subred: .0 es la red, .1 el gateway y la última la de broadcast
+_FIRST_HOST = 2
+
+
+class IPConflict(Exception):
+    """La dirección pedida ya está asignada o no pertenece a la subred del slice"""
+
+
+def ips_guardadas(vms_file: str = VMS_FILE, database_file: str = None) -> Iterator[str]:
+    """IPs que ya tienen las VMs de vms.json y del snapshot de slices (anteriores al IPAM)"""
+    if os.path.exists(vms_file):
+        try:
+            with open(vms_file, 'r', encoding='utf-8') as f:
+                for vm in json.load(f).get('vms', []):
+                    if vm.get('ip'):
+                        yield vm['ip']
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"[ERROR] No se pudieron leer las IPs de {vms_file}: {e}")
+    for item in iter_records(database_file or default_database_file()):
+        for topo in item.get('topologias') or []:
+            for vm in topo.get('vms') or []:
+                if vm.get('ip'):
+                    yield vm['ip']
+
+
+class IPAM:
+    """
+    Subredes /SLICE_SUBNET_PREFIX (24 por defecto) de la superred SLICE_SUPERNET
+    (10.7.0.0/16 por defecto), asignadas por slice y persistidas en ipam.json
+    (o en SLICE_IPAM_PATH).
+
+    Tanto las subredes como las direcciones de cada subred se llevan en
+    BitmapPool (asignar y liberar en O(1)); los pools de direcciones se nombran
+    por índice de subred, así una IP se puede liberar sin saber de qué slice es.
+
+    La primera vez que se usa, ipam.json reserva las IPs que ya tienen las VMs
+    guardadas (`existentes`: iterable o función que lo devuelve; por defecto
+    ips_guardadas()) y las subredes que las contienen, igual que
+    VNCPortAllocator con `usados` y VLANAllocator con `existentes`.
+    """
+
+    def __init__(self, path: str = None, supernet: str = None, prefix: int = None,
+                 existentes: Optional[Iterable[str]] = None):
+        self.store = PoolFile(path or os.getenv('SLICE_IPAM_PATH', DEFAULT_IPAM_FILE))
+        self.supernet = ipaddress.ip_network(supernet or os.getenv('SLICE_SUPERNET', '10.7.0.0/16'))
+        self.prefix = int(prefix or os.getenv('SLICE_SUBNET_PREFIX', '24'))
+        if not self.supernet.prefixlen <= self.prefix <= self.supernet.max_prefixlen - 2:
+            raise ValueError(f"Prefijo /{self.prefix} inválido para la superred {self.supernet}")
+        self.subnet_count = 2 ** (self.prefix - self.supernet.prefixlen)
+        self.subnet_size = 2 ** (self.supernet.max_prefixlen - self.prefix)
+        self.existentes = existentes if existentes is not None else ips_guardadas
+
+    # === Helpers (llamar dentro de una transacción) ===
+
+    def _config(self):
+        config = {'superred': str(self.supernet), 'prefijo': self.prefix}
+        guardada = self.store.assignments.setdefault('config', config)
+        if guardada != config:
+            raise ValueError(f"{self.store.path} se creó para {guardada['superred']} con /{guardada['prefijo']}")
+
+    def _seed(self):
+        """Reserva las IPs existentes (y sus subredes) si ipam.json todavía no lo hizo"""
+        if 'semilla' in self.store.assignments:
+            return
+        existentes = self.existentes() if callable(self.existentes) else self.existentes
+        subnets = self.store.pool('subredes', 0, self.subnet_count)
+        reservadas = 0
+        for ip in set(existentes or ()):
+            try:
+                index = self._index_of_ip(ip)
+            except (IPConflict, ValueError):
+                continue  # fuera de la superred o mal escrita: no puede chocar
+            # La subred queda ocupada sin slice: no se le da a uno nuevo
+            subnets.reserve(index)
+            offset = int(ipaddress.ip_address(ip)) - int(self._network(index).network_address)
+            try:
+                reservadas += self._hosts(index).reserve(offset)
+            except ValueError:
+                pass  # red, gateway o broadcast
+        self.store.assignments['semilla'] = {'ips': reservadas}
+
+    def _subnets(self) -> dict:
+        return self.store.assignments.setdefault('subredes', {})
+
+    def _network(self, index: int):
+        address = self.supernet.network_address + index * self.subnet_size
+        return ipaddress.ip_network(f"{address}/{self.prefix}")
+
+    def _index_for(self, slice_id: str, create: bool = True) -> Optional[int]:
+        self._config()
+        self._seed()
+        subnets = self._subnets()
+        index = subnets.get(slice_id)
+        if index is None and create:
+            index = self.store.pool('subredes', 0, self.subnet_count).allocate()
+            subnets[slice_id] = index
+        return index
+
+    def _hosts(self, index: int):
+        return self.store.pool(f"hosts:{index}", _FIRST_HOST, self.subnet_size - _FIRST_HOST - 1)
+
+    def _index_of_ip(self, ip) -> int:
+        address = ipaddress.ip_address(ip)
+        if address not in self.supernet:
+            raise IPConflict(f"{ip} no pertenece a la superred {self.supernet}")
+        return (int(address) - int(self.supernet.network_address)) // self.subnet_size
+
+    # === API ===
+
+    def subnet(self, slice_id: str):
+        """Subred del slice (se asigna la primera vez)"""
+        with self.store.transaction():
+            return self._network(self._index_for(slice_id))
+
+    def has_subnet(self, slice_id: str) -> bool:
+        """True si el slice ya tiene una subred asignada (sin asignarla)"""
+        with self.store.snapshot():
+            return slice_id in self.store.assignments.get('subredes', {})
+
+    def gateway(self, slice_id: str) -> str:
+        return str(self.subnet(slice_id).network_address + 1)
+
+    def allocate_ips(self, slice_id: str, cantidad: int) -> List[str]:
+        """Reserva `cantidad` direcciones libres en la subred del slice (todas o ninguna)"""
+        with self.store.transaction():
+            index = self._index_for(slice_id)
+            hosts = self._hosts(index)
+            if hosts.free < cantidad:
+                raise PoolExhausted(f"Solo quedan {hosts.free} direcciones libres en {self._network(index)}")
+            base = self._network(index).network_address
+            return [str(base + hosts.allocate()) for _ in range(cantidad)]
+
+    def reserve_ip(self, slice_id: str, ip: str):
+        """Marca una dirección concreta como usada; IPConflict si ya lo estaba o es de otra subred"""
+        with self.store.transaction():
+            self._reserve(slice_id, ip)
+
+    def _reserve(self, slice_id: str, ip: str):
+        index = self._index_for(slice_id)
+        if self._index_of_ip(ip) != index:
+            raise IPConflict(f"{ip} no pertenece a la subred {self._network(index)} del slice {slice_id}")
+        offset = int(ipaddress.ip_address(ip)) - int(self._network(index).network_address)
+        try:
+            libre = self._hosts(index).reserve(offset)
+        except ValueError:
+            raise IPConflict(f"{ip} es una dirección reservada de {self._network(index)}")
+        if not libre:
+            raise IPConflict(f"{ip} ya está asignada")
+
+    def assign(self, slice_id: str, vms: list) -> list:
+        """
+        Da una IP a cada VM sin `ip` y valida las que ya traen una (sin repetidas
+        ni fuera de la subred del slice). Todo en una sola transacción.
+        """
+        with self.store.transaction():
+            for vm in vms:
+                if getattr(vm, 'ip', None):
+                    self._reserve(slice_id, vm.ip)
+            sin_ip = [vm for vm in vms if not getattr(vm, 'ip', None)]
+            if sin_ip:
+                index = self._index_for(slice_id)
+                hosts = self._hosts(index)
+                if hosts.free < len(sin_ip):
+                    raise PoolExhausted(f"Solo quedan {hosts.free} direcciones libres en {self._network(index)}")
+                base = self._network(index).network_address
+                for vm in sin_ip:
+                    vm.ip = str(base + hosts.allocate())
+        return vms
+
+    def release_ip(self, ip: str) -> bool:
+        """Libera una dirección (de cualquier slice)"""
+        with self.store.transaction():
+            index = self._index_of_ip(ip)
+            hosts = self.store.pools.get(f"hosts:{index}")
+            if hosts is None:
+                return False
+            offset = int(ipaddress.ip_address(ip)) - int(self._network(index).network_address)
+            try:
+                return hosts.release(offset)
+            except ValueError:
+                return False
+
+    def release_slice(self, slice_id: str) -> bool:
+        """Devuelve la subred del slice y todas sus direcciones"""
+        with self.store.transaction():
+            index = self._subnets().pop(slice_id, None)
+            if index is None:
+                return False
+            self.store.pools.pop(f"hosts:{index}", None)
+            self.store.pool('subredes', 0, self.subnet_count).release(index)
+            return True
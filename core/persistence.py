@@ -0,0 +1,149 @@
+"""
+Escritura segura de archivos JSON: archivo temporal + fsync + rename atómico,
+y agrupación (group commit) de ráfagas de escrituras en un solo flush.
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+from typing import Callable, Optional
+
+
+def atomic_write_json(path: str, data, indent: Optional[int] = 2):
+    """Escribe `data` como JSON en `path` de forma atómica (ver atomic_write)"""
+    atomic_write(path, lambda f: json.dump(data, f, indent=indent, ensure_ascii=False))
+
+
+def atomic_write(path: str, dump: Callable[[object], None]):
+    """
+    Escribe `path` sin dejar nunca un archivo a medias: `dump(f)` escribe en un
+    temporal del mismo directorio, se hace fsync y se renombra encima del original.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            dump(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp crea el archivo con permisos 0600: conservar los del archivo original
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(directory)
+
+
+def _fsync_dir(directory: str):
+    """Persistir la entrada del directorio tras el rename (no disponible en Windows)"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class CoalescedWriter:
+    """
+    Agrupa las mutaciones que llegan dentro de una ventana de tiempo en un único
+    flush atómico del archivo.
+
+    Cada llamada a mark_dirty() devuelve un ticket (número de secuencia). Cuando
+    un flush termina, todos los tickets emitidos antes de renderizar los datos
+    quedan durables; wait_durable(ticket) bloquea hasta ese punto. Con window=0
+    el flush es síncrono, igual que una escritura directa.
+    """
+
+    def __init__(self, path: str, render: Callable[[], object], window: float = 0.0,
+                 indent: Optional[int] = 2, lock=None, after_write: Callable[[], None] = None,
+                 write: Callable[[str, object], None] = None):
+        self.path = path
+        self.render = render
+        # Función write(path, datos) que escribe atómicamente; por defecto JSON indentado
+        self.write = write if write is not None else (
+            lambda path, data: atomic_write_json(path, data, indent=indent))
+        self.after_write = after_write
+        self.window = window
+        self.indent = indent
+        # Lock del dueño de los datos: se mantiene mientras se renderiza y escribe
+        self.lock = lock if lock is not None else threading.RLock()
+        self._cond = threading.Condition()
+        self._requested = 0
+        self._durable = 0
+        self._timer = None
+        self.flushes = 0
+        atexit.register(self.close)
+
+    @property
+    def durable_seq(self) -> int:
+        return self._durable
+
+    @property
+    def pending(self) -> bool:
+        return self._requested > self._durable
+
+    def mark_dirty(self) -> int:
+        """Registra una mutación pendiente y programa el flush; devuelve su ticket"""
+        with self._cond:
+            self._requested += 1
+            ticket = self._requested
+            if self.window <= 0:
+                schedule = False
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+                schedule = True
+            else:
+                schedule = True
+        if not schedule:
+            self.flush()
+        return ticket
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[ERROR] No se pudo guardar {self.path}: {e}")
+
+    def flush(self):
+        """Escribe ahora todas las mutaciones pendientes"""
+        # Siempre se toma primero el lock del dueño: mismo orden que sus mutaciones
+        with self.lock:
+            with self._cond:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if self._requested == self._durable:
+                    return
+                target = self._requested
+            self.write(self.path, self.render())
+            self.flushes += 1
+            if self.after_write is not None:
+                self.after_write()
+        with self._cond:
+            self._durable = max(self._durable, target)
+            self._cond.notify_all()
+
+    def wait_durable(self, ticket: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        """Espera a que el ticket (o todas las mutaciones hasta ahora) estén en disco"""
+        with self._cond:
+            if ticket is None:
+                ticket = self._requested
+            return self._cond.wait_for(lambda: self._durable >= ticket, timeout=timeout)
+
+    def close(self):
+        """Vacía lo pendiente; se registra en atexit para no perder la última ventana"""
+        if self.pending:
+            self.flush()
@@ -0,0 +1,329 @@
+"""
+Pools de recursos numerados (puertos VNC, VLANs) con asignación y liberación
+O(1) y estado persistido en un archivo JSON compartido entre procesos.
+"""
+
+import base64
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from .file_lock import DatabaseLock
+from .persistence import atomic_write_json
+
+FORMAT_VERSION = 1
+
+
+class PoolExhausted(Exception):
+    """No quedan valores libres en el pool"""
+
+
+class BitmapPool:
+    """
+    Rango [start, start + size) con un bit por valor (1 = en uso).
+
+    Los valores liberados van a una lista libre (pila) y los nunca usados se
+    entregan avanzando un cursor, así que asignar y liberar son O(1). Las
+    entradas de la lista libre que se reservaron a mano se descartan al sacarlas.
+    """
+
+    def __init__(self, start: int, size: int, bitmap: Optional[bytes] = None):
+        self.start = start
+        self.size = size
+        self.bits = bytearray(bitmap) if bitmap is not None else bytearray((size + 7) // 8)
+        if len(self.bits) != (size + 7) // 8:
+            raise ValueError("El bitmap no corresponde al tamaño del pool")
+        self.used = sum(bin(b).count('1') for b in self.bits)
+        # Cursor: a partir de aquí ningún valor se usó nunca
+        self._cursor = 0
+        for offset in range(size - 1, -1, -1):
+            if self._test(offset):
+                self._cursor = offset + 1
+                break
+        self._free = [o for o in range(self._cursor - 1, -1, -1) if not self._test(o)]
+
+    def _test(self, offset: int) -> bool:
+        return bool(self.bits[offset >> 3] & (1 << (offset & 7)))
+
+    def _set(self, offset: int, value: bool):
+        if value:
+            self.bits[offset >> 3] |= 1 << (offset & 7)
+        else:
+            self.bits[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+
+    def _offset(self, value: int) -> int:
+        offset = value - self.start
+        if not 0 <= offset < self.size:
+            raise ValueError(f"{value} está fuera del rango {self.start}-{self.start + self.size - 1}")
+        return offset
+
+    @property
+    def free(self) -> int:
+        return self.size - self.used
+
+    def is_used(self, value: int) -> bool:
+        return self._test(self._offset(value))
+
+    def allocate(self) -> int:
+        """Entrega el valor libre más reciente (o el siguiente nunca usado)"""
+        while self._free:
+            offset = self._free.pop()
+            if not self._test(offset):
+                break
+        else:
+            while self._cursor < self.size and self._test(self._cursor):
+                self._cursor += 1
+            if self._cursor >= self.size:
+                raise PoolExhausted(f"No quedan valores libres en {self.start}-{self.start + self.size - 1}")
+            offset = self._cursor
+            self._cursor += 1
+        self._set(offset, True)
+        self.used += 1
+        return self.start + offset
+
+    def reserve(self, value: int) -> bool:
+        """Marca un valor concreto como usado; False si ya lo estaba"""
+        offset = self._offset(value)
+        if self._test(offset):
+            return False
+        self._set(offset, True)
+        self.used += 1
+        return True
+
+    def release(self, value: int) -> bool:
+        """Devuelve un valor al pool; False si no estaba en uso"""
+        offset = self._offset(value)
+        if not self._test(offset):
+            return False
+        self._set(offset, False)
+        self.used -= 1
+        if offset < self._cursor:
+            self._free.append(offset)
+        return True
+
+    def to_dict(self) -> dict:
+        return {
+            'start': self.start,
+            'size': self.size,
+            'bitmap': base64.b64encode(bytes(self.bits)).decode('ascii')
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'BitmapPool':
+        return cls(data['start'], data['size'], base64.b64decode(data['bitmap']))
+
+
+class PoolFile:
+    """
+    Conjunto de pools con nombre persistidos en un archivo JSON:
+
+        {"version": 1, "pools": {nombre: {"start", "size", "bitmap"}},
+         "asignaciones": {nombre: {clave: valor}}}
+
+    El bitmap va empaquetado (1 bit por valor, en base64). "asignaciones" guarda
+    qué clave (slice, VM) tiene cada valor, para poder pedir siempre el mismo.
+    transaction() toma el lock exclusivo entre procesos, recarga si otro proceso
+    escribió y guarda de forma atómica al salir.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = DatabaseLock(path)
+        self._thread_lock = threading.RLock()
+        self.pools: Dict[str, BitmapPool] = {}
+        self.assignments: Dict[str, Dict[str, object]] = {}
+        self._stamp = None
+        self._loaded = False
+
+    def _load(self):
+        stamp = self.lock.version_stamp()
+        if self._loaded and stamp == self._stamp:
+            return
+        self.pools, self.assignments = {}, {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f) or {}
+                if data.get('version', FORMAT_VERSION) != FORMAT_VERSION:
+                    raise ValueError(f"versión {data.get('version')} no soportada")
+                self.pools = {name: BitmapPool.from_dict(p) for name, p in data.get('pools', {}).items()}
+                self.assignments = data.get('asignaciones', {})
+            except (ValueError, KeyError) as e:
+                print(f"[ERROR] No se pudo leer {self.path}: {e}")
+                raise
+        self._stamp = stamp
+        self._loaded = True
+
+    def _save(self):
+        atomic_write_json(self.path, {
+            'version': FORMAT_VERSION,
+            'pools': {name: pool.to_dict() for name, pool in self.pools.items()},
+            'asignaciones': self.assignments
+        }, indent=None)
+        self.lock.bump_version()
+        self._stamp = self.lock.version_stamp()
+
+    @contextmanager
+    def transaction(self):
+        """Lectura-modificación-escritura atómica de todos los pools"""
+        with self._thread_lock, self.lock.exclusive():
+            self._load()
+            try:
+                yield self
+            except BaseException:
+                # Descartar los cambios a medias: la próxima vez se relee el archivo
+                self._loaded = False
+                raise
+            self._save()
+
+    @contextmanager
+    def snapshot(self):
+        """Lectura consistente sin modificar"""
+        with self._thread_lock, self.lock.shared():
+            self._load()
+            yield self
+
+    def pool(self, name: str, start: int, size: int, seed: Iterable[int] = ()) -> BitmapPool:
+        """
+        Pool `name` (se crea con el rango dado si no existe, marcando como usados
+        los valores de `seed`). Llamar dentro de transaction().
+        """
+        pool = self.pools.get(name)
+        if pool is None:
+            pool = BitmapPool(start, size)
+            for value in seed:
+                try:
+                    pool.reserve(int(value))
+                except (TypeError, ValueError):
+                    pass
+            self.pools[name] = pool
+        return pool
+
+
+class VNCPortAllocator:
+    """
+    Puertos VNC por host físico, cada uno con su propio BitmapPool dentro de
+    vnc_ports.json (rango VNC_PORT_START / VNC_PORT_COUNT).
+    """
+
+    def __init__(self, path: str, start: int = None, size: int = None):
+        self.store = PoolFile(path)
+        self.start = start if start is not None else int(os.getenv('VNC_PORT_START', '5901'))
+        self.size = size if size is not None else int(os.getenv('VNC_PORT_COUNT', '1000'))
+
+    def reserve(self, cantidad: int, host: str = 'default', usados: Iterable[int] = ()) -> List[int]:
+        """
+        Reserva `cantidad` puertos en un host de forma atómica (todos o ninguno).
+        `usados` son los puertos ya ocupados antes de existir el pool (p. ej. los
+        de vms.json): solo se tienen en cuenta la primera vez que se usa el host.
+        """
+        if cantidad <= 0:
+            return []
+        with self.store.transaction():
+            pool = self.store.pool(host, self.start, self.size, usados)
+            if pool.free < cantidad:
+                raise PoolExhausted(f"Solo quedan {pool.free} puertos VNC libres en {host}")
+            return [pool.allocate() for _ in range(cantidad)]
+
+    def release(self, puertos: Iterable[int], host: str = 'default') -> int:
+        """Libera puertos; devuelve cuántos estaban en uso"""
+        with self.store.transaction():
+            pool = self.store.pools.get(host)
+            if pool is None:
+                return 0
+            liberados = 0
+            for puerto in puertos:
+                try:
+                    liberados += pool.release(int(puerto))
+                except (TypeError, ValueError):
+                    pass
+            return liberados
+
+    def stats(self) -> Dict[str, dict]:
+        with self.store.snapshot():
+            return {host: {'usados': p.used, 'libres': p.free} for host, p in self.store.pools.items()}
+
+
+class VLANAllocator:
+    """
+    VLAN IDs por slice en vlans.json (o SLICE_VLANS_PATH), dentro del rango
+    VLAN_FIRST-VLAN_LAST (1-4094 por defecto). Cada slice conserva sus VLANs
+    mientras exista: pedir de nuevo las de un slice devuelve las mismas, y solo
+    se liberan al borrarlo.
+    """
+
+    POOL = 'vlans'
+
+    def __init__(self, path: str = None, first: int = None, last: int = None):
+        from .snapshot_format import PROJECT_ROOT
+        self.store = PoolFile(path or os.getenv('SLICE_VLANS_PATH', os.path.join(PROJECT_ROOT, "vlans.json")))
+        self.first = first if first is not None else int(os.getenv('VLAN_FIRST', '1'))
+        self.last = last if last is not None else int(os.getenv('VLAN_LAST', '4094'))
+        if not 1 <= self.first <= self.last <= 4094:
+            raise ValueError(f"Rango de VLANs inválido: {self.first}-{self.last}")
+
+    def _pool(self, existentes) -> BitmapPool:
+        asignadas = self.store.assignments.setdefault(self.POOL, {})
+        pool = self.store.pools.get(self.POOL)
+        if pool is None:
+            pool = self.store.pool(self.POOL, self.first, self.last - self.first + 1)
+            # Primera vez: respetar las VLANs que ya tienen los slices guardados
+            existentes = existentes() if callable(existentes) else existentes or {}
+            pares = existentes.items() if isinstance(existentes, dict) else existentes
+            for clave, vlans in pares:
+                propias = []
+                for vlan in vlans:
+                    try:
+                        if pool.reserve(int(vlan)):
+                            propias.append(int(vlan))
+                    except (TypeError, ValueError):
+                        pass
+                # Slices sin id: sus VLANs quedan ocupadas pero no se pueden liberar por clave
+                if propias and clave:
+                    asignadas[str(clave)] = propias
+        return pool
+
+    def allocate(self, clave: str, cantidad: int = 1, existentes=None) -> List[int]:
+        """
+        VLANs del slice `clave`, reservando las que falten hasta tener `cantidad`
+        (todas o ninguna). `existentes` son pares (clave, [vlans]) o un dict (o una
+        función que los devuelve) con lo ya usado antes de existir vlans.json.
+        """
+        with self.store.transaction():
+            pool = self._pool(existentes)
+            asignadas = self.store.assignments[self.POOL]
+            vlans = list(asignadas.get(str(clave), []))
+            faltan = cantidad - len(vlans)
+            if faltan > 0:
+                if pool.free < faltan:
+                    raise PoolExhausted(f"Solo quedan {pool.free} VLANs libres en {self.first}-{self.last}")
+                vlans.extend(pool.allocate() for _ in range(faltan))
+                asignadas[str(clave)] = vlans
+            return vlans
+
+    def get(self, clave: str) -> List[int]:
+        with self.store.snapshot():
+            return list(self.store.assignments.get(self.POOL, {}).get(str(clave), []))
+
+    def release(self, clave: str) -> int:
+        """Devuelve al pool todas las VLANs del slice; cuántas se liberaron"""
+        with self.store.transaction():
+            vlans = self.store.assignments.get(self.POOL, {}).pop(str(clave), [])
+            pool = self.store.pools.get(self.POOL)
+            if pool is None:
+                return 0
+            liberadas = 0
+            for vlan in vlans:
+                try:
+                    liberadas += pool.release(int(vlan))
+                except ValueError:
+                    pass
+            return liberadas
+
+    def stats(self) -> dict:
+        with self.store.snapshot():
+            pool = self.store.pools.get(self.POOL)
+            usadas = pool.used if pool is not None else 0
+            return {'usadas': usadas, 'libres': self.last - self.first + 1 - usadas}
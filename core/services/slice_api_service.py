@@ -3,22 +3,311 @@ Servicio para comunicación con la API de slices
 """
 
 import requests
+import json
 import os
-from typing import List, Dict, Optional
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 import urllib3
 
 # Deshabilitar warnings de SSL para certificados autofirmados
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
+class ETagCache:
+    """
+    Últimas respuestas GET con su ETag, por token + URL + parámetros. Es del
+    módulo (no de cada SliceAPIService) porque los menús crean un servicio
+    nuevo cada vez que se abre una pantalla. LRU de `max_entries` entradas.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[str, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[Tuple[str, object]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Tuple, etag: str, data):
+        with self._lock:
+            self._entries[key] = (etag, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_etag_cache = ETagCache()
+
+
+# Nombres del backend remoto -> campos de la API local (mismo mapa que core.slice_manager.query)
+_FIELD_ALIASES = {
+    'nombre_slice': 'name',
+    'nombre': 'name',
+    'usuario': 'owner',
+    'estado': 'status',
+    'timestamp': 'created_at',
+    'topologia': 'topology',
+}
+
+
+# Campos de la API local -> nombres del backend remoto, que son los que leen los menús
+_REMOTE_KEYS = {
+    'name': 'nombre_slice',
+    'owner': 'usuario',
+    'status': 'estado',
+    'created_at': 'timestamp',
+    'topology': 'topologia',
+}
+
+
+def _normalize(slice_data: dict) -> dict:
+    """
+    Un slice con los nombres del backend remoto (nombre_slice, usuario, estado,
+    timestamp), venga de la réplica (Slice.to_dict de la API local) o de un
+    listado. Si trae los dos nombres de un campo se queda el del backend.
+    """
+    return {_REMOTE_KEYS.get(k, k): v for k, v in slice_data.items()
+            if k not in _REMOTE_KEYS or _REMOTE_KEYS[k] not in slice_data}
+
+
+def _count_vms(vms) -> int:
+    """VMs de un slice: lista (API local) o {"topologias": [{"vms": [...]}]} (backend remoto)"""
+    if isinstance(vms, dict):
+        return sum(len(topo.get('vms') or []) for topo in vms.get('topologias') or [])
+    return len(vms or [])
+
+
+def _project(slice_data: dict, fields: Optional[List[str]]) -> dict:
+    """
+    Slice normalizado y, si se piden fields, solo esos campos con el nombre con
+    que se pidieron (mismos alias que fields= en el servidor)
+    """
+    data = _normalize(slice_data)
+    if not fields:
+        return data
+    result = {}
+    for name in fields:
+        if name == 'total_vms':
+            result[name] = data.get(name, _count_vms(data.get('vms')))
+        else:
+            key = _REMOTE_KEYS.get(_FIELD_ALIASES.get(name, name), name)
+            result[name] = data.get(name, data.get(key))
+    return result
+
+
+class SliceReplica:
+    """
+    Copia local de los slices mantenida con GET /api/slices/changes: cada
+    sincronización trae solo lo que cambió desde la última "seq" (o todo si el
+    servidor pide resincronizar). Una por servidor y token, compartida entre
+    los SliceAPIService que crean los menús.
+    """
+
+    def __init__(self):
+        self.epoch = None
+        self.seq = 0
+        self.slices: Dict[str, dict] = {}  # id -> slice, en orden de llegada
+        self.supported = True  # False si el servidor no tiene el endpoint
+        self.live = False  # True mientras un SliceEventListener la mantiene al día
+        self.lock = threading.Lock()
+
+    def apply(self, data: dict):
+        """Aplica una respuesta de /api/slices/changes"""
+        if data.get('full'):
+            self.slices = {str(s.get('id')): s for s in data.get('slices', [])}
+        else:
+            for change in data.get('changes', []):
+                slice_id = str(change.get('id'))
+                if change.get('op') == 'delete':
+                    self.slices.pop(slice_id, None)
+                else:
+                    self.slices[slice_id] = change.get('slice')
+        self.epoch = data.get('epoch')
+        self.seq = data.get('seq', 0)
+
+    def apply_event(self, epoch: str, change: dict) -> bool:
+        """Aplica un evento "slice" de /api/slices/events; False si ya estaba incluido"""
+        if epoch != self.epoch or change.get('seq', 0) <= self.seq:
+            return False
+        self.apply({'epoch': epoch, 'seq': change['seq'], 'changes': [change]})
+        return True
+
+
+_replicas: Dict[Tuple[str, str], SliceReplica] = {}
+_replicas_lock = threading.Lock()
+
+
+def _parse_sse(lines) -> Iterator[Tuple[str, Optional[str], str]]:
+    """(evento, id, data) de cada mensaje de un text/event-stream"""
+    event, event_id, data = "message", None, []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, event_id, "\n".join(data)
+            event, event_id, data = "message", None, []
+        elif line.startswith(":"):
+            continue  # comentario (keepalive)
+        else:
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event = value
+            elif field == "id":
+                event_id = value
+            elif field == "data":
+                data.append(value)
+
+
+class SliceEventListener(threading.Thread):
+    """
+    Hilo que sigue GET /api/slices/events y mantiene al día la réplica de
+    slices del servicio (sin owner) o solo avisa los cambios (con owner).
+    Mientras está conectado, sync_replica/list_all_slices responden desde la
+    réplica sin consultar al servidor. Se reconecta solo, retomando con
+    Last-Event-ID. on_change(op, slice_id, slice) recibe op create/update/delete,
+    o "reset" (con None) cuando hubo que recargar todo.
+    """
+
+    def __init__(self, service: "SliceAPIService", on_change: Optional[Callable] = None,
+                 owner: Optional[str] = None):
+        super().__init__(name="slice-events", daemon=True)
+        self.service = service
+        self.on_change = on_change
+        self.owner = owner
+        self.replica = None if owner else service._replica()
+        self.last_event_id = None
+        self._stop_event = threading.Event()
+        self._response = None
+
+    def stop(self):
+        self._stop_event.set()
+        response = self._response
+        if response is not None:
+            response.close()  # desbloquea la lectura del stream
+
+    def _notify(self, op: str, slice_id=None, slice_data=None):
+        if self.on_change:
+            try:
+                self.on_change(op, slice_id, slice_data)
+            except Exception as e:
+                print(f"[ERROR] Error en el listener de eventos: {e}")
+
+    def _resync(self):
+        """Pone la réplica al día por /api/slices/changes y la marca como en vivo"""
+        if self.replica is None:
+            return
+        self.replica.live = False
+        self.service.sync_replica()
+        self.replica.live = self.replica.supported
+
+    def _handle(self, event: str, event_id: Optional[str], data: str):
+        payload = json.loads(data) if data else {}
+        if event == "ready":
+            replica = self.replica
+            if replica is not None:
+                # Lo anterior a "ready" no llega por el stream: completar con /changes si falta
+                if replica.epoch != payload.get("epoch") or replica.seq < payload.get("seq", 0):
+                    self._resync()
+                else:
+                    replica.live = True
+        elif event == "reset":
+            if self.replica is not None:
+                with self.replica.lock:
+                    self.replica.epoch, self.replica.seq = None, 0
+            self._resync()
+            self._notify("reset")
+        elif event == "slice":
+            if self.replica is not None:
+                epoch = (event_id or "").partition(":")[0]
+                with self.replica.lock:
+                    if not self.replica.apply_event(epoch, payload):
+                        return
+            self._notify(payload.get("op"), payload.get("id"), payload.get("slice"))
+
+    def run(self):
+        url = f"{self.service.api_url}/api/slices/events"
+        espera = 1
+        while not self._stop_event.is_set():
+            headers = dict(self.service.headers)
+            headers["Accept"] = "text/event-stream"
+            if self.last_event_id:
+                headers["Last-Event-ID"] = self.last_event_id
+            params = {"owner": self.owner} if self.owner else None
+            try:
+                # El servidor manda un keepalive cada 15 s: 60 s sin datos es una conexión caída
+                with requests.get(url, headers=headers, params=params, stream=True,
+                                  verify=False, timeout=(10, 60)) as response:
+                    if response.status_code in (404, 405):
+                        print("[DEBUG] El servidor no ofrece /api/slices/events")
+                        return
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{response.status_code} - {response.text}")
+                    self._response = response
+                    espera = 1
+                    for event, event_id, data in _parse_sse(response.iter_lines(decode_unicode=True)):
+                        if event_id:
+                            self.last_event_id = event_id
+                        self._handle(event, event_id, data)
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    print(f"[DEBUG] Stream de eventos interrumpido: {e}")
+            finally:
+                self._response = None
+                if self.replica is not None:
+                    self.replica.live = False
+            self._stop_event.wait(espera)
+            espera = min(30, espera * 2)
+
+
 class SliceAPIService:
 
-    def create_slice_api(self, nombre_slice: str, solicitud_json: dict) -> dict:
+    # Reintentos (con la misma Idempotency-Key) ante timeout o error de conexión
+    RETRIES = int(os.getenv('SLICE_API_RETRIES', '2'))
+
+    def _post_idempotente(self, path: str, payload: dict, timeout, idempotency_key: Optional[str] = None,
+                          headers: Optional[dict] = None) -> requests.Response:
+        """
+        POST con Idempotency-Key. Si la petición vence o se corta se reintenta
+        con la misma clave: si la primera llegó a ejecutarse, el servidor
+        devuelve su respuesta en lugar de repetir la operación. Un 429 se
+        reintenta después del Retry-After indicado. El llamador debe crear la
+        clave una vez por acción del usuario y pasarla en cada reintento; si no
+        la pasa se genera una que solo cubre los reintentos de esta llamada.
+        """
+        headers = dict(headers or self.headers)
+        headers["Idempotency-Key"] = idempotency_key or uuid.uuid4().hex
+        for intento in range(self.RETRIES + 1):
+            try:
+                response = requests.post(f"{self.api_url}{path}", headers=headers, json=payload,
+                                         verify=False, timeout=timeout)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                if intento == self.RETRIES:
+                    raise
+                print(f"[DEBUG] {path}: {type(e).__name__}, reintento {intento + 1}/{self.RETRIES}")
+                time.sleep(2 ** intento)
+                continue
+            if response.status_code != 429 or intento == self.RETRIES:
+                return response
+            # Límite de peticiones: no se ejecutó nada, esperar lo que indica Retry-After
+            espera = min(30, int(response.headers.get("Retry-After", "1") or 1))
+            print(f"[DEBUG] {path}: 429, reintento {intento + 1}/{self.RETRIES} en {espera}s")
+            time.sleep(espera)
+
+    def create_slice_api(self, nombre_slice: str, solicitud_json: dict, idempotency_key: Optional[str] = None) -> dict:
         """
         Crea un slice usando el endpoint /slices/solicitud_creacion (servicio externo)
         Args:
             nombre_slice: nombre del slice
             solicitud_json: dict con la estructura completa de la solicitud (ver ejemplo curl)
+            idempotency_key: clave de la operación (se genera una si no se pasa); reusarla
+                al reintentar evita crear el slice dos veces
         Returns:
             dict con la respuesta de la API o error
         """
@@ -27,12 +316,11 @@ class SliceAPIService:
             "solicitud_json": solicitud_json
         }
         try:
-            response = requests.post(
-                f"{self.api_url}/slices/solicitud_creacion",
-                headers=self.headers,
-                json=payload,
-                verify=False,
-                timeout=60  # Aumentado a 60 segundos para operaciones de creación
+            response = self._post_idempotente(
+                "/slices/solicitud_creacion",
+                payload,
+                timeout=60,  # Aumentado a 60 segundos para operaciones de creación
+                idempotency_key=idempotency_key
             )
             print(f"[DEBUG] Status code: {response.status_code}")
             print(f"[DEBUG] Response text: {response.text[:200]}")
@@ -51,7 +339,75 @@ class SliceAPIService:
         except Exception as e:
             print(f"[DEBUG] Exception: {type(e).__name__}: {str(e)}")
             return {"ok": False, "error": str(e)}
-    def list_all_slices(self) -> list:
+    def create_slice_job(self, nombre_slice: str, solicitud_json: dict, idempotency_key: Optional[str] = None) -> dict:
+        """
+        Igual que create_slice_api pero sin esperar la creación: pide
+        "Prefer: respond-async" y el servidor responde 202 con un job_id que
+        luego se consulta con get_job/wait_job. Si el servidor ignora la
+        preferencia y crea el slice en la misma petición, se devuelve como un
+        trabajo ya terminado.
+        Returns:
+            {"ok": True, "job_id": ..., "status": ...} o {"ok": False, "error": ...}
+        """
+        payload = {
+            "nombre_slice": nombre_slice,
+            "solicitud_json": solicitud_json
+        }
+        headers = dict(self.headers)
+        headers["Prefer"] = "respond-async"
+        try:
+            response = self._post_idempotente(
+                "/slices/solicitud_creacion",
+                payload,
+                timeout=(10, 20),  # Solo se encola: no hace falta esperar la creación
+                idempotency_key=idempotency_key,
+                headers=headers
+            )
+            if response.status_code == 202:
+                data = response.json()
+                return {"ok": True, "job_id": data["job_id"], "status": data["status"]}
+            if response.status_code in (200, 201):
+                return {"ok": True, "job_id": None, "status": "done", "result": response.json()}
+            return {"ok": False, "error": response.text, "status": response.status_code}
+        except requests.exceptions.RequestException as e:
+            print(f"[ERROR] Error al encolar la creación del slice: {e}")
+            return {"ok": False, "error": str(e)}
+
+    def get_job(self, job_id: str, wait: float = 0) -> Optional[Dict]:
+        """Estado de un trabajo; con wait > 0 el servidor espera hasta wait segundos (máx. 60) a que termine"""
+        try:
+            response = requests.get(
+                f"{self.api_url}/api/jobs/{job_id}",
+                headers=self.headers,
+                params={"wait": wait} if wait else None,
+                verify=False,
+                timeout=(10, wait + 20)
+            )
+            if response.status_code == 200:
+                return response.json()
+            print(f"[ERROR] Error al consultar el trabajo {job_id}: {response.status_code} - {response.text}")
+            return None
+        except requests.exceptions.RequestException as e:
+            print(f"[ERROR] Error al consultar el trabajo {job_id}: {e}")
+            return None
+
+    def wait_job(self, job_id: str, timeout: float = 300) -> Optional[Dict]:
+        """
+        Espera a que un trabajo termine (status "done" o "failed") con long
+        polling de a 30 segundos. Devuelve el último estado conocido, que sigue
+        en "queued"/"running" si se agotó el timeout, o None si no se pudo consultar.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            restante = deadline - time.monotonic()
+            job = self.get_job(job_id, wait=max(0, min(30, restante)))
+            if job is None or job.get("status") in ("done", "failed") or restante <= 0:
+                return job
+
+    # Tamaño de página al listar (el servidor acepta hasta 1000)
+    PAGE_SIZE = 500
+
+    def list_all_slices(self, fields: Optional[List[str]] = None, **filtros) -> list:
         """
         Listar todos los slices (para admin)
         Usa el endpoint /slices/listar_slices del servidor remoto
@@ -61,21 +417,44 @@ class SliceAPIService:
           "success": true,
           "slices": [{"id": 5, "usuario": "...", "nombre_slice": "...", "vms": {...}, "estado": "activa", "timestamp": "..."}]
         }
+
+        Args:
+            fields: columnas a pedir (p. ej. ["id", "nombre_slice", "estado"]); None = todo
+            filtros: owner, status, topology, created_from, created_to, sort
+
+        Sin filtros se usa la réplica local (sync_replica). Si no, o si el servidor
+        no la soporta, se recorren las páginas siguiendo "next_cursor"; si el
+        servidor no pagina, la primera respuesta ya trae todos los slices. En
+        los dos casos cada slice sale con los nombres del backend (nombre_slice,
+        usuario, estado, timestamp) y proyectado a fields.
         """
+        params = {k: v for k, v in filtros.items() if v}
+        if not params:
+            # Sin filtros: réplica local al día con solo los cambios (si el servidor lo permite)
+            try:
+                replica = self.sync_replica()
+            except requests.exceptions.RequestException:
+                replica = None
+            if replica is not None:
+                return [_project(s, fields) for s in replica]
+        params['limit'] = self.PAGE_SIZE
+        if fields:
+            params['fields'] = ",".join(fields)
+        slices = []
         try:
-            response = requests.get(
-                f"{self.api_url}/slices/listar_slices",
-                headers=self.headers,
-                verify=False,
-                timeout=20  # Aumentado a 20 segundos
-            )
-            if response.status_code == 200:
-                data = response.json()
-                # La API devuelve {"success": true, "slices": [...], "total_slices": N}
-                return data.get('slices', [])
-            else:
-                print(f"[ERROR] Error al listar slices: {response.status_code} - {response.text}")
-                return []
+            while True:
+                # Aumentado a 20 segundos; con ETag una página sin cambios no se vuelve a bajar
+                status_code, data, text = self._get_json("/slices/listar_slices", dict(params), timeout=20)
+                if status_code != 200:
+                    print(f"[ERROR] Error al listar slices: {status_code} - {text}")
+                    return slices
+                # La API devuelve {"success": true, "slices": [...], "total_slices": N}; se
+                # normaliza y proyecta igual que la réplica (el servidor puede ignorar fields=)
+                slices.extend(_project(s, fields) for s in data.get('slices', []))
+                cursor = data.get('next_cursor')
+                if not cursor:
+                    return slices
+                params['cursor'] = cursor
         except requests.exceptions.Timeout:
             print(f"[ERROR] Timeout al listar slices. Verifique el túnel SSH.")
             return []
@@ -98,22 +477,17 @@ class SliceAPIService:
         }
         """
         try:
-            response = requests.get(
-                f"{self.api_url}/slices/listar_slices",
-                headers=self.headers,
-                verify=False,
-                timeout=20  # Aumentado a 20 segundos
-            )
-            if response.status_code == 200:
-                data = response.json()
+            # Aumentado a 20 segundos
+            status_code, data, text = self._get_json("/slices/listar_slices", timeout=20)
+            if status_code == 200:
                 # La API devuelve {"success": true, "slices": [...], "total_slices": N}
                 all_slices = data.get('slices', [])
                 
                 # Los slices ya están filtrados por el backend según el token JWT
                 # No necesitamos filtrar por usuario aquí
-                return all_slices
+                return [_normalize(s) for s in all_slices]
             else:
-                print(f"[ERROR] Error al listar mis slices: {response.status_code} - {response.text}")
+                print(f"[ERROR] Error al listar mis slices: {status_code} - {text}")
                 return []
         except requests.exceptions.Timeout:
             print(f"[ERROR] Timeout al listar slices. Verifique el túnel SSH.")
@@ -142,6 +516,85 @@ class SliceAPIService:
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json"
         }
+
+    def _get_json(self, path: str, params: Optional[dict] = None, timeout: int = 20) -> Tuple[int, object, str]:
+        """
+        GET condicional: envía If-None-Match con el ETag guardado y, si el
+        servidor responde 304, devuelve el cuerpo guardado sin volver a bajarlo.
+        Devuelve (status_code, json, texto); en un 304 el status es 200.
+        """
+        url = f"{self.api_url}{path}"
+        key = (self.token, url, tuple(sorted((params or {}).items())))
+        cached = _etag_cache.get(key)
+        headers = dict(self.headers)
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+        response = requests.get(url, headers=headers, params=params, verify=False, timeout=timeout)
+        if response.status_code == 304 and cached is not None:
+            return 200, cached[1], ""
+        if response.status_code != 200:
+            return response.status_code, None, response.text
+        data = response.json()
+        etag = response.headers.get("ETag")
+        if etag:
+            _etag_cache.put(key, etag, data)
+        return 200, data, ""
+
+    def export_slices(self, owner: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Recorre la exportación NDJSON de /api/slices/export devolviendo un slice a
+        la vez, a medida que llega: la memoria no depende del tamaño del inventario.
+
+            for s in api.export_slices():
+                ...
+        """
+        params = {"owner": owner} if owner else None
+        with requests.get(f"{self.api_url}/api/slices/export", headers=self.headers, params=params,
+                          stream=True, verify=False, timeout=(10, 300)) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"Error al exportar slices: {response.status_code} - {response.text}")
+            for line in response.iter_lines(chunk_size=64 * 1024):
+                if line:
+                    yield json.loads(line)
+
+    def _replica(self) -> SliceReplica:
+        with _replicas_lock:
+            return _replicas.setdefault((self.api_url, self.token), SliceReplica())
+
+    def listen_events(self, on_change: Optional[Callable] = None, owner: Optional[str] = None) -> SliceEventListener:
+        """
+        Arranca un SliceEventListener: list_all_slices deja de consultar al
+        servidor mientras el stream esté conectado. Detener con .stop().
+        """
+        listener = SliceEventListener(self, on_change, owner)
+        listener.start()
+        return listener
+
+    def sync_replica(self) -> Optional[List[Dict]]:
+        """
+        Pone al día la réplica local con los cambios desde la última sincronización
+        y devuelve sus slices. None si el servidor no ofrece /api/slices/changes.
+        """
+        replica = self._replica()
+        if not replica.supported:
+            return None
+        with replica.lock:
+            if replica.live:
+                # Un SliceEventListener ya la tiene al día
+                return list(replica.slices.values())
+            params = {"since": replica.seq}
+            if replica.epoch:
+                params["epoch"] = replica.epoch
+            response = requests.get(f"{self.api_url}/api/slices/changes", headers=self.headers,
+                                    params=params, verify=False, timeout=20)
+            if response.status_code in (404, 405):
+                replica.supported = False
+                return None
+            if response.status_code != 200:
+                print(f"[ERROR] Error al sincronizar slices: {response.status_code} - {response.text}")
+                return None
+            replica.apply(response.json())
+            return list(replica.slices.values())
     
     def create_slice(self, nombre: str, topologia: str, vms_data: List[Dict]) -> Optional[Dict]:
         """
@@ -261,15 +714,10 @@ class SliceAPIService:
             Datos detallados del slice o None
         """
         try:
-            response = requests.get(
-                f"{self.api_url}/slices/{slice_id}",
-                headers=self.headers,
-                verify=False,
-                timeout=10
-            )
+            status_code, data, _ = self._get_json(f"/slices/{slice_id}", timeout=10)
             
-            if response.status_code == 200:
-                return response.json()
+            if status_code == 200:
+                return data
             else:
                 # print(f"[ERROR] Error al obtener detalles: {response.status_code}")
                 return self._get_slice_details_from_local(slice_id)
@@ -336,24 +784,24 @@ class SliceAPIService:
             print(f"[ERROR] Error al eliminar slice: {e}")
             return False
     
-    def pausar_slice(self, slice_id: int) -> dict:
+    def pausar_slice(self, slice_id: int, idempotency_key: Optional[str] = None) -> dict:
         """
         Pausar un slice
         
         Args:
             slice_id: ID del slice a pausar
+            idempotency_key: clave de la operación (se genera una si no se pasa)
             
         Returns:
             dict con {"ok": bool, "message": str, "error": str (opcional)}
         """
         try:
             payload = {"slice_id": slice_id}
-            response = requests.post(
-                f"{self.api_url}/slices/pausar_slice",
-                headers=self.headers,
-                json=payload,
-                verify=False,
-                timeout=30  # Aumentado a 30 segundos
+            response = self._post_idempotente(
+                "/slices/pausar_slice",
+                payload,
+                timeout=30,  # Aumentado a 30 segundos
+                idempotency_key=idempotency_key
             )
             
             if response.status_code == 200:
@@ -369,24 +817,24 @@ class SliceAPIService:
         except Exception as e:
             return {"ok": False, "error": f"Error al pausar slice: {str(e)}"}
     
-    def reanudar_slice(self, slice_id: int) -> dict:
+    def reanudar_slice(self, slice_id: int, idempotency_key: Optional[str] = None) -> dict:
         """
         Reanudar un slice
         
         Args:
             slice_id: ID del slice a reanudar
+            idempotency_key: clave de la operación (se genera una si no se pasa)
             
         Returns:
             dict con {"ok": bool, "message": str, "error": str (opcional)}
         """
         try:
             payload = {"slice_id": slice_id}
-            response = requests.post(
-                f"{self.api_url}/slices/reanudar_slice",
-                headers=self.headers,
-                json=payload,
-                verify=False,
-                timeout=30  # Aumentado a 30 segundos
+            response = self._post_idempotente(
+                "/slices/reanudar_slice",
+                payload,
+                timeout=30,  # Aumentado a 30 segundos
+                idempotency_key=idempotency_key
             )
             
             if response.status_code == 200:
@@ -402,24 +850,24 @@ class SliceAPIService:
         except Exception as e:
             return {"ok": False, "error": f"Error al reanudar slice: {str(e)}"}
     
-    def eliminar_slice(self, slice_id):
+    def eliminar_slice(self, slice_id, idempotency_key: Optional[str] = None):
         """
         Eliminar un slice
         
         Args:
             slice_id: ID del slice a eliminar
+            idempotency_key: clave de la operación (se genera una si no se pasa)
             
         Returns:
             dict con {"ok": bool, "message": str, "error": str (opcional)}
         """
         try:
             payload = {"slice_id": slice_id}
-            response = requests.post(
-                f"{self.api_url}/slices/eliminar_slice",
-                headers=self.headers,
-                json=payload,
-                verify=False,
-                timeout=30  # Aumentado a 30 segundos
+            response = self._post_idempotente(
+                "/slices/eliminar_slice",
+                payload,
+                timeout=30,  # Aumentado a 30 segundos
+                idempotency_key=idempotency_key
             )
             
             if response.status_code == 200:
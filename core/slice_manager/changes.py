@@ -0,0 +1,55 @@
+"""
+Registro acotado de los últimos cambios de slices, para sincronización
+incremental (GET /api/slices/changes?since=<seq>) y para el stream de
+eventos (GET /api/slices/events).
+"""
+
+import threading
+from collections import deque
+from typing import List, Optional, Tuple
+
+# (seq, evento, slice_id, owner); evento es "create", "status" o "delete".
+# El owner se guarda para poder filtrar por usuario aunque el slice ya no exista
+Change = Tuple[int, str, str, str]
+
+
+class ChangeLog:
+    """
+    Anillo con los últimos `maxlen` cambios. `floor` es la secuencia a partir de
+    la cual el anillo está completo: quien pida cambios desde antes (o desde
+    otra época del servidor) tiene que resincronizar con el listado completo.
+    """
+
+    def __init__(self, maxlen: int = 1000):
+        self._ring: deque = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.floor = 0
+
+    def record(self, seq: int, evento: str, slice_id: str, owner: str = ''):
+        with self._lock:
+            if len(self._ring) == self._ring.maxlen:
+                # Se descarta el más viejo: ya no se puede responder desde antes de él
+                self.floor = self._ring[0][0]
+            self._ring.append((seq, evento, slice_id, owner))
+
+    def reset(self, seq: int):
+        """Descartar todo (p. ej. la base cambió desde otro proceso)"""
+        with self._lock:
+            self._ring.clear()
+            self.floor = seq
+
+    def since(self, seq: int) -> Optional[List[Change]]:
+        """Cambios con secuencia > seq, o None si el anillo ya no los cubre"""
+        with self._lock:
+            if seq < self.floor:
+                return None
+            return [change for change in self._ring if change[0] > seq]
+
+    @staticmethod
+    def coalesce(changes: List[Change]) -> List[Change]:
+        """Un solo cambio por slice (el último), en orden de secuencia"""
+        last = {}
+        for change in changes:
+            last.pop(change[2], None)
+            last[change[2]] = change
+        return list(last.values())
@@ -0,0 +1,260 @@
+"""
+Vista columnar de todas las VMs del SliceManager para consultas sobre toda la
+flota (cores, RAM y disco por owner, imagen, flavor, estado o topología) sin
+recorrer cada Slice.vms.
+
+Las columnas se guardan en array.array (crecen sin copiar toda la tabla en
+cada alta); si NumPy está instalado las consultas se hacen vectorizadas sobre
+vistas sin copia de esos buffers, si no con un recorrido en Python puro.
+"""
+
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .index import _topology_key
+
+# Columnas categóricas (se guardan como códigos enteros) y numéricas
+CATEGORICAL = ('owner', 'image', 'flavor', 'status', 'topology')
+NUMERIC = ('cpu', 'memory', 'disk')
+
+
+class _Categories:
+    """Diccionario valor <-> código de una columna categórica"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def encode(self, value) -> int:
+        value = '' if value is None else str(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def lookup(self, value) -> Optional[int]:
+        return self.codes.get('' if value is None else str(value))
+
+
+class VMTable:
+    """
+    Tabla columnar de VMs: una fila por VM, con cpu/memory/disk numéricos y
+    owner/image/flavor/status/topology como códigos categóricos.
+
+    Se mantiene incrementalmente con on_change() (registrado como listener del
+    SliceManager). Las bajas marcan filas como muertas; la tabla se compacta
+    cuando la mitad de las filas están muertas.
+    """
+
+    COMPACT_MIN_ROWS = 1024
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.generation = None
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.columns = {name: array('q') for name in NUMERIC + CATEGORICAL}
+            self.alive = array('b')
+            self.categories = {name: _Categories() for name in CATEGORICAL}
+            self.slice_ids: List[str] = []
+            self.vm_names: List[str] = []
+            self._rows_by_slice: Dict[str, List[int]] = {}
+            self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self.alive) - self._dead
+
+    def load(self, slices, generation=None):
+        """Reconstruye la tabla completa a partir de una lista de slices"""
+        with self._lock:
+            self.clear()
+            for slice_obj in slices:
+                self.add_slice(slice_obj)
+            self.generation = generation
+
+    def add_slice(self, slice_obj):
+        with self._lock:
+            if slice_obj.id in self._rows_by_slice:
+                self.remove_slice(slice_obj.id)
+            owner = self.categories['owner'].encode(slice_obj.owner)
+            status = self.categories['status'].encode(slice_obj.status)
+            topology = self.categories['topology'].encode(_topology_key(slice_obj.topology))
+            rows = self._rows_by_slice.setdefault(slice_obj.id, [])
+            for vm in slice_obj.vms:
+                rows.append(len(self.alive))
+                self.columns['cpu'].append(int(vm.cpu or 0))
+                self.columns['memory'].append(int(vm.memory or 0))
+                self.columns['disk'].append(int(vm.disk or 0))
+                self.columns['owner'].append(owner)
+                self.columns['image'].append(self.categories['image'].encode(vm.imagen))
+                self.columns['flavor'].append(self.categories['flavor'].encode(vm.flavor))
+                self.columns['status'].append(status)
+                self.columns['topology'].append(topology)
+                self.alive.append(1)
+                self.slice_ids.append(slice_obj.id)
+                self.vm_names.append(vm.name)
+
+    def remove_slice(self, slice_id: str):
+        with self._lock:
+            rows = self._rows_by_slice.pop(slice_id, None)
+            if not rows:
+                return
+            for row in rows:
+                self.alive[row] = 0
+            self._dead += len(rows)
+            if self._dead >= self.COMPACT_MIN_ROWS and self._dead * 2 >= len(self.alive):
+                self._compact()
+
+    def set_status(self, slice_id: str, status: str):
+        with self._lock:
+            code = self.categories['status'].encode(status)
+            column = self.columns['status']
+            for row in self._rows_by_slice.get(slice_id, ()):
+                column[row] = code
+
+    def on_change(self, evento: str, slice_obj):
+        """Listener del SliceManager: aplica una mutación a la tabla"""
+        if evento == 'create':
+            self.add_slice(slice_obj)
+        elif evento == 'delete':
+            self.remove_slice(slice_obj.id)
+        elif evento == 'status':
+            self.set_status(slice_obj.id, slice_obj.status)
+
+    def _compact(self):
+        """Descarta las filas muertas reconstruyendo las columnas"""
+        keep = [row for row, vivo in enumerate(self.alive) if vivo]
+        self.columns = {name: array('q', (column[row] for row in keep))
+                        for name, column in self.columns.items()}
+        self.alive = array('b', [1]) * len(keep)
+        self.slice_ids = [self.slice_ids[row] for row in keep]
+        self.vm_names = [self.vm_names[row] for row in keep]
+        self._rows_by_slice = {}
+        for new_row, slice_id in enumerate(self.slice_ids):
+            self._rows_by_slice.setdefault(slice_id, []).append(new_row)
+        self._dead = 0
+
+    # === Consultas ===
+
+    @property
+    def _vectorized(self) -> bool:
+        return np is not None and len(self.alive) > 0
+
+    def _codes_for(self, column: str, value) -> List[int]:
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        codes = [self.categories[column].lookup(v) for v in values]
+        return [code for code in codes if code is not None]
+
+    def _check_where(self, where: Optional[dict]) -> dict:
+        where = {k: v for k, v in (where or {}).items() if v is not None}
+        for key in where:
+            column = key[:-4] if key.endswith(('_min', '_max')) else key
+            if column not in CATEGORICAL and column not in NUMERIC:
+                raise ValueError(f"Columna desconocida: {key}")
+        return where
+
+    def _mask_numpy(self, where: dict):
+        """Máscara booleana de filas vivas que cumplen el filtro (vectorizada)"""
+        mask = np.frombuffer(self.alive, dtype=np.int8).astype(bool)
+        for key, value in where.items():
+            if key.endswith(('_min', '_max')):
+                column = np.frombuffer(self.columns[key[:-4]], dtype=np.int64)
+                mask &= column >= value if key.endswith('_min') else column <= value
+            elif key in NUMERIC:
+                mask &= np.frombuffer(self.columns[key], dtype=np.int64) == value
+            else:
+                column = np.frombuffer(self.columns[key], dtype=np.int64)
+                mask &= np.isin(column, self._codes_for(key, value))
+        return mask
+
+    def _rows_python(self, where: dict) -> List[int]:
+        """Filas vivas que cumplen el filtro (sin NumPy)"""
+        checks = []
+        for key, value in where.items():
+            if key.endswith('_min'):
+                checks.append((self.columns[key[:-4]], lambda v, lim=value: v >= lim))
+            elif key.endswith('_max'):
+                checks.append((self.columns[key[:-4]], lambda v, lim=value: v <= lim))
+            elif key in NUMERIC:
+                checks.append((self.columns[key], lambda v, ref=value: v == ref))
+            else:
+                codes = set(self._codes_for(key, value))
+                checks.append((self.columns[key], lambda v, codes=codes: v in codes))
+        return [row for row, vivo in enumerate(self.alive)
+                if vivo and all(check(column[row]) for column, check in checks)]
+
+    def aggregate(self, by: Optional[str] = None, where: Optional[dict] = None) -> dict:
+        """
+        Totales de VMs, cores, RAM (MB) y disco (GB). Con `by` (owner, image,
+        flavor, status o topology) devuelve un dict valor -> totales.
+
+        `where` filtra por columnas categóricas (valor o lista de valores) y
+        numéricas (igualdad, o rangos con sufijo _min/_max: {"cpu_min": 2}).
+        """
+        if by is not None and by not in CATEGORICAL:
+            raise ValueError(f"No se puede agrupar por '{by}'")
+        with self._lock:
+            where = self._check_where(where)
+            if self._vectorized:
+                return self._aggregate_numpy(by, self._mask_numpy(where))
+            return self._aggregate_python(by, self._rows_python(where))
+
+    def _aggregate_numpy(self, by, mask) -> dict:
+        numeric = {name: np.frombuffer(self.columns[name], dtype=np.int64)[mask] for name in NUMERIC}
+        if by is None:
+            result = {'vms': int(mask.sum())}
+            result.update({name: int(values.sum()) for name, values in numeric.items()})
+            return result
+        codes = np.frombuffer(self.columns[by], dtype=np.int64)[mask]
+        size = len(self.categories[by].values)
+        counts = np.bincount(codes, minlength=size)
+        sums = {name: np.bincount(codes, weights=values, minlength=size) for name, values in numeric.items()}
+        return {
+            value: dict({'vms': int(counts[code])}, **{name: int(sums[name][code]) for name in NUMERIC})
+            for code, value in enumerate(self.categories[by].values) if counts[code]
+        }
+
+    def _aggregate_python(self, by, rows: List[int]) -> dict:
+        groups = {}
+        values = self.categories[by].values if by is not None else None
+        for row in rows:
+            key = values[self.columns[by][row]] if by is not None else None
+            totals = groups.get(key)
+            if totals is None:
+                totals = groups[key] = {'vms': 0, 'cpu': 0, 'memory': 0, 'disk': 0}
+            totals['vms'] += 1
+            for name in NUMERIC:
+                totals[name] += self.columns[name][row]
+        if by is None:
+            return groups.get(None, {'vms': 0, 'cpu': 0, 'memory': 0, 'disk': 0})
+        return groups
+
+    def select(self, where: Optional[dict] = None, limit: Optional[int] = None) -> List[dict]:
+        """Filas (una por VM) que cumplen el filtro, con sus valores decodificados"""
+        with self._lock:
+            where = self._check_where(where)
+            if self._vectorized:
+                rows = np.flatnonzero(self._mask_numpy(where)).tolist()
+            else:
+                rows = self._rows_python(where)
+            if limit is not None:
+                rows = rows[:limit]
+            result = []
+            for row in rows:
+                item = {'slice_id': self.slice_ids[row], 'vm': self.vm_names[row]}
+                for name in NUMERIC:
+                    item[name] = self.columns[name][row]
+                for name in CATEGORICAL:
+                    item[name] = self.categories[name].values[self.columns[name][row]]
+                result.append(item)
+            return result
@@ -0,0 +1,126 @@
+import threading
+from typing import Dict, List, Optional
+from .models import Slice
+from .loader import LazySlice
+
+
+def _topology_key(topology) -> str:
+    """Normaliza la topología (enum o string) para usarla como clave de índice"""
+    return topology.value if hasattr(topology, 'value') else str(topology)
+
+
+class SliceIndex:
+    """
+    Almacén en memoria de slices indexado por id.
+
+    Mantiene un diccionario principal id -> Slice y tres índices secundarios
+    (owner, status, topología). Los índices secundarios guardan los ids en un
+    dict (conjunto ordenado) para conservar el orden de inserción al listar.
+
+    Las entradas pueden ser LazySlice (solo los campos indexados y la posición
+    en el snapshot): se reemplazan por el Slice completo al primer acceso.
+    """
+
+    def __init__(self):
+        self._hydrate_lock = threading.Lock()
+        self._by_id: Dict[str, Slice] = {}
+        self._by_owner: Dict[str, Dict[str, None]] = {}
+        self._by_status: Dict[str, Dict[str, None]] = {}
+        self._by_topology: Dict[str, Dict[str, None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, slice_id: str) -> bool:
+        return slice_id in self._by_id
+
+    @staticmethod
+    def _link(index: Dict[str, Dict[str, None]], key, slice_id: str):
+        index.setdefault(key, {})[slice_id] = None
+
+    @staticmethod
+    def _unlink(index: Dict[str, Dict[str, None]], key, slice_id: str):
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(slice_id, None)
+            if not bucket:
+                del index[key]
+
+    def add(self, slice_obj: Slice):
+        """Agrega (o reemplaza) un slice manteniendo los índices secundarios"""
+        if slice_obj.id in self._by_id:
+            self.remove(slice_obj.id)
+        self._by_id[slice_obj.id] = slice_obj
+        self._link(self._by_owner, slice_obj.owner, slice_obj.id)
+        self._link(self._by_status, slice_obj.status, slice_obj.id)
+        self._link(self._by_topology, _topology_key(slice_obj.topology), slice_obj.id)
+
+    def remove(self, slice_id: str) -> Optional[Slice]:
+        slice_obj = self._by_id.pop(slice_id, None)
+        if slice_obj is None:
+            return None
+        self._unlink(self._by_owner, slice_obj.owner, slice_id)
+        self._unlink(self._by_status, slice_obj.status, slice_id)
+        self._unlink(self._by_topology, _topology_key(slice_obj.topology), slice_id)
+        return slice_obj
+
+    def set_status(self, slice_id: str, status: str) -> bool:
+        slice_obj = self._by_id.get(slice_id)
+        if slice_obj is None:
+            return False
+        if slice_obj.status != status:
+            self._unlink(self._by_status, slice_obj.status, slice_id)
+            slice_obj.status = status
+            self._link(self._by_status, status, slice_id)
+        return True
+
+    def _hydrate(self, slice_id: str, entry) -> Slice:
+        """Construye el Slice completo de una entrada perezosa y lo deja en el índice"""
+        with self._hydrate_lock:
+            current = self._by_id.get(slice_id)
+            if not isinstance(current, LazySlice):
+                return current if current is not None else entry.hydrate()
+            slice_obj = current.hydrate()
+            self._by_id[slice_id] = slice_obj
+            return slice_obj
+
+    def get(self, slice_id: str) -> Optional[Slice]:
+        slice_obj = self._by_id.get(slice_id)
+        if isinstance(slice_obj, LazySlice):
+            return self._hydrate(slice_id, slice_obj)
+        return slice_obj
+
+    def all(self) -> List[Slice]:
+        return [self._hydrate(slice_id, slice_obj) if isinstance(slice_obj, LazySlice) else slice_obj
+                for slice_id, slice_obj in list(self._by_id.items())]
+
+    def entries(self) -> list:
+        """Entradas tal como están (Slice o LazySlice), sin hidratar"""
+        return list(self._by_id.values())
+
+    def loaded(self) -> int:
+        """Cantidad de slices ya hidratados"""
+        return sum(1 for slice_obj in self._by_id.values() if not isinstance(slice_obj, LazySlice))
+
+    def ids(self) -> List[str]:
+        return list(self._by_id)
+
+    def _resolve(self, bucket: Optional[Dict[str, None]]) -> List[Slice]:
+        if not bucket:
+            return []
+        return [self.get(slice_id) for slice_id in bucket]
+
+    def by_owner(self, owner: str) -> List[Slice]:
+        return self._resolve(self._by_owner.get(owner))
+
+    def by_status(self, status: str) -> List[Slice]:
+        return self._resolve(self._by_status.get(status))
+
+    def by_topology(self, topology) -> List[Slice]:
+        return self._resolve(self._by_topology.get(_topology_key(topology)))
+
+    def clear(self):
+        self._by_id.clear()
+        self._by_owner.clear()
+        self._by_status.clear()
+        self._by_topology.clear()
@@ -0,0 +1,62 @@
+import json
+import os
+from typing import Iterator
+
+
+class SliceJournal:
+    """
+    Log append-only de mutaciones de slices (una línea JSON por registro).
+
+    Se guarda junto al snapshot (base_de_datos.journal) y se vacía cada vez que
+    el SliceManager compacta el log en un snapshot nuevo, o cuando los helpers
+    del CLI (shared.data_store) reescriben el snapshot con el log ya aplicado
+    (ver apply_journal). Los registros son idempotentes, así que volver a
+    aplicarlos sobre un snapshot que ya los incluye no cambia el resultado.
+
+    Con fsync (por defecto) cada registro llega al disco antes de que append
+    vuelva: una mutación confirmada sobrevive a un corte de luz aunque el
+    snapshot todavía no la incluya. SLICE_JOURNAL_FSYNC=0 lo desactiva
+    (más rápido, pero un corte puede perder las últimas mutaciones).
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self.records = self._count_records()
+
+    def _count_records(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'rb') as f:
+            return sum(1 for line in f if line.strip())
+
+    def append(self, record: dict):
+        """Agrega un registro al final del log"""
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self.records += 1
+
+    def replay(self) -> Iterator[dict]:
+        """Recorre los registros del log en orden de escritura"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for num, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Una línea incompleta solo puede venir de una escritura interrumpida
+                    print(f"[ERROR] Registro inválido en {self.path}:{num}, se ignora")
+
+    def reset(self):
+        """Vacía el log después de compactarlo en el snapshot"""
+        with open(self.path, 'w', encoding='utf-8'):
+            pass
+        self.records = 0
@@ -0,0 +1,151 @@
+"""
+Carga incremental de base_de_datos.json: los registros se parsean de a uno
+(sin cargar la lista completa con json.load) y los Slice/VM se construyen
+recién cuando alguien los pide.
+"""
+
+import json
+import os
+import weakref
+from typing import Iterator, Tuple
+
+from ..snapshot_format import is_compact, is_header, to_legacy
+
+_WHITESPACE = ' \t\n\r'
+_decoder = json.JSONDecoder()
+
+
+def iter_raw_records(path: str, chunk_size: int = 1 << 20) -> Iterator[Tuple[dict, int, int]]:
+    """
+    Recorre los objetos de nivel superior de un archivo JSON devolviendo
+    (registro, offset_en_bytes, largo_en_bytes) sin materializar todo el archivo.
+
+    Acepta tanto una lista JSON ([{...}, {...}]) como un objeto por línea (JSON Lines).
+    """
+    # newline='': sin traducir \r\n, para que los offsets coincidan con los bytes del archivo
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        buf = f.read(chunk_size)
+        eof = not buf
+        pos = 0
+        byte_pos = 0  # offset en bytes de buf[pos] dentro del archivo
+        while True:
+            # Saltar separadores entre registros (siempre ASCII: 1 byte por carácter)
+            start = pos
+            while pos < len(buf) and (buf[pos] in _WHITESPACE or buf[pos] in '[,'):
+                pos += 1
+            byte_pos += pos - start
+            if pos >= len(buf):
+                if eof:
+                    return
+                buf, pos = f.read(chunk_size), 0
+                eof = not buf
+                continue
+            if buf[pos] == ']':
+                return
+            try:
+                record, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # El registro quedó cortado al final del bloque: leer más y reintentar
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            length = len(buf[pos:end].encode('utf-8'))
+            yield record, byte_pos, length
+            byte_pos += length
+            pos = end
+
+
+class SnapshotFile:
+    """
+    Descriptor abierto sobre un snapshot concreto. Como las escrituras reemplazan
+    el archivo con un rename, los offsets siguen siendo válidos sobre este
+    descriptor aunque base_de_datos.json ya apunte a una versión nueva.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.compact = is_compact(path)
+        self.fd = os.open(path, os.O_RDONLY)
+        self._finalizer = weakref.finalize(self, os.close, self.fd)
+
+    def read(self, offset: int, length: int) -> dict:
+        """Registro en la posición dada, siempre en formato legado"""
+        item = json.loads(os.pread(self.fd, length, offset).decode('utf-8'))
+        return to_legacy(item) if self.compact else item
+
+    def close(self):
+        self._finalizer()
+
+
+class LazySlice:
+    """
+    Entrada liviana del índice: solo id, owner, estado, topología y la posición
+    del registro en el snapshot. SliceIndex la reemplaza por el Slice completo
+    la primera vez que se accede.
+    """
+
+    __slots__ = ('id', 'owner', 'status', 'topology', 'snapshot', 'offset', 'length')
+
+    def __init__(self, slice_id: str, owner: str, status: str, topology: str,
+                 snapshot: SnapshotFile, offset: int, length: int):
+        self.id = slice_id
+        self.owner = owner
+        self.status = status
+        self.topology = topology
+        self.snapshot = snapshot
+        self.offset = offset
+        self.length = length
+
+    @classmethod
+    def from_record(cls, slice_id: str, item: dict, snapshot: SnapshotFile,
+                    offset: int, length: int) -> 'LazySlice':
+        topologias = item.get('topologias', [])
+        topo = topologias[0] if topologias else {}
+        return cls(slice_id, item.get('owner', ''), item.get('estado', 'activa'),
+                   topo.get('nombre', 'lineal'), snapshot, offset, length)
+
+    def raw_record(self) -> dict:
+        """Registro original del snapshot con el id y el estado actuales"""
+        item = self.snapshot.read(self.offset, self.length)
+        item['id_slice'] = self.id
+        item['estado'] = self.status
+        return item
+
+    def hydrate(self):
+        from .storage import record_to_slice
+        return record_to_slice(self.raw_record(), self.id)
+
+
+def iter_lazy_slices(path: str) -> Iterator:
+    """
+    Construye las entradas livianas de un snapshot, asignando ids a registros antiguos.
+
+    En Windows no se puede renombrar encima de un archivo abierto ni hay pread:
+    ahí los slices se construyen completos mientras se recorre el archivo.
+    """
+    if not os.path.exists(path):
+        return
+    lazy = hasattr(os, 'pread')
+    snapshot = SnapshotFile(path) if lazy else None
+    compact = is_compact(path)
+    vistos = set()
+    for idx, (item, offset, length) in enumerate(iter_raw_records(path)):
+        if compact:
+            # La cabecera del formato compacto no es un slice ni cuenta para los ids
+            if idx == 0 and is_header(item):
+                continue
+            idx -= 1
+            item = to_legacy(item)
+        slice_id = str(item.get('id_slice', '') or '')
+        # Los registros antiguos no guardaban id: asignar uno estable por posición
+        if not slice_id or slice_id in vistos:
+            slice_id = f"slice_{idx + 1}"
+        vistos.add(slice_id)
+        if lazy:
+            yield LazySlice.from_record(slice_id, item, snapshot, offset, length)
+        else:
+            from .storage import record_to_slice
+            yield record_to_slice(item, slice_id)
@@ -1,108 +1,173 @@
-import json
-import os
 from datetime import datetime
-from typing import List, Optional
+from typing import Iterator, List, Optional, Tuple
 from .models import Slice, VM, SliceCreate, TopologyType, TopologySegment, FlavorType
+from .storage import SliceStorage, create_storage, debug, DEFAULT_JSON_FILE
+from .columnar import VMTable
+from .changes import ChangeLog, Change
+from ..ipam import IPAM, ips_guardadas
+from ..pools import VLANAllocator
+import os
+import threading
 import uuid
 
 
 class SliceManager:
-    def __init__(self):
-        # Buscar base_de_datos.json en el directorio raíz del proyecto
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(os.path.dirname(current_dir))
-        self.database_file = os.path.join(project_root, "base_de_datos.json")
-        self.slices: List[Slice] = self._load_slices()
-    
-    def _load_slices(self) -> List[Slice]:
-        slices = []
-        if os.path.exists(self.database_file):
+    def __init__(self, storage: Optional[SliceStorage] = None, ipam: Optional[IPAM] = None,
+                 vlans: Optional[VLANAllocator] = None):
+        # El backend se elige con SLICE_STORAGE (json por defecto, o sqlite)
+        self.storage = storage if storage is not None else create_storage()
+        # Subred por slice e IPs de sus VMs (ipam.json); la primera vez reserva las ya usadas
+        self.ipam = ipam if ipam is not None else IPAM(existentes=self._ips_existentes)
+        # VLAN del slice, estable mientras exista (vlans.json)
+        self.vlans = vlans if vlans is not None else VLANAllocator()
+        # Compatibilidad: ruta del snapshot JSON cuando el backend es json
+        self.database_file = getattr(self.storage, 'database_file', DEFAULT_JSON_FILE)
+        # Funciones llamadas como listener(evento, slice) tras cada mutación:
+        # evento es "create", "delete" o "status" ("reload" con un slice vacío
+        # si el watcher perdió cambios de otros procesos)
+        self._listeners = []
+        # Secuencia de cambios: crece con cada mutación hecha por este manager
+        self._seq = 0
+        self._seq_lock = threading.Lock()
+        # Identifica esta instancia: las secuencias de otra (p. ej. antes de un reinicio) no valen
+        self._epoch = uuid.uuid4().hex[:12]
+        # Últimos cambios para la sincronización incremental (SLICE_CHANGES_MAX, 1000 por defecto)
+        self.changes = ChangeLog(int(os.getenv('SLICE_CHANGES_MAX', '1000')))
+        self._changes_generation = self.storage.generation
+        self._watcher = None
+        self._watch_stop = threading.Event()
+        self._vm_table = None
+        self._vm_table_lock = threading.Lock()
+
+    @property
+    def seq(self) -> int:
+        """Secuencia del último cambio (la de la base si el backend la comparte entre procesos)"""
+        if self.storage.shared_changes:
+            return self.storage.last_change()
+        return self._seq
+
+    @property
+    def epoch(self) -> str:
+        return self.storage.epoch if self.storage.shared_changes else self._epoch
+
+    def add_listener(self, listener):
+        """Registrar un listener(evento, slice) que se llama después de cada mutación"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, evento: str, slice_obj: Slice):
+        if not self.storage.shared_changes:
+            # Con un backend compartido el cambio ya quedó anotado en la base
+            with self._seq_lock:
+                self._seq += 1
+                self.changes.record(self._seq, evento, slice_obj.id, slice_obj.owner)
+        self._call_listeners(evento, slice_obj)
+
+    def _call_listeners(self, evento: str, slice_obj: Slice):
+        for listener in list(self._listeners):
             try:
-                with open(self.database_file, 'r', encoding='utf-8') as f:
-                    json_data = json.load(f)
-                    if json_data:
-                        for item in json_data:
-                            slice_id = item.get('id_slice', '')
-                            topologias = item.get('topologias', [])
-                            # Tomar la primera topología como principal
-                            topo = topologias[0] if topologias else {}
-                            vms = []
-                            for vm_data in topo.get('vms', []):
-                                # Permitir valores decimales en almacenamiento
-                                almacenamiento_str = vm_data.get('almacenamiento', '1G').replace('G','')
-                                try:
-                                    disk_val = int(float(almacenamiento_str))
-                                except Exception:
-                                    disk_val = 1
-                                vm = VM(
-                                    id=vm_data.get('nombre', ''),
-                                    name=vm_data.get('nombre', ''),
-                                    cpu=int(vm_data.get('cores', '1')),
-                                    memory=int(vm_data.get('ram', '512M').replace('M','')),
-                                    disk=disk_val,
-                                    flavor=vm_data.get('image', 'f1'),
-                                    conexion_remota=vm_data.get('acceso', 'no'),
-                                    imagen=vm_data.get('image', '')
-                                )
-                                vms.append(vm)
-                            slice_obj = Slice(
-                                id=slice_id,
-                                name=slice_id,
-                                topology=topo.get('nombre', 'lineal'),
-                                vms=vms,
-                                owner=item.get('owner', ''),
-                                created_at=datetime.now(),
-                                status='activa',  # Estado por defecto: activa
-                                salida_internet=topo.get('internet', 'no')
-                            )
-                            slices.append(slice_obj)
+                listener(evento, slice_obj)
             except Exception as e:
-                print(f"Error loading database JSON slices: {e}")
-        print(f"[DEBUG] Cargados {len(slices)} slices desde {self.database_file}")
-        return slices
-    
-    def _save_slices(self):
-        """Guardar todos los slices en base_de_datos.json en el formato ejemplo (lista de objetos)"""
-        import uuid
-        data = []
-        for idx, slice in enumerate(self.slices):
-            vms_data = []
-            for vm in slice.vms:
-                vms_data.append({
-                    "nombre": getattr(vm, 'name', ''),
-                    "cores": str(getattr(vm, 'cpu', 1)),
-                    "ram": f"{getattr(vm, 'memory', 512)}M",
-                    "almacenamiento": f"{getattr(vm, 'disk', 1)}G",
-                    "puerto_vnc": "",
-                    "image": getattr(vm, 'imagen', ''),
-                    "conexiones_vlans": "",
-                    "acceso": getattr(vm, 'conexion_remota', 'no'),
-                    "server": ""
-                })
-            cantidad_vms = str(len(vms_data))
-            topologia_nombre = getattr(slice, 'topology', 'lineal')
-            if hasattr(topologia_nombre, 'value'):
-                topologia_nombre = topologia_nombre.value
-            salida_internet = getattr(slice, 'salida_internet', 'no')
-            topologia_obj = {
-                "nombre": topologia_nombre,
-                "cantidad_vms": cantidad_vms,
-                "internet": salida_internet,
-                "vms": vms_data
-            }
-            new_slice = {
-                "id_slice": "",
-                "cantidad_vms": cantidad_vms,
-                "vlans_separadas": str(idx + 1),
-                "vlans_usadas": "",
-                "vncs_separadas": "",
-                "conexión_topologias": "",
-                "topologias": [topologia_obj]
-            }
-            data.append(new_slice)
-        with open(self.database_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"[DEBUG] Guardados {len(data)} slices en {self.database_file}")
+                print(f"[ERROR] Listener de slices falló en '{evento}': {e}")
+
+    def changes_since(self, since: int) -> Tuple[int, Optional[List[Change]]]:
+        """
+        (seq actual, cambios posteriores a `since`, uno por slice). Los cambios
+        son None si hay que resincronizar: `since` es demasiado viejo, es de
+        otra época, o la base se recargó porque la modificó otro proceso.
+        """
+        if self.storage.shared_changes:
+            seq = self.storage.last_change()
+            changes = self.storage.changes_since(since, seq) if since <= seq else None
+            return seq, (ChangeLog.coalesce(changes) if changes is not None else None)
+        self.storage.refresh()
+        with self._seq_lock:
+            if self.storage.generation != self._changes_generation:
+                # Los cambios de otro proceso no pasaron por _notify
+                self._changes_generation = self.storage.generation
+                self._seq += 1
+                self.changes.reset(self._seq)
+            if since > self._seq:
+                return self._seq, None
+            changes = self.changes.since(since)
+        return self._seq, (ChangeLog.coalesce(changes) if changes is not None else None)
+
+    def start_watcher(self, interval: float = None):
+        """
+        Con un backend compartido (SQLite con varios workers) avisa a los
+        listeners también de los cambios hechos por otros procesos, leyendo el
+        registro de cambios de la base cada SLICE_WATCH_INTERVAL segundos (0.5).
+        """
+        if not self.storage.shared_changes or self._watcher is not None:
+            return
+        interval = interval or float(os.getenv('SLICE_WATCH_INTERVAL', '0.5'))
+        self.storage.track_own_changes = True
+        self._watch_stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="slice-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        if self._watcher is not None:
+            self._watch_stop.set()
+            self._watcher.join()
+            self._watcher = None
+            self.storage.track_own_changes = False
+
+    def _watch(self, interval: float):
+        last = self.storage.last_change()
+        while not self._watch_stop.wait(interval):
+            try:
+                seq = self.storage.last_change()
+                if seq <= last:
+                    continue
+                changes = self.storage.changes_since(last, seq)
+                last = seq
+                if changes is None:
+                    self._call_listeners('reload', Slice(id='', name='', topology='', vms=[], owner='', created_at=''))
+                    continue
+                for change_seq, evento, slice_id, owner in changes:
+                    if self.storage.is_own_change(change_seq):
+                        continue
+                    slice_obj = self.storage.get(slice_id) if evento != 'delete' else None
+                    if slice_obj is None:
+                        slice_obj = Slice(id=slice_id, name='', topology='', vms=[], owner=owner, created_at='')
+                    self._call_listeners(evento, slice_obj)
+            except Exception as e:
+                print(f"[ERROR] Watcher de cambios de slices: {e}")
+
+    def vm_table(self) -> VMTable:
+        """
+        Vista columnar de todas las VMs (ver VMTable). Se construye la primera vez
+        y después se mantiene con las mutaciones de este manager; si otro proceso
+        modificó la base se reconstruye.
+        """
+        with self._vm_table_lock:
+            self.storage.refresh()
+            if self._vm_table is None:
+                self._vm_table = VMTable()
+                self.add_listener(self._vm_table.on_change)
+            if self._vm_table.generation != self.storage.generation:
+                self._vm_table.load(self.storage.all(), self.storage.generation)
+            return self._vm_table
+
+    @property
+    def slices(self) -> List[Slice]:
+        """Lista de slices en orden de inserción (compatibilidad con el atributo anterior)"""
+        return self.storage.all()
+
+    def count(self) -> int:
+        return self.storage.count()
+
+    def flush(self):
+        """Forzar a disco las mutaciones agrupadas pendientes"""
+        self.storage.flush()
+
+    def wait_durable(self, timeout: Optional[float] = None) -> bool:
+        """Punto de durabilidad: espera a que las mutaciones hechas hasta ahora estén en disco"""
+        return self.storage.wait_durable(timeout)
     
     def create_slice(self, slice_data: SliceCreate, owner: str = "cliente", vms_override: list = None) -> Slice:
         """Crear slice de forma síncrona"""
@@ -136,38 +201,65 @@ class SliceManager:
             status="activa"  # Estado por defecto: activa
         )
 
-        self.slices.append(new_slice)
-        self._save_slices()
+        try:
+            new_slice.vlans = self.vlans.allocate(slice_id, existentes=self._vlans_existentes)
+            # IP de cada VM dentro de la subred del slice (valida las que ya traen una)
+            self.ipam.assign(slice_id, vms)
+            self.storage.insert(new_slice)
+        except Exception:
+            self.ipam.release_slice(slice_id)
+            self.vlans.release(slice_id)
+            raise
+        self._notify('create', new_slice)
         
-        print(f"[DEBUG] Slice creado: {slice_id}")
-        print(f"[DEBUG] Total slices en memoria: {len(self.slices)}")
+        debug(f"Slice creado: {slice_id}")
+        debug(f"Total slices en memoria: {self.storage.count()}")
 
         return new_slice
     
+    def _ips_existentes(self) -> Iterator[str]:
+        """IPs de vms.json, del snapshot y de las VMs de este backend (p. ej. SQLite)"""
+        yield from ips_guardadas()
+        for slice_obj in self.storage.iter_slices():
+            for vm in slice_obj.vms:
+                if vm.ip:
+                    yield vm.ip
+
+    def _vlans_existentes(self) -> dict:
+        """VLANs de los slices ya guardados (para crear vlans.json la primera vez)"""
+        return {s.id: s.vlans for s in self.storage.all() if s.vlans}
+
     def get_slices(self, owner: Optional[str] = None) -> List[Slice]:
         if owner:
-            return [s for s in self.slices if s.owner == owner]
-        return self.slices
+            return self.storage.by_owner(owner)
+        return self.storage.all()
+
+    def iter_slices(self, owner: Optional[str] = None) -> Iterator[Slice]:
+        """Recorre los slices uno a uno (para exportar sin armar la lista completa)"""
+        return self.storage.iter_slices(owner)
+
+    def get_slices_by_status(self, status: str) -> List[Slice]:
+        return self.storage.by_status(status)
+
+    def get_slices_by_topology(self, topology) -> List[Slice]:
+        return self.storage.by_topology(topology)
     
     def get_slice(self, slice_id: str) -> Optional[Slice]:
-        for slice in self.slices:
-            if slice.id == slice_id:
-                return slice
-        return None
+        return self.storage.get(slice_id)
     
     def delete_slice(self, slice_id: str) -> bool:
-        original_count = len(self.slices)
-        self.slices = [s for s in self.slices if s.id != slice_id]
-        
-        if len(self.slices) < original_count:
-            self._save_slices()
-            return True
-        return False
+        slice_obj = self.storage.get(slice_id)
+        if slice_obj is None or not self.storage.delete(slice_id):
+            return False
+        self.ipam.release_slice(slice_id)
+        self.vlans.release(slice_id)
+        self._notify('delete', slice_obj)
+        return True
     
     def update_slice_status(self, slice_id: str, status: str) -> bool:
-        slice = self.get_slice(slice_id)
-        if slice:
-            slice.status = status
-            self._save_slices()
-            return True
-        return False
\ No newline at end of file
+        if not self.storage.update_status(slice_id, status):
+            return False
+        slice_obj = self.storage.get(slice_id)
+        if slice_obj is not None:
+            self._notify('status', slice_obj)
+        return True
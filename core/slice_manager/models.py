@@ -1,7 +1,12 @@
-from dataclasses import dataclass, asdict, field
+import sys
+from dataclasses import dataclass, field
 from typing import List, Dict, Optional
 from enum import Enum
 from datetime import datetime
+
+# Los modelos que se tienen en memoria por miles (VM, Slice) usan __slots__:
+# sin __dict__ por instancia ocupan bastante menos memoria (requiere Python 3.10+)
+_slotted = dataclass(slots=True) if sys.version_info >= (3, 10) else dataclass
 @dataclass
 
 class SliceCreate:
@@ -41,7 +46,7 @@ class User:
     password: str
     role: UserRole
 
-@dataclass
+@_slotted
 class VM:
     id: str
     name: str
@@ -56,11 +61,50 @@ class VM:
     connections: List[str] = field(default_factory=list)  # IDs de VMs conectadas
     conexion_remota: str = None  # Nuevo campo opcional
     imagen: str = None  # Nuevo campo opcional
+    puerto_vnc: str = ""  # Puerto VNC reservado en su host (vms.json)
+    conexiones_vlans: str = ""  # "vecino:vlan,..." del plan de VLANs por enlace
 
     def to_dict(self):
-        return asdict(self)
+        # Armado a mano: asdict() recorre y copia en profundidad cada campo
+        return {
+            'id': self.id,
+            'name': self.name,
+            'cpu': self.cpu,
+            'memory': self.memory,
+            'disk': self.disk,
+            'flavor': self.flavor,
+            'status': self.status,
+            'host': self.host,
+            'ip': self.ip,
+            'topology_group': self.topology_group,
+            'connections': list(self.connections),
+            'conexion_remota': self.conexion_remota,
+            'imagen': self.imagen,
+            'puerto_vnc': self.puerto_vnc,
+            'conexiones_vlans': self.conexiones_vlans
+        }
 
-@dataclass
+    @classmethod
+    def from_dict(cls, data: dict) -> 'VM':
+        return cls(
+            id=data['id'],
+            name=data['name'],
+            cpu=data['cpu'],
+            memory=data['memory'],
+            disk=data['disk'],
+            flavor=data.get('flavor', "small"),
+            status=data.get('status', "pending"),
+            host=data.get('host'),
+            ip=data.get('ip'),
+            topology_group=data.get('topology_group', 0),
+            connections=list(data.get('connections') or []),
+            conexion_remota=data.get('conexion_remota'),
+            imagen=data.get('imagen'),
+            puerto_vnc=data.get('puerto_vnc') or "",
+            conexiones_vlans=data.get('conexiones_vlans') or ""
+        )
+
+@_slotted
 class TopologySegment:
     """Representa un segmento de topología dentro de un slice mixto"""
     type: TopologyType
@@ -74,7 +118,15 @@ class TopologySegment:
             'flavor': self.flavor.value
         }
 
-@dataclass
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TopologySegment':
+        return cls(
+            type=TopologyType(data['type']),
+            vms=[VM.from_dict(vm) for vm in data.get('vms', [])],
+            flavor=FlavorType(data['flavor'])
+        )
+
+@_slotted
 class Slice:
     id: str
     name: str
@@ -85,6 +137,7 @@ class Slice:
     status: str = "activa"  # Estado por defecto: activa (solo puede ser "activa" o "inactiva")
     topology_segments: List[TopologySegment] = field(default_factory=list)
     salida_internet: str = None  # Nuevo campo opcional
+    vlans: List[int] = field(default_factory=list)  # VLAN IDs reservados para el slice (el primero es el del slice)
 
     def to_dict(self):
         if hasattr(self.topology, 'value'):
@@ -100,5 +153,26 @@ class Slice:
             'created_at': self.created_at,
             'status': self.status,
             'topology_segments': [seg.to_dict() for seg in self.topology_segments],
-            'salida_internet': self.salida_internet
-        }
\ No newline at end of file
+            'salida_internet': self.salida_internet,
+            'vlans': list(self.vlans)
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Slice':
+        topology = data['topology']
+        try:
+            topology = TopologyType(topology)
+        except ValueError:
+            pass
+        return cls(
+            id=data['id'],
+            name=data['name'],
+            topology=topology,
+            vms=[VM.from_dict(vm) for vm in data.get('vms', [])],
+            owner=data['owner'],
+            created_at=data['created_at'],
+            status=data.get('status', "activa"),
+            topology_segments=[TopologySegment.from_dict(seg) for seg in data.get('topology_segments', [])],
+            salida_internet=data.get('salida_internet'),
+            vlans=list(data.get('vlans') or [])
+        )
@@ -0,0 +1,222 @@
+"""
+Consultas de listado de slices: filtros, orden, paginación por cursor y
+proyección de campos.
+
+Los filtros por owner, estado y topología salen de los índices del
+almacenamiento (by_owner/by_status/by_topology); el resto se aplica sobre ese
+subconjunto. El orden se arma una vez por combinación de filtros y orden
+(SliceOrdering) y cada página se obtiene con bisect a partir del cursor, así
+que pedir la página siguiente no vuelve a ordenar nada.
+"""
+
+import base64
+import binascii
+import json
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .models import Slice
+
+# Nombres que usa el backend remoto (y las tablas del CLI) -> campo de Slice
+FIELD_ALIASES = {
+    'nombre_slice': 'name',
+    'nombre': 'name',
+    'usuario': 'owner',
+    'estado': 'status',
+    'timestamp': 'created_at',
+    'topologia': 'topology',
+}
+
+SORT_FIELDS = ('created_at', 'name', 'owner', 'status', 'topology', 'id')
+MAX_LIMIT = 1000
+
+
+def _iso(value) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value or '')
+
+
+def _topology(slice_obj: Slice) -> str:
+    topology = slice_obj.topology
+    return topology.value if hasattr(topology, 'value') else str(topology)
+
+
+# Campo proyectable -> cómo obtenerlo sin pasar por to_dict() (que copia todas las VMs)
+_GETTERS = {
+    'id': lambda s: s.id,
+    'name': lambda s: s.name,
+    'owner': lambda s: s.owner,
+    'status': lambda s: s.status,
+    'created_at': lambda s: _iso(s.created_at),
+    'topology': _topology,
+    'salida_internet': lambda s: s.salida_internet,
+    'vlans': lambda s: list(s.vlans),
+    'total_vms': lambda s: len(s.vms),
+    'vms': lambda s: [vm.to_dict() for vm in s.vms],
+    'topology_segments': lambda s: [seg.to_dict() for seg in s.topology_segments],
+}
+
+
+def resolve_field(name: str) -> str:
+    field = FIELD_ALIASES.get(name, name)
+    if field not in _GETTERS:
+        raise ValueError(f"Campo desconocido: {name}")
+    return field
+
+
+def parse_fields(text: Optional[str]) -> Optional[List[str]]:
+    """'id,nombre_slice,estado' -> ['id', 'nombre_slice', 'estado'] (validados); None = todos"""
+    if not text:
+        return None
+    fields = [f.strip() for f in text.split(',') if f.strip()]
+    for name in fields:
+        resolve_field(name)
+    return fields or None
+
+
+def project(slice_obj: Slice, fields: List[str]) -> dict:
+    """Solo los campos pedidos, con el nombre con que se pidieron (alias incluidos)"""
+    return {name: _GETTERS[resolve_field(name)](slice_obj) for name in fields}
+
+
+def _sort_value(slice_obj: Slice, field: str) -> str:
+    if field == 'created_at':
+        return _iso(slice_obj.created_at)
+    if field == 'topology':
+        return _topology(slice_obj)
+    return str(getattr(slice_obj, field) or '')
+
+
+@dataclass(frozen=True)
+class SliceQuery:
+    """Filtros y orden de un listado; `sort` admite '-' delante para orden descendente"""
+    owner: Optional[str] = None
+    status: Optional[str] = None
+    topology: Optional[str] = None
+    created_from: Optional[str] = None  # ISO 8601, inclusive
+    created_to: Optional[str] = None    # ISO 8601, exclusive
+    sort: Optional[str] = None          # None = orden de inserción
+
+    def __post_init__(self):
+        if self.sort:
+            field = resolve_field(self.sort.lstrip('-'))
+            if field not in SORT_FIELDS:
+                raise ValueError(f"No se puede ordenar por {self.sort}")
+        for value in (self.created_from, self.created_to):
+            if value:
+                try:
+                    datetime.fromisoformat(value)
+                except ValueError:
+                    raise ValueError(f"Fecha inválida: {value} (usar ISO 8601)")
+
+    @property
+    def sort_field(self) -> Optional[str]:
+        return resolve_field(self.sort.lstrip('-')) if self.sort else None
+
+    @property
+    def descending(self) -> bool:
+        return bool(self.sort) and self.sort.startswith('-')
+
+    def ordering_key(self) -> Tuple:
+        """Clave de caché del orden: el sentido no cuenta (se recorre al revés)"""
+        return (self.owner, self.status, self.topology, self.created_from, self.created_to, self.sort_field)
+
+    def candidates(self, storage) -> List[Slice]:
+        """Slices que cumplen los filtros, partiendo del índice más selectivo disponible"""
+        if self.owner:
+            slices = storage.by_owner(self.owner)
+        elif self.status:
+            slices = storage.by_status(self.status)
+        elif self.topology:
+            slices = storage.by_topology(self.topology)
+        else:
+            slices = storage.all()
+        return [s for s in slices if self.matches(s)]
+
+    def matches(self, slice_obj: Slice) -> bool:
+        if self.owner and slice_obj.owner != self.owner:
+            return False
+        if self.status and slice_obj.status != self.status:
+            return False
+        if self.topology and _topology(slice_obj) != self.topology:
+            return False
+        if self.created_from or self.created_to:
+            created = _iso(slice_obj.created_at)
+            if self.created_from and created < self.created_from:
+                return False
+            if self.created_to and created >= self.created_to:
+                return False
+        return True
+
+
+class SliceOrdering:
+    """
+    Resultado ordenado de una consulta: lista ascendente de (valor, id) más la
+    posición de cada id. Un cursor es el (valor, id) del último slice entregado;
+    si ese slice ya no existe se retoma con bisect por su valor.
+    """
+
+    def __init__(self, slices: List[Slice], field: Optional[str]):
+        if field is None:
+            # Orden de inserción: el valor es la posición
+            self.keys = [(idx, s.id) for idx, s in enumerate(slices)]
+        else:
+            self.keys = sorted((_sort_value(s, field), s.id) for s in slices)
+        self.positions: Dict[str, int] = {slice_id: idx for idx, (_, slice_id) in enumerate(self.keys)}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def page(self, after: Optional[list], limit: int, descending: bool = False) -> Tuple[List[str], Optional[list]]:
+        """Ids de la página que sigue a `after` y el cursor de la siguiente (None si no hay más)"""
+        keys = self.keys
+        if not descending:
+            if after is None:
+                start = 0
+            elif after[1] in self.positions:
+                start = self.positions[after[1]] + 1
+            else:
+                start = bisect_right(keys, tuple(after))
+            chunk = keys[start:start + limit]
+            more = start + limit < len(keys)
+        else:
+            if after is None:
+                end = len(keys)
+            elif after[1] in self.positions:
+                end = self.positions[after[1]]
+            else:
+                end = bisect_left(keys, tuple(after))
+            chunk = keys[max(0, end - limit):end][::-1]
+            more = end - limit > 0
+        ids = [slice_id for _, slice_id in chunk]
+        return ids, (list(chunk[-1]) if more and chunk else None)
+
+
+def encode_cursor(after: Optional[list], query: SliceQuery) -> Optional[str]:
+    if after is None:
+        return None
+    data = json.dumps({'a': after, 's': query.sort or ''}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], query: SliceQuery) -> Optional[list]:
+    """Cursor opaco -> (valor, id); falla si no corresponde al orden pedido"""
+    if not cursor:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        after = data['a']
+        if not isinstance(after, list) or len(after) != 2:
+            raise ValueError
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise ValueError("Cursor inválido")
+    if data.get('s', '') != (query.sort or ''):
+        raise ValueError("El cursor corresponde a otro orden")
+    # Mismos tipos que las claves de SliceOrdering (posición entera sin sort, texto con sort):
+    # otros harían fallar la comparación del bisect
+    value, slice_id = after
+    value_ok = isinstance(value, str) if query.sort_field else (isinstance(value, int) and not isinstance(value, bool))
+    if not value_ok or not isinstance(slice_id, str):
+        raise ValueError("Cursor inválido")
+    return after
@@ -0,0 +1,329 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Iterator, List, Optional
+from .changes import Change
+from .models import Slice, VM
+from .storage import SliceStorage, debug, iter_json_records, record_to_slice, parse_timestamp, parse_vlans, format_vlans
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS slices (
+    id              TEXT PRIMARY KEY,
+    pos             INTEGER NOT NULL,
+    name            TEXT,
+    owner           TEXT NOT NULL DEFAULT '',
+    status          TEXT NOT NULL DEFAULT 'activa',
+    created_at      TEXT,
+    salida_internet TEXT,
+    vlans           TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_slices_owner ON slices(owner, pos);
+CREATE INDEX IF NOT EXISTS idx_slices_status ON slices(status, pos);
+
+CREATE TABLE IF NOT EXISTS topologias (
+    slice_id TEXT NOT NULL REFERENCES slices(id) ON DELETE CASCADE,
+    orden    INTEGER NOT NULL,
+    nombre   TEXT NOT NULL,
+    internet TEXT,
+    PRIMARY KEY (slice_id, orden)
+);
+CREATE INDEX IF NOT EXISTS idx_topologias_nombre ON topologias(nombre);
+
+CREATE TABLE IF NOT EXISTS vms (
+    slice_id        TEXT NOT NULL REFERENCES slices(id) ON DELETE CASCADE,
+    orden           INTEGER NOT NULL,
+    topologia_orden INTEGER NOT NULL DEFAULT 0,
+    id              TEXT,
+    name            TEXT,
+    cpu             INTEGER,
+    memory          INTEGER,
+    disk            INTEGER,
+    flavor          TEXT,
+    status          TEXT,
+    host            TEXT,
+    ip              TEXT,
+    topology_group  INTEGER,
+    connections     TEXT,
+    conexion_remota TEXT,
+    imagen          TEXT,
+    puerto_vnc      TEXT NOT NULL DEFAULT '',
+    conexiones_vlans TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (slice_id, orden)
+);
+
+-- Registro de cambios compartido por todos los procesos que usan la base
+CREATE TABLE IF NOT EXISTS cambios (
+    seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+    evento   TEXT NOT NULL,
+    slice_id TEXT NOT NULL,
+    owner    TEXT NOT NULL DEFAULT ''
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+# Una sola sentencia trae el slice, su topología principal y sus VMs
+_SELECT = """
+SELECT s.id, s.name, s.owner, s.status, s.created_at, s.salida_internet, t.nombre,
+       v.id, v.name, v.cpu, v.memory, v.disk, v.flavor, v.status, v.host, v.ip,
+       v.topology_group, v.connections, v.conexion_remota, v.imagen, s.vlans,
+       v.puerto_vnc, v.conexiones_vlans
+FROM slices s
+LEFT JOIN topologias t ON t.slice_id = s.id AND t.orden = 0
+LEFT JOIN vms v ON v.slice_id = s.id
+"""
+
+
+class SQLiteSliceStorage(SliceStorage):
+    """
+    Backend SQLite: slices, topologías y VMs en tablas normalizadas con índices
+    por id, owner y estado. Cada operación del SliceManager es una sentencia
+    indexada en lugar de reescribir todo el archivo JSON.
+
+    Es el backend para correr la API con varios workers: cada mutación anota
+    su cambio en la tabla `cambios` dentro de la misma transacción, así la
+    secuencia y la época son las mismas para todos los procesos y cada uno
+    puede enterarse de lo que hicieron los demás (SliceManager.start_watcher).
+    """
+
+    name = "sqlite"
+    shared_changes = True
+
+    def __init__(self, path: str, changes_max: int = None):
+        self.path = path
+        self._lock = threading.RLock()
+        # Se conservan los últimos SLICE_CHANGES_MAX cambios (1000 por defecto)
+        self.changes_max = changes_max or int(os.getenv('SLICE_CHANGES_MAX', '1000'))
+        # Secuencias de los cambios hechos por este proceso, solo mientras hay un
+        # watcher que las consuma (no vuelve a avisar de ellos)
+        self.track_own_changes = False
+        self._own_changes = set()
+        # Con varios procesos escribiendo, esperar el lock de escritura en lugar de fallar
+        timeout = float(os.getenv('SLICE_SQLITE_TIMEOUT', '30'))
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=timeout)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+        columnas = {row[1] for row in self.conn.execute("PRAGMA table_info(slices)")}
+        if 'vlans' not in columnas:
+            # Bases creadas antes de guardar las VLANs del slice
+            self.conn.execute("ALTER TABLE slices ADD COLUMN vlans TEXT NOT NULL DEFAULT ''")
+        columnas_vms = {row[1] for row in self.conn.execute("PRAGMA table_info(vms)")}
+        for columna in ('puerto_vnc', 'conexiones_vlans'):
+            if columna not in columnas_vms:
+                # Bases creadas antes de guardar el puerto VNC y el plan de VLANs de cada VM
+                self.conn.execute(f"ALTER TABLE vms ADD COLUMN {columna} TEXT NOT NULL DEFAULT ''")
+        # La época identifica a la base: la comparten todos los procesos que la abren
+        self.conn.execute("INSERT OR IGNORE INTO meta (clave, valor) VALUES ('epoch', ?)", (uuid.uuid4().hex[:12],))
+        self.epoch = self.conn.execute("SELECT valor FROM meta WHERE clave = 'epoch'").fetchone()[0]
+        debug(f"Base SQLite abierta en {self.path} ({self.count()} slices)")
+
+    def _query(self, where: str = "", params: tuple = ()) -> List[Slice]:
+        sql = _SELECT + where + " ORDER BY s.pos, v.orden"
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return list(self._build(rows))
+
+    @staticmethod
+    def _build(rows) -> Iterator[Slice]:
+        """Agrupa las filas (una por VM, ordenadas por slice) en Slices, a medida que llegan"""
+        current = None
+        for row in rows:
+            if current is None or current.id != row[0]:
+                if current is not None:
+                    yield current
+                created_at = parse_timestamp(row[4])  # None si el registro no tenía fecha
+                current = Slice(
+                    id=row[0],
+                    name=row[1],
+                    topology=row[6] or 'lineal',
+                    vms=[],
+                    owner=row[2],
+                    created_at=created_at,
+                    status=row[3],
+                    salida_internet=row[5],
+                    vlans=parse_vlans(row[20])
+                )
+            if row[7] is not None:
+                current.vms.append(VM(
+                    id=row[7],
+                    name=row[8],
+                    cpu=row[9],
+                    memory=row[10],
+                    disk=row[11],
+                    flavor=row[12],
+                    status=row[13],
+                    host=row[14],
+                    ip=row[15],
+                    topology_group=row[16] or 0,
+                    connections=json.loads(row[17]) if row[17] else [],
+                    conexion_remota=row[18],
+                    imagen=row[19],
+                    puerto_vnc=row[21] or '',
+                    conexiones_vlans=row[22] or ''
+                ))
+        if current is not None:
+            yield current
+
+    def iter_slices(self, owner: Optional[str] = None) -> Iterator[Slice]:
+        """
+        Recorre los slices leyendo por tandas con una conexión propia: no retiene
+        el lock (las escrituras siguen) ni carga todas las filas en memoria.
+        """
+        where, params = ("WHERE s.owner = ?", (owner,)) if owner else ("", ())
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            cursor = conn.execute(_SELECT + where + " ORDER BY s.pos, v.orden", params)
+            rows = (row for batch in iter(lambda: cursor.fetchmany(500), []) for row in batch)
+            yield from self._build(rows)
+        finally:
+            conn.close()
+
+    @property
+    def generation(self) -> int:
+        """Cambia cuando otro proceso confirma una transacción en la base"""
+        with self._lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # === Registro de cambios ===
+
+    def _record_change(self, evento: str, slice_id: str, owner: str):
+        """Anota un cambio (llamar dentro de la transacción de la mutación)"""
+        seq = self.conn.execute("INSERT INTO cambios (evento, slice_id, owner) VALUES (?, ?, ?)",
+                                (evento, slice_id, owner or '')).lastrowid
+        self.conn.execute("DELETE FROM cambios WHERE seq <= ?", (seq - self.changes_max,))
+        if self.track_own_changes:
+            self._own_changes.add(seq)
+
+    def last_change(self) -> int:
+        """Secuencia del último cambio (0 si nunca hubo)"""
+        with self._lock:
+            row = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'cambios'").fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, since: int, upto: int) -> Optional[List[Change]]:
+        """Cambios con since < seq <= upto, o None si los más viejos ya se descartaron"""
+        with self._lock:
+            oldest = self.conn.execute("SELECT MIN(seq) FROM cambios").fetchone()[0]
+            if oldest is not None and since < oldest - 1:
+                return None
+            if oldest is None and since < upto:
+                return None
+            return [tuple(row) for row in self.conn.execute(
+                "SELECT seq, evento, slice_id, owner FROM cambios WHERE seq > ? AND seq <= ? ORDER BY seq",
+                (since, upto))]
+
+    def is_own_change(self, seq: int) -> bool:
+        """True (una sola vez) si el cambio lo hizo este proceso"""
+        with self._lock:
+            if seq in self._own_changes:
+                self._own_changes.discard(seq)
+                return True
+            return False
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM slices").fetchone()[0]
+
+    def all(self) -> List[Slice]:
+        return self._query()
+
+    def get(self, slice_id: str) -> Optional[Slice]:
+        slices = self._query("WHERE s.id = ?", (slice_id,))
+        return slices[0] if slices else None
+
+    def by_owner(self, owner: str) -> List[Slice]:
+        return self._query("WHERE s.owner = ?", (owner,))
+
+    def by_status(self, status: str) -> List[Slice]:
+        return self._query("WHERE s.status = ?", (status,))
+
+    def by_topology(self, topology) -> List[Slice]:
+        topology = topology.value if hasattr(topology, 'value') else topology
+        return self._query("WHERE t.nombre = ?", (topology,))
+
+    def _insert(self, slice_obj: Slice):
+        topology = slice_obj.topology.value if hasattr(slice_obj.topology, 'value') else slice_obj.topology
+        created_at = slice_obj.created_at
+        if isinstance(created_at, datetime):
+            created_at = created_at.isoformat()
+        created_at = created_at or None  # fecha desconocida: NULL, no la hora actual
+        self.conn.execute(
+            "INSERT OR REPLACE INTO slices (id, pos, name, owner, status, created_at, salida_internet, vlans) "
+            "VALUES (?, (SELECT COALESCE(MAX(pos), 0) + 1 FROM slices), ?, ?, ?, ?, ?, ?)",
+            (slice_obj.id, slice_obj.name, slice_obj.owner or '', slice_obj.status,
+             created_at, slice_obj.salida_internet, format_vlans(slice_obj.vlans))
+        )
+        self.conn.execute(
+            "INSERT INTO topologias (slice_id, orden, nombre, internet) VALUES (?, 0, ?, ?)",
+            (slice_obj.id, topology, slice_obj.salida_internet)
+        )
+        self.conn.executemany(
+            "INSERT INTO vms (slice_id, orden, topologia_orden, id, name, cpu, memory, disk, flavor, status, "
+            "host, ip, topology_group, connections, conexion_remota, imagen, puerto_vnc, conexiones_vlans) "
+            "VALUES (?, ?, 0, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(slice_obj.id, orden, vm.id, vm.name, vm.cpu, vm.memory, vm.disk, vm.flavor, vm.status,
+              vm.host, vm.ip, vm.topology_group, json.dumps(vm.connections or []),
+              vm.conexion_remota, vm.imagen, vm.puerto_vnc or '', vm.conexiones_vlans or '')
+             for orden, vm in enumerate(slice_obj.vms)]
+        )
+
+    def insert(self, slice_obj: Slice):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # INSERT OR REPLACE en slices borra en cascada la topología y VMs anteriores
+                self._insert(slice_obj)
+                self._record_change('create', slice_obj.id, slice_obj.owner)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _mutate(self, evento: str, slice_id: str, sql: str, params: tuple) -> bool:
+        """Ejecuta la sentencia y anota el cambio en una sola transacción"""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT owner FROM slices WHERE id = ?", (slice_id,)).fetchone()
+                changed = row is not None and self.conn.execute(sql, params).rowcount > 0
+                if changed:
+                    self._record_change(evento, slice_id, row[0])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return changed
+
+    def delete(self, slice_id: str) -> bool:
+        return self._mutate('delete', slice_id, "DELETE FROM slices WHERE id = ?", (slice_id,))
+
+    def update_status(self, slice_id: str, status: str) -> bool:
+        return self._mutate('status', slice_id, "UPDATE slices SET status = ? WHERE id = ?", (status, slice_id))
+
+    def import_json(self, json_path: str) -> int:
+        """Importa de una sola vez todos los slices de un base_de_datos.json"""
+        total = 0
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for slice_id, item in iter_json_records(json_path):
+                    self._insert(record_to_slice(item, slice_id))
+                    total += 1
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        debug(f"Importados {total} slices desde {json_path} a {self.path}")
+        return total
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
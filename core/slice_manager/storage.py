@@ -0,0 +1,526 @@
+import os
+import threading
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+from .models import Slice, VM
+from .index import SliceIndex
+from .journal import SliceJournal
+from .loader import LazySlice, iter_lazy_slices
+from ..persistence import CoalescedWriter
+from ..file_lock import DatabaseLock
+from ..snapshot_format import PROJECT_ROOT, LEGACY_FILE, default_database_file, iter_records, write_records
+
+DEFAULT_JSON_FILE = LEGACY_FILE
+DEFAULT_SQLITE_FILE = os.path.join(PROJECT_ROOT, "base_de_datos.sqlite3")
+
+
+def _env_flag(name: str, default: str = 'false') -> bool:
+    return os.getenv(name, default).lower() in ('1', 'true', 'si', 'yes')
+
+
+# Mensajes [DEBUG] del almacenamiento y del manager: solo con SLICE_DEBUG=1
+SLICE_DEBUG = _env_flag('SLICE_DEBUG')
+
+
+def debug(mensaje: str):
+    if SLICE_DEBUG:
+        print(f"[DEBUG] {mensaje}")
+
+
+def parse_vlans(text) -> List[int]:
+    """'101,102' (o un número suelto) -> [101, 102]; ignora valores no numéricos"""
+    vlans = []
+    for parte in str(text or '').split(','):
+        parte = parte.strip()
+        if parte.isdigit():
+            vlans.append(int(parte))
+    return vlans
+
+
+def format_vlans(vlans: List[int]) -> str:
+    return ",".join(str(v) for v in vlans)
+
+
+def parse_timestamp(text) -> Optional[datetime]:
+    """
+    Fecha de creación guardada. Los registros antiguos no la tienen: queda en
+    None (desconocida) en vez de inventarla, para no guardar la hora de carga
+    como si fuera la de creación. Un valor que no es ISO se conserva tal cual.
+    """
+    if not text:
+        return None
+    try:
+        return datetime.fromisoformat(text)
+    except (TypeError, ValueError):
+        return text
+
+
+def record_to_slice(item: dict, slice_id: str) -> Slice:
+    """Convierte un registro de base_de_datos.json en un objeto Slice"""
+    topologias = item.get('topologias', [])
+    # Tomar la primera topología como principal
+    topo = topologias[0] if topologias else {}
+    vms = []
+    for vm_data in topo.get('vms', []):
+        # Permitir valores decimales en almacenamiento
+        almacenamiento_str = vm_data.get('almacenamiento', '1G').replace('G','')
+        try:
+            disk_val = int(float(almacenamiento_str))
+        except Exception:
+            disk_val = 1
+        vm = VM(
+            id=vm_data.get('nombre', ''),
+            name=vm_data.get('nombre', ''),
+            cpu=int(vm_data.get('cores', '1')),
+            memory=int(vm_data.get('ram', '512M').replace('M','')),
+            disk=disk_val,
+            flavor=vm_data.get('image', 'f1'),
+            conexion_remota=vm_data.get('acceso', 'no'),
+            imagen=vm_data.get('image', ''),
+            ip=vm_data.get('ip') or None,
+            host=vm_data.get('server') or None,
+            # Se conservan tal cual para no perderlos al volver a escribir el registro
+            puerto_vnc=str(vm_data.get('puerto_vnc') or ''),
+            conexiones_vlans=vm_data.get('conexiones_vlans') or ''
+        )
+        vms.append(vm)
+    return Slice(
+        id=slice_id,
+        name=slice_id,
+        topology=topo.get('nombre', 'lineal'),
+        vms=vms,
+        owner=item.get('owner', ''),
+        created_at=parse_timestamp(item.get('timestamp')),
+        status=item.get('estado', 'activa'),  # Estado por defecto: activa
+        salida_internet=topo.get('internet', 'no'),
+        vlans=parse_vlans(item.get('vlans_usadas')) or parse_vlans(item.get('vlans_separadas'))
+    )
+
+
+def slice_to_record(slice: Slice) -> dict:
+    """Convierte un Slice en un registro con el formato de base_de_datos.json"""
+    vms_data = []
+    for vm in slice.vms:
+        vms_data.append({
+            "nombre": getattr(vm, 'name', ''),
+            "cores": str(getattr(vm, 'cpu', 1)),
+            "ram": f"{getattr(vm, 'memory', 512)}M",
+            "almacenamiento": f"{getattr(vm, 'disk', 1)}G",
+            "puerto_vnc": getattr(vm, 'puerto_vnc', '') or "",
+            "image": getattr(vm, 'imagen', ''),
+            "conexiones_vlans": getattr(vm, 'conexiones_vlans', '') or "",
+            "acceso": getattr(vm, 'conexion_remota', 'no'),
+            "server": getattr(vm, 'host', None) or "",
+            "ip": getattr(vm, 'ip', None) or ""
+        })
+    cantidad_vms = str(len(vms_data))
+    topologia_nombre = getattr(slice, 'topology', 'lineal')
+    if hasattr(topologia_nombre, 'value'):
+        topologia_nombre = topologia_nombre.value
+    salida_internet = getattr(slice, 'salida_internet', 'no')
+    topologia_obj = {
+        "nombre": topologia_nombre,
+        "cantidad_vms": cantidad_vms,
+        "internet": salida_internet,
+        "vms": vms_data
+    }
+    record = {
+        "id_slice": slice.id,
+        "cantidad_vms": cantidad_vms,
+        # VLANs asignadas por el VLANAllocator: no dependen de la posición en el archivo
+        "vlans_separadas": str(slice.vlans[0]) if slice.vlans else "",
+        "vlans_usadas": format_vlans(slice.vlans),
+        "vncs_separadas": "",
+        "conexión_topologias": "",
+        "topologias": [topologia_obj],
+        "owner": slice.owner,
+        "estado": slice.status,
+    }
+    # Sin fecha conocida (registros antiguos) no se escribe: se sigue sabiendo que falta
+    if slice.created_at:
+        record["timestamp"] = slice.created_at.isoformat() if isinstance(slice.created_at, datetime) else slice.created_at
+    return record
+
+
+def record_ids(records: Iterable[dict]) -> Iterator[Tuple[str, dict]]:
+    """
+    (slice_id, registro) con el id que usa el SliceManager. Es también la clave
+    del slice en vlans.json e ipam.json, la use quien la use (API o CLI).
+    """
+    vistos = set()
+    for idx, item in enumerate(records):
+        slice_id = str(item.get('id_slice', '') or '')
+        # Los registros antiguos no guardaban id: asignar uno estable por posición
+        if not slice_id or slice_id in vistos:
+            slice_id = f"slice_{idx + 1}"
+        vistos.add(slice_id)
+        yield slice_id, item
+
+
+def apply_journal(records: List[dict], journal: Iterable[dict]) -> List[dict]:
+    """
+    Registros del snapshot con los del journal (ver SliceJournal) aplicados
+    encima, con el mismo criterio que JsonSliceStorage al cargar: lo que ve el
+    SliceManager en modo journal, pero en el formato de base_de_datos.json.
+    Cada registro queda con su id_slice para que las ids por posición no
+    cambien al reescribir el snapshot.
+    """
+    slices = {}
+    for slice_id, item in record_ids(records):
+        item['id_slice'] = slice_id
+        slices[slice_id] = item
+    for record in journal:
+        op = record.get('op')
+        if op == 'create':
+            item = record.get('slice', {})
+            slices[item.get('id_slice', '')] = item
+        elif op == 'delete':
+            slices.pop(record.get('id'), None)
+        elif op == 'status':
+            item = slices.get(record.get('id'))
+            if item is not None:
+                item['estado'] = record.get('status')
+        else:
+            print(f"[ERROR] Operación de journal desconocida: {op}")
+    return list(slices.values())
+
+
+def iter_json_records(path: str):
+    """Recorre los registros del snapshot (.json o .jsonl) devolviendo (slice_id, registro)"""
+    # Los registros se parsean de a uno: la memoria no depende del tamaño del archivo
+    yield from record_ids(iter_records(path))
+
+
+class SliceStorage:
+    """Interfaz común de los backends de almacenamiento del SliceManager"""
+
+    name = "base"
+    # Cambia cada vez que el backend recarga datos escritos por otro proceso
+    generation = 0
+    # True si el backend guarda el registro de cambios (seq, epoch) compartido
+    # entre procesos: last_change(), changes_since() y epoch
+    shared_changes = False
+
+    def refresh(self, force: bool = False) -> bool:
+        """Relee cambios hechos por otros procesos; True si hubo recarga"""
+        return False
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def all(self) -> List[Slice]:
+        raise NotImplementedError
+
+    def get(self, slice_id: str) -> Optional[Slice]:
+        raise NotImplementedError
+
+    def by_owner(self, owner: str) -> List[Slice]:
+        raise NotImplementedError
+
+    def iter_slices(self, owner: Optional[str] = None) -> Iterator[Slice]:
+        """Recorre los slices sin armar la lista completa (exportaciones)"""
+        yield from (self.by_owner(owner) if owner else self.all())
+
+    def by_status(self, status: str) -> List[Slice]:
+        raise NotImplementedError
+
+    def by_topology(self, topology) -> List[Slice]:
+        raise NotImplementedError
+
+    def insert(self, slice_obj: Slice):
+        raise NotImplementedError
+
+    def delete(self, slice_id: str) -> bool:
+        raise NotImplementedError
+
+    def update_status(self, slice_id: str, status: str) -> bool:
+        raise NotImplementedError
+
+    def flush(self):
+        """Fuerza a disco las mutaciones pendientes (no-op si el backend escribe al instante)"""
+        pass
+
+    def wait_durable(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que todas las mutaciones hechas hasta ahora sean durables"""
+        return True
+
+    def close(self):
+        pass
+
+
+class _WriteLock:
+    """Lock del almacenamiento en este proceso más el lock exclusivo entre procesos"""
+
+    def __init__(self, thread_lock, db_lock: DatabaseLock):
+        self.thread_lock = thread_lock
+        self.db_lock = db_lock
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            self.db_lock._acquire(exclusive=True)
+        except BaseException:
+            self.thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.db_lock._release()
+        finally:
+            self.thread_lock.release()
+
+
+class JsonSliceStorage(SliceStorage):
+    """
+    Backend sobre el snapshot de slices (base_de_datos.json o su versión compacta
+    base_de_datos.jsonl, ver core.snapshot_format): índice en memoria más
+    snapshot, con modo journal opcional (ver SliceJournal).
+
+    Varios procesos (API, CLI) pueden compartir el archivo: las escrituras se
+    serializan con un DatabaseLock y cada una incrementa la versión de la base.
+    Si la versión en disco cambió, el índice se recarga y se reaplican encima
+    las mutaciones propias que aún no llegaron a disco, en lugar de pisar los
+    datos más nuevos.
+    """
+
+    name = "json"
+
+    def __init__(self, database_file: str = None, journal_mode: Optional[bool] = None,
+                 compact_every: Optional[int] = None, flush_window: Optional[float] = None):
+        self.database_file = database_file or default_database_file()
+
+        # Modo journal: cada mutación se agrega al log en lugar de reescribir el snapshot
+        if journal_mode is None:
+            journal_mode = _env_flag('SLICE_JOURNAL')
+        if compact_every is None:
+            compact_every = int(os.getenv('SLICE_JOURNAL_COMPACT', '500'))
+        self.journal_mode = journal_mode
+        self.compact_every = compact_every
+        self.journal = SliceJournal(os.path.splitext(self.database_file)[0] + ".journal",
+                                    fsync=_env_flag('SLICE_JOURNAL_FSYNC', 'true'))
+
+        self._lock = threading.RLock()
+        self.db_lock = DatabaseLock(self.database_file)
+        self._write_lock = _WriteLock(self._lock, self.db_lock)
+        self.version = 0
+        self._stamp = None
+        # Mutaciones aplicadas en memoria que todavía no están en el snapshot: (registro, slice)
+        self._pending = []
+
+        # Ráfagas de mutaciones dentro de la ventana se agrupan en un solo flush atómico
+        if flush_window is None:
+            flush_window = int(os.getenv('SLICE_FLUSH_WINDOW_MS', '0')) / 1000.0
+        self.writer = CoalescedWriter(self.database_file, self._render_snapshot,
+                                      window=flush_window, lock=self._write_lock,
+                                      after_write=self._after_write, write=write_records)
+
+        self.index = self._build_index()
+        if not self.journal_mode and self.journal.records:
+            # Journal pendiente de una ejecución anterior en modo journal: plegarlo ya
+            self.compact()
+
+    def _build_index(self) -> SliceIndex:
+        index = SliceIndex()
+        with self.db_lock.shared():
+            self._stamp = self.db_lock.version_stamp()
+            self.version = self.db_lock.read_version()
+            for slice_obj in self._load_slices():
+                index.add(slice_obj)
+        return index
+
+    def _load_slices(self) -> List[Slice]:
+        """
+        Cargar el snapshot base_de_datos.json y reaplicar encima los registros del journal.
+        Del snapshot solo se leen los campos indexados: los Slice se hidratan al usarlos.
+        """
+        slices = {}
+        try:
+            for entry in iter_lazy_slices(self.database_file):
+                slices[entry.id] = entry
+        except Exception as e:
+            print(f"Error loading database JSON slices: {e}")
+        replayed = 0
+        self.journal.records = 0
+        for record in self.journal.replay():
+            self._apply_record(slices, record)
+            replayed += 1
+        self.journal.records = replayed
+        if replayed:
+            debug(f"Reaplicados {replayed} registros del journal {self.journal.path}")
+        debug(f"Cargados {len(slices)} slices desde {self.database_file}")
+        return list(slices.values())
+
+    @staticmethod
+    def _apply_record(slices: dict, record: dict):
+        """Aplica un registro del journal sobre un dict id -> Slice"""
+        op = record.get('op')
+        if op == 'create':
+            item = record.get('slice', {})
+            slice_id = item.get('id_slice', '')
+            slices[slice_id] = record_to_slice(item, slice_id)
+        elif op == 'delete':
+            slices.pop(record.get('id'), None)
+        elif op == 'status':
+            slice_obj = slices.get(record.get('id'))
+            if slice_obj is not None:
+                slice_obj.status = record.get('status')
+        else:
+            print(f"[ERROR] Operación de journal desconocida: {op}")
+
+    @staticmethod
+    def _apply_pending(index: SliceIndex, record: dict, slice_obj: Optional[Slice]):
+        op = record.get('op')
+        if op == 'create':
+            index.add(slice_obj)
+        elif op == 'delete':
+            index.remove(record.get('id'))
+        elif op == 'status':
+            index.set_status(record.get('id'), record.get('status'))
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Recarga el índice si otro proceso escribió la base desde la última lectura.
+        Devuelve True si hubo recarga.
+        """
+        if not force and self.db_lock.version_stamp() == self._stamp:
+            return False
+        with self._lock:
+            stamp = self.db_lock.version_stamp()
+            if not force and stamp == self._stamp:
+                return False
+            if not force and self.db_lock.read_version() == self.version:
+                self._stamp = stamp
+                return False
+            index = self._build_index()
+            for record, slice_obj in self._pending:
+                self._apply_pending(index, record, slice_obj)
+            self.index = index
+            self.generation += 1
+            debug(f"Base modificada por otro proceso: recargada versión {self.version}")
+            return True
+
+    def _mark_written(self):
+        self.version = self.db_lock.bump_version()
+        self._stamp = self.db_lock.version_stamp()
+
+    def _after_write(self):
+        self._pending.clear()
+        self._mark_written()
+
+    def _mutate(self, apply, record: dict, slice_obj: Optional[Slice] = None) -> bool:
+        """Aplica una mutación con el lock exclusivo tomado y la persiste"""
+        with self._write_lock:
+            self.refresh()
+            if not apply():
+                return False
+            if self.journal_mode:
+                self.journal.append(record)
+                self._mark_written()
+                if self.journal.records >= self.compact_every:
+                    self.compact()
+                return True
+            self._pending.append((record, slice_obj))
+        # Fuera del lock: con ventana > 0 el flush lo hace el temporizador
+        self.writer.mark_dirty()
+        return True
+
+    def compact(self):
+        """Plegar el journal en un snapshot nuevo y vaciar el log"""
+        with self._write_lock:
+            self._save_slices()
+            self.journal.reset()
+            self._mark_written()
+
+    def _render_snapshot(self) -> list:
+        # Se llama con el lock exclusivo: si otro proceso escribió, partir de su versión
+        self.refresh()
+        records = []
+        for entry in self.index.entries():
+            if isinstance(entry, LazySlice):
+                # Nunca se usó: copiar el registro original sin construir Slice/VM
+                records.append(entry.raw_record())
+            else:
+                records.append(slice_to_record(entry))
+        return records
+
+    def _save_slices(self):
+        """Guardar todos los slices en base_de_datos.json en el formato ejemplo (lista de objetos)"""
+        self.writer.mark_dirty()
+        self.writer.flush()
+        debug(f"Guardados {len(self.index)} slices en {self.database_file}")
+
+    def flush(self):
+        self.writer.flush()
+
+    def wait_durable(self, timeout: Optional[float] = None) -> bool:
+        return self.writer.wait_durable(timeout=timeout)
+
+    def count(self) -> int:
+        self.refresh()
+        return len(self.index)
+
+    def all(self) -> List[Slice]:
+        self.refresh()
+        return self.index.all()
+
+    def get(self, slice_id: str) -> Optional[Slice]:
+        self.refresh()
+        return self.index.get(slice_id)
+
+    def iter_slices(self, owner: Optional[str] = None) -> Iterator[Slice]:
+        """
+        Recorre los slices sobre una copia de las entradas del índice. Las que
+        todavía no se usaron se construyen para el recorrido sin quedar en el
+        índice: exportar no deja la base entera hidratada en memoria.
+        """
+        self.refresh()
+        for entry in self.index.entries():
+            if owner and entry.owner != owner:
+                continue
+            yield entry.hydrate() if isinstance(entry, LazySlice) else entry
+
+    def by_owner(self, owner: str) -> List[Slice]:
+        self.refresh()
+        return self.index.by_owner(owner)
+
+    def by_status(self, status: str) -> List[Slice]:
+        self.refresh()
+        return self.index.by_status(status)
+
+    def by_topology(self, topology) -> List[Slice]:
+        self.refresh()
+        return self.index.by_topology(topology)
+
+    def insert(self, slice_obj: Slice):
+        def apply():
+            self.index.add(slice_obj)
+            return True
+        record = {"op": "create", "slice": slice_to_record(slice_obj)}
+        self._mutate(apply, record, slice_obj)
+
+    def delete(self, slice_id: str) -> bool:
+        return self._mutate(lambda: self.index.remove(slice_id) is not None,
+                            {"op": "delete", "id": slice_id})
+
+    def update_status(self, slice_id: str, status: str) -> bool:
+        # Cambiar el estado a través del índice para mantener el índice por estado
+        return self._mutate(lambda: self.index.set_status(slice_id, status),
+                            {"op": "status", "id": slice_id, "status": status})
+
+    def close(self):
+        self.writer.close()
+
+
+def create_storage(backend: str = None) -> SliceStorage:
+    """
+    Construye el backend configurado en SLICE_STORAGE ("json" por defecto o "sqlite").
+    La ruta de SQLite se toma de SLICE_SQLITE_PATH.
+    """
+    backend = (backend or os.getenv('SLICE_STORAGE', 'json')).lower()
+    if backend == 'sqlite':
+        from .sqlite_storage import SQLiteSliceStorage
+        return SQLiteSliceStorage(os.getenv('SLICE_SQLITE_PATH', DEFAULT_SQLITE_FILE))
+    if backend != 'json':
+        print(f"[ERROR] Backend de almacenamiento desconocido '{backend}', se usa json")
+    return JsonSliceStorage()
@@ -0,0 +1,150 @@
+"""
+Formatos del snapshot de slices.
+
+- Legado: base_de_datos.json, lista JSON indentada con todos los números como
+  string ("cores": "1", "ram": "500M"). Se mantiene como formato de exportación.
+- Compacto: base_de_datos.jsonl, JSON Lines. La primera línea es una cabecera
+  {"formato": "slices-jsonl", "version": N} y luego un slice por línea, con los
+  números como tipos nativos (ram en MB, almacenamiento en GB).
+
+Si existe base_de_datos.jsonl se usa ese archivo; SLICE_DB_FORMAT=json|jsonl
+fuerza uno u otro. bin/migrar_base_datos.py convierte en ambos sentidos.
+"""
+
+import json
+import os
+from typing import Iterator, List
+
+from .persistence import atomic_write, atomic_write_json
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEGACY_FILE = os.path.join(PROJECT_ROOT, "base_de_datos.json")
+COMPACT_FILE = os.path.join(PROJECT_ROOT, "base_de_datos.jsonl")
+
+FORMAT_NAME = "slices-jsonl"
+SCHEMA_VERSION = 1
+
+# Campos numéricos guardados como string en el formato legado, con su sufijo de unidad
+_NUMERIC_FIELDS = {
+    'cantidad_vms': '',
+    'vlans_separadas': '',
+    'cores': '',
+    'ram': 'M',
+    'almacenamiento': 'G',
+    'puerto_vnc': '',
+}
+
+
+def default_database_file() -> str:
+    """Snapshot a usar: el indicado en SLICE_DB_FORMAT o, si no, el compacto si ya existe"""
+    formato = os.getenv('SLICE_DB_FORMAT', '').lower()
+    if formato == 'jsonl':
+        return COMPACT_FILE
+    if formato == 'json':
+        return LEGACY_FILE
+    if formato:
+        print(f"[ERROR] SLICE_DB_FORMAT desconocido '{formato}', se detecta automáticamente")
+    return COMPACT_FILE if os.path.exists(COMPACT_FILE) else LEGACY_FILE
+
+
+def is_compact(path: str) -> bool:
+    return path.endswith('.jsonl')
+
+
+def header() -> dict:
+    return {"formato": FORMAT_NAME, "version": SCHEMA_VERSION}
+
+
+def is_header(item: dict) -> bool:
+    """True si el registro es la cabecera; falla si la versión es más nueva que este código"""
+    if not isinstance(item, dict) or item.get('formato') != FORMAT_NAME:
+        return False
+    version = item.get('version')
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"Versión de snapshot no soportada: {version} (se espera {SCHEMA_VERSION})")
+    return True
+
+
+def _format_number(value, suffix: str) -> str:
+    return f"{value}{suffix}"
+
+
+def _parse_number(text: str, suffix: str):
+    """Número nativo equivalente a `text`, o None si la conversión no es exacta"""
+    if suffix:
+        if not text.endswith(suffix):
+            return None
+        text_num = text[:-len(suffix)]
+    else:
+        text_num = text
+    try:
+        value = int(text_num)
+    except ValueError:
+        try:
+            value = float(text_num)
+        except ValueError:
+            return None
+    # Solo convertir si al volver al formato legado se obtiene el mismo texto ("01", " 1" quedan como string)
+    return value if _format_number(value, suffix) == text else None
+
+
+def to_compact(value):
+    """Convierte un registro legado (números como string) a tipos nativos"""
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            suffix = _NUMERIC_FIELDS.get(key)
+            if suffix is not None and isinstance(item, str):
+                number = _parse_number(item, suffix)
+                result[key] = item if number is None else number
+            else:
+                result[key] = to_compact(item)
+        return result
+    if isinstance(value, list):
+        return [to_compact(item) for item in value]
+    return value
+
+
+def to_legacy(value):
+    """Convierte un registro compacto al formato legado (inversa exacta de to_compact)"""
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            suffix = _NUMERIC_FIELDS.get(key)
+            if suffix is not None and isinstance(item, (int, float)) and not isinstance(item, bool):
+                result[key] = _format_number(item, suffix)
+            else:
+                result[key] = to_legacy(item)
+        return result
+    if isinstance(value, list):
+        return [to_legacy(item) for item in value]
+    return value
+
+
+def iter_records(path: str) -> Iterator[dict]:
+    """Recorre los registros del snapshot (cualquier formato) ya en formato legado"""
+    from .slice_manager.loader import iter_raw_records
+    if not os.path.exists(path):
+        return
+    for idx, (item, _, _) in enumerate(iter_raw_records(path)):
+        if idx == 0 and is_header(item):
+            continue
+        yield to_legacy(item) if is_compact(path) else item
+
+
+def read_records(path: str) -> List[dict]:
+    """Lista de registros del snapshot en formato legado ([] si no existe)"""
+    return list(iter_records(path))
+
+
+def write_records(path: str, records: List[dict], indent: int = 2):
+    """Escribe atómicamente los registros (en formato legado) en el formato de `path`"""
+    if not is_compact(path):
+        atomic_write_json(path, records, indent=indent)
+        return
+
+    def dump(f):
+        f.write(json.dumps(header(), separators=(',', ':')) + '\n')
+        for record in records:
+            f.write(json.dumps(to_compact(record), ensure_ascii=False, separators=(',', ':')) + '\n')
+    atomic_write(path, dump)
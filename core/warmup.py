@@ -0,0 +1,82 @@
+"""
+Inicialización en segundo plano de los servicios de la API.
+
+Abrir la base de slices (leer el snapshot JSON o abrir SQLite), cargar IPAM y
+VLANs y llenar la caché de listados tarda en bases grandes. Si se hace al
+importar el módulo, uvicorn no responde nada hasta terminar y cualquier
+import (tests, scripts) paga ese costo. Warmup corre esa inicialización en
+un hilo: el proceso responde los health checks enseguida y /api/ready dice
+cuándo puede recibir tráfico.
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+
+class ServiceUnavailable(Exception):
+    """Los servicios todavía no terminaron de iniciar (o fallaron al hacerlo)"""
+
+
+class Warmup:
+    """Ejecuta init() una vez en un hilo aparte y mide cuánto tarda"""
+
+    def __init__(self, name: str, init: Callable[[], None]):
+        self.name = name
+        self.init = init
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.seconds: Optional[float] = None
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self.started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-warmup", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            self.init()
+            print(f"{self.name} listo en {time.perf_counter() - self.started_at:.2f} s")
+        except Exception as e:
+            self.error = str(e)
+            print(f"[ERROR] {self.name} no pudo iniciar: {e}")
+        finally:
+            self.seconds = time.perf_counter() - self.started_at
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set() and self.error is None
+
+    @property
+    def state(self) -> str:
+        if self._thread is None:
+            return "stopped"
+        if not self._done.is_set():
+            return "starting"
+        return "failed" if self.error else "ready"
+
+    def wait(self, timeout: float = None) -> bool:
+        """Espera a que init() termine (bien o mal); True si terminó"""
+        return self._done.wait(timeout)
+
+    def check(self):
+        """ServiceUnavailable si los servicios no están listos"""
+        if not self.ready:
+            detail = self.error or "iniciando"
+            raise ServiceUnavailable(f"{self.name} no está listo ({detail})")
+
+    def status(self) -> dict:
+        if self.seconds is not None:
+            seconds = self.seconds
+        elif self.started_at is not None:
+            seconds = time.perf_counter() - self.started_at
+        else:
+            seconds = 0.0
+        data = {"ready": self.ready, "state": self.state, "startup_seconds": round(seconds, 3)}
+        if self.error:
+            data["error"] = self.error
+        return data
@@ -1,10 +1,11 @@
 """Menú principal para el rol ADMIN - Ejemplo adaptado"""
 
-from shared.ui_helpers import print_header, get_menu_choice, pause
+from shared.ui_helpers import print_header, get_menu_choice, pause, confirm_action
 from shared.colors import Colors
 from shared.views.slice_builder import SliceBuilder
 from core.services.slice_api_service import SliceAPIService
 import os
+import uuid
 
 
 def admin_menu(auth_manager, slice_manager, auth_service=None):
@@ -100,7 +101,14 @@ def admin_menu(auth_manager, slice_manager, auth_service=None):
                             slice_api_local = SliceAPIService(api_url, token, admin_email)
                             
                             # Crear slice en la API
-                            resultado = slice_api_local.create_slice_api(nombre, solicitud_json)
+                            # Una clave por creación: los reintentos no duplican el slice
+                            idempotency_key = uuid.uuid4().hex
+                            resultado = slice_api_local.create_slice_api(nombre, solicitud_json,
+                                                                         idempotency_key=idempotency_key)
+                            while not resultado.get('ok') and resultado.get('status') is None and confirm_action(
+                                    f"{Colors.YELLOW}No hubo respuesta de la API. ¿Reintentar?{Colors.ENDC}"):
+                                resultado = slice_api_local.create_slice_api(nombre, solicitud_json,
+                                                                             idempotency_key=idempotency_key)
                             
                             if resultado.get('ok'):
                                 print(f"{Colors.GREEN}✅ Slice '{nombre}' creado exitosamente en la API remota{Colors.ENDC}")
@@ -218,7 +226,7 @@ def _ver_slices_clientes(slice_manager, auth_manager):
     
     # Obtener TODOS los slices desde la API
     print(f"\n{Colors.CYAN}⏳ Cargando slices desde el servidor remoto...{Colors.ENDC}")
-    all_slices = slice_api_local.list_all_slices()
+    all_slices = slice_api_local.list_all_slices(fields=["id", "nombre_slice", "usuario", "estado", "timestamp"])
     
     if not all_slices:
         print(f"\n{Colors.YELLOW}  No hay slices en el sistema{Colors.ENDC}")
@@ -247,9 +255,9 @@ def _ver_slices_clientes(slice_manager, auth_manager):
     if respuesta == 's':
         slice_id_input = input(f"\n{Colors.CYAN}Ingresa el ID del slice: {Colors.ENDC}").strip()
         
-        # Buscar el slice por ID
+        # La tabla solo trajo las columnas mostradas: pedir el slice completo
         slice_encontrado = None
-        for s in all_slices:
+        for s in slice_api_local.list_all_slices():
             if str(s.get('id')) == slice_id_input:
                 slice_encontrado = s
                 break
@@ -525,7 +533,7 @@ def _pausar_reanudar_slice_admin(auth_manager, slice_manager):
     
     # Obtener TODOS los slices desde la API remota (admin puede ver todos)
     print(f"\n{Colors.CYAN}⏳ Cargando slices desde el servidor remoto...{Colors.ENDC}")
-    slices = slice_api.list_all_slices()
+    slices = slice_api.list_all_slices(fields=["id", "nombre_slice", "usuario", "estado"])
     
     if not slices:
         print(f"\n{Colors.YELLOW}  📋 No hay slices en el sistema{Colors.ENDC}")
@@ -599,10 +607,11 @@ def _pausar_reanudar_slice_admin(auth_manager, slice_manager):
             
             # Llamar al endpoint correspondiente
             print(f"\n{Colors.CYAN}⏳ Procesando...{Colors.ENDC}")
+            idempotency_key = uuid.uuid4().hex  # una clave por acción
             if accion == 'pausar':
-                result = slice_api.pausar_slice(slice_id)
+                result = slice_api.pausar_slice(slice_id, idempotency_key=idempotency_key)
             else:
-                result = slice_api.reanudar_slice(slice_id)
+                result = slice_api.reanudar_slice(slice_id, idempotency_key=idempotency_key)
             
             # Mostrar resultado
             if result.get('ok'):
@@ -645,8 +654,8 @@ def _eliminar_slice_admin(auth_manager, slice_manager):
     api_url = os.getenv('SLICE_API_URL', 'https://localhost:8443')
     slice_api = SliceAPIService(api_url=api_url, token=token)
     
-    # Listar TODOS los slices (admin puede ver todos)
-    slices = slice_api.list_all_slices()
+    # Listar TODOS los slices (admin puede ver todos); solo las columnas de la tabla
+    slices = slice_api.list_all_slices(fields=["id", "nombre_slice", "usuario", "estado", "timestamp"])
     
     if not slices:
         print(f"\n{Colors.YELLOW}  ℹ️  No hay slices en el sistema{Colors.ENDC}")
@@ -703,7 +712,7 @@ def _eliminar_slice_admin(auth_manager, slice_manager):
         
         # Llamar a la API para eliminar
         print(f"\n{Colors.YELLOW}  ⏳ Eliminando slice...{Colors.ENDC}")
-        result = slice_api.eliminar_slice(slice_id)
+        result = slice_api.eliminar_slice(slice_id, idempotency_key=uuid.uuid4().hex)
         
         # Mostrar resultado
         if result.get('ok'):
@@ -882,14 +891,8 @@ def _ver_todos_slices(slice_api, auth_manager):
     try:
         print(f"\n{Colors.CYAN}⏳ Cargando slices...{Colors.ENDC}")
         # Leer todos los slices desde base_de_datos.json
-        import json, os
-        BASE_JSON = os.path.join(os.path.dirname(__file__), '..', '..', 'base_de_datos.json')
-        if os.path.exists(BASE_JSON):
-            with open(BASE_JSON, 'r', encoding='utf-8') as f:
-                data = json.load(f) or []
-            slices = data if isinstance(data, list) else data.get('slices', [])
-        else:
-            slices = []
+        from shared.data_store import leer_base
+        slices = leer_base()
 
         if not slices:
             print(f"\n{Colors.YELLOW}  � No hay slices en el sistema{Colors.ENDC}")
@@ -998,30 +1001,23 @@ def _crear_slice_admin(slice_api, auth_manager):
                     'topologia': topologia,
                     'vms': vms_data
                 }
-                guardar_slice(slice_obj)
+                id_slice = guardar_slice(slice_obj)
 
-                # Leer cuántas VMs existen ya en vms.json para calcular puerto_vnc
-                import json, os
-                VMS_JSON = os.path.join(os.path.dirname(__file__), '..', '..', 'vms.json')
-                if os.path.exists(VMS_JSON):
-                    with open(VMS_JSON, 'r', encoding='utf-8') as f:
-                        vms_data_json = json.load(f)
-                    total_vms = len(vms_data_json.get('vms', []))
-                else:
-                    total_vms = 0
+                # Cada slice tiene su propia subred: IPs sin repetir entre slices
+                from shared.data_store import ipam
+                ips = ipam.allocate_ips(id_slice, len(vms_data))
 
                 vms_guardar = []
                 for idx, vm in enumerate(vms_data):
                     num_vm = idx + 1
-                    ip = f"10.7.1.{num_vm+1}"
-                    puerto_vnc = 5900 + total_vms + num_vm
+                    ip = ips[idx]
                     vm_dict = dict(vm)
                     vm_dict['usuario'] = getattr(auth_manager.current_user, 'username', '')
                     vm_dict['nombre'] = f"vm{num_vm}"
                     vm_dict['ip'] = ip
-                    vm_dict['puerto_vnc'] = puerto_vnc
                     vms_guardar.append(vm_dict)
 
+                # guardar_vms reserva un puerto VNC libre para cada VM
                 guardar_vms(vms_guardar)
                 print(f"{Colors.OKGREEN}✔ Slice y VMs guardados correctamente en base_de_datos.json y vms.json{Colors.ENDC}")
             except Exception as e:
@@ -1063,14 +1059,8 @@ def _ver_detalles_slice(slice_api, auth_manager):
     try:
         print(f"\n{Colors.CYAN}⏳ Cargando slices...{Colors.ENDC}")
         # Leer todos los slices desde base_de_datos.json
-        import json, os
-        BASE_JSON = os.path.join(os.path.dirname(__file__), '..', '..', 'base_de_datos.json')
-        if os.path.exists(BASE_JSON):
-            with open(BASE_JSON, 'r', encoding='utf-8') as f:
-                data = json.load(f) or []
-            slices = data if isinstance(data, list) else data.get('slices', [])
-        else:
-            slices = []
+        from shared.data_store import leer_base
+        slices = leer_base()
 
         if not slices:
             print(f"\n{Colors.YELLOW}  � No hay slices en el sistema{Colors.ENDC}")
@@ -1138,7 +1128,12 @@ def _gestionar_usuarios(auth_manager):
                     "topologias": topologias_json
                 }
                 print(f"{Colors.CYAN}Enviando solicitud de creación de slice a la API...{Colors.ENDC}")
-                resp = slice_api.create_slice_api(nombre, solicitud_json)
+                # Una clave por creación: los reintentos no duplican el slice
+                idempotency_key = uuid.uuid4().hex
+                resp = slice_api.create_slice_api(nombre, solicitud_json, idempotency_key=idempotency_key)
+                while not resp.get("ok") and resp.get("status") is None and confirm_action(
+                        f"{Colors.YELLOW}No hubo respuesta de la API. ¿Reintentar?{Colors.ENDC}"):
+                    resp = slice_api.create_slice_api(nombre, solicitud_json, idempotency_key=idempotency_key)
                 if resp.get("ok"):
                     print(f"{Colors.GREEN}Slice '{nombre}' creado exitosamente en la API{Colors.ENDC}")
                     print(f"  • Nombre: {nombre}")
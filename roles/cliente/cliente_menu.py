@@ -1,9 +1,10 @@
 """Menú principal para el rol CLIENTE"""
 
-from shared.ui_helpers import print_header, get_menu_choice, pause
+from shared.ui_helpers import print_header, get_menu_choice, pause, confirm_action
 from shared.colors import Colors
 from shared.views.slice_builder import SliceBuilder
 import os
+import uuid
 
 
 def cliente_menu(auth_manager, slice_manager, auth_service=None):
@@ -131,11 +132,12 @@ def _pausar_reactivar_slice(auth_manager, slice_manager):
                 pause()
                 return
             
-            # Llamar al endpoint correspondiente
+            # Llamar al endpoint correspondiente (una clave por acción: un reintento no la repite)
+            idempotency_key = uuid.uuid4().hex
             if accion == 'pausar':
-                result = slice_api.pausar_slice(slice_id)
+                result = slice_api.pausar_slice(slice_id, idempotency_key=idempotency_key)
             else:
-                result = slice_api.reanudar_slice(slice_id)
+                result = slice_api.reanudar_slice(slice_id, idempotency_key=idempotency_key)
             
             # Mostrar resultado
             if result.get('ok'):
@@ -231,7 +233,7 @@ def _eliminar_slice_cliente(auth_manager, slice_manager):
         
         # Llamar a la API para eliminar
         print(f"\n{Colors.YELLOW}  ⏳ Eliminando slice...{Colors.ENDC}")
-        result = api_service.eliminar_slice(slice_id)
+        result = api_service.eliminar_slice(slice_id, idempotency_key=uuid.uuid4().hex)
         
         # Mostrar resultado
         if result.get('ok'):
@@ -354,7 +356,13 @@ def _crear_slice(auth_manager, slice_manager, slice_builder):
                 print(f"\n{Colors.CYAN}⏳ Enviando solicitud de creación de slice a la API...{Colors.ENDC}")
                 print(f"   URL: {api_url}/slices/solicitud_creacion")
                 
-                resp = slice_api.create_slice_api(nombre, solicitud_json)
+                # Una clave por creación: si el envío falla y se reintenta, el servidor
+                # reconoce la clave y no crea el slice dos veces
+                idempotency_key = uuid.uuid4().hex
+                resp = slice_api.create_slice_api(nombre, solicitud_json, idempotency_key=idempotency_key)
+                while not resp.get("ok") and resp.get("status") is None and confirm_action(
+                        f"{Colors.YELLOW}No hubo respuesta de la API. ¿Reintentar?{Colors.ENDC}"):
+                    resp = slice_api.create_slice_api(nombre, solicitud_json, idempotency_key=idempotency_key)
                 
                 if resp.get("ok"):
                     print(f"\n{Colors.GREEN}✅ Slice '{nombre}' creado exitosamente en la API remota{Colors.ENDC}")
@@ -3,8 +3,8 @@
 from shared.ui_helpers import print_header, pause, show_success, show_error, show_info, confirm_action
 from shared.colors import Colors
 from shared.services.flavor_service import select_flavor, get_flavor_specs
-import json
-import os
+from shared.data_store import leer_base, reemplazar_slice, eliminar_vms, ipam
+import copy
 
 
 def editar_slice(slice_api, auth_manager):
@@ -20,18 +20,9 @@ def editar_slice(slice_api, auth_manager):
     print("  " + "="*50)
     
     try:
-        # Asegurar que BASE_JSON esté definido
-        if not BASE_JSON:
-            BASE_JSON = os.path.join(os.path.dirname(__file__), '..', '..', 'base_de_datos.json')
         # Leer slices locales del usuario desde base_de_datos.json
-        BASE_JSON = os.path.join(os.path.dirname(__file__), '..', '..', 'base_de_datos.json')
-        VMS_JSON = os.path.join(os.path.dirname(__file__), '..', '..', 'vms.json')
-        if os.path.exists(BASE_JSON):
-            with open(BASE_JSON, 'r', encoding='utf-8') as f:
-                data = json.load(f) or []
-            slices = data if isinstance(data, list) else data.get('slices', [])
-        else:
-            slices = []
+        data = leer_base()
+        slices = data if isinstance(data, list) else data.get('slices', [])
 
         # Filtrar slices del usuario actual (admin puede ver todos)
         usuario_actual = auth_manager.get_current_user_email()
@@ -71,6 +62,8 @@ def editar_slice(slice_api, auth_manager):
             idx = int(choice) - 1
             if 0 <= idx < len(slices_usuario):
                 slice_seleccionado = slices_usuario[idx]
+                # Copia tal como se leyó: al guardar se verifica que nadie lo haya cambiado
+                original = copy.deepcopy(slice_seleccionado)
                 
                 # Menú de edición
                 print(f"\n{Colors.GREEN}  Editando: {slice_seleccionado.get('nombre')}{Colors.ENDC}")
@@ -84,14 +77,11 @@ def editar_slice(slice_api, auth_manager):
                 
                 cambios = False
                 if edit_choice == '1':
-                    agregar_vms_a_slice(slice_seleccionado, slices, BASE_JSON, VMS_JSON)
-                    cambios = True
+                    cambios = agregar_vms_a_slice(slice_seleccionado, original)
                 elif edit_choice == '2':
-                    modificar_topologia_slice(slice_seleccionado, slices, BASE_JSON)
-                    cambios = True
+                    cambios = modificar_topologia_slice(slice_seleccionado, original)
                 elif edit_choice == '3':
-                    eliminar_vms_de_slice(slice_seleccionado, slices, BASE_JSON, VMS_JSON)
-                    cambios = True
+                    cambios = eliminar_vms_de_slice(slice_seleccionado, original)
                 elif edit_choice == '0':
                     print(f"\n{Colors.YELLOW}  Edición cancelada{Colors.ENDC}")
                 else:
@@ -112,7 +102,12 @@ def editar_slice(slice_api, auth_manager):
     pause()
 
 
-def agregar_vms_a_slice(slice_seleccionado, data, VMS_JSON, BASE_YAML):
+def _slice_desactualizado():
+    show_error("El slice fue modificado por otra sesión. Vuelva a abrir el editor para ver los cambios.")
+    return False
+
+
+def agregar_vms_a_slice(slice_seleccionado, original):
     """Agregar nuevas VMs a un slice existente"""
     print(f"\n{Colors.CYAN}  AGREGAR VMs AL SLICE{Colors.ENDC}")
     
@@ -122,52 +117,60 @@ def agregar_vms_a_slice(slice_seleccionado, data, VMS_JSON, BASE_YAML):
         if cantidad <= 0:
             print(f"\n{Colors.RED}  Debe agregar al menos 1 VM{Colors.ENDC}")
             return
-        vlan = slice_seleccionado.get('vlan', 1)
-        vms_actuales = slice_seleccionado.get('vms', [])
-        num_vms_actuales = len(vms_actuales)
-        if os.path.exists(VMS_JSON):
-            with open(VMS_JSON, 'r', encoding='utf-8') as f:
-                vms_data_json = json.load(f)
-            total_vms = len(vms_data_json.get('vms', []))
-        else:
-            total_vms = 0
-        nuevas_vms = []
-        for i in range(cantidad):
-            num_vm = num_vms_actuales + i + 1
-            print(f"\n{Colors.YELLOW}  --- Configuración VM {num_vm} ---{Colors.ENDC}")
-            flavor = select_flavor()
-            specs = get_flavor_specs(flavor)
-            ip = f"10.7.{vlan}.{num_vm+1}"
-            puerto_vnc = 5900 + total_vms + num_vm
-            vm = {
-                'nombre': f"vm{num_vm}",
-                'cpu': specs['cpu'],
-                'disk': specs['disk'],
-                'memory': specs['memory'],
-                'flavor': flavor,
-                'ip': ip,
-                'puerto_vnc': puerto_vnc,
-                'usuario': slice_seleccionado.get('usuario')
-            }
-            nuevas_vms.append(vm)
-            vms_actuales.append(vm)
-        slice_seleccionado['vms'] = vms_actuales
-        with open(BASE_JSON, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        # Las IPs salen de la subred del slice en el IPAM
+        clave_slice = str(slice_seleccionado.get('id_slice') or slice_seleccionado.get('id')
+                          or slice_seleccionado.get('nombre'))
+        ips = ipam.allocate_ips(clave_slice, cantidad)
+        vms_previas = slice_seleccionado.get('vms')
+        guardado = False
+        # Hasta que el slice se guarda las IPs solo están reservadas en el IPAM: ante
+        # cualquier falla (también Ctrl+C en medio de la configuración) se devuelven
+        try:
+            vms_actuales = list(vms_previas or [])
+            num_vms_actuales = len(vms_actuales)
+            nuevas_vms = []
+            for i in range(cantidad):
+                num_vm = num_vms_actuales + i + 1
+                print(f"\n{Colors.YELLOW}  --- Configuración VM {num_vm} ---{Colors.ENDC}")
+                flavor = select_flavor()
+                specs = get_flavor_specs(flavor)
+                ip = ips[i]
+                vm = {
+                    'nombre': f"vm{num_vm}",
+                    'cpu': specs['cpu'],
+                    'disk': specs['disk'],
+                    'memory': specs['memory'],
+                    'flavor': flavor,
+                    'ip': ip,
+                    'usuario': slice_seleccionado.get('usuario')
+                }
+                nuevas_vms.append(vm)
+                vms_actuales.append(vm)
+            slice_seleccionado['vms'] = vms_actuales
+            guardado = reemplazar_slice(original, slice_seleccionado)
+        finally:
+            if not guardado:
+                if vms_previas is None:
+                    slice_seleccionado.pop('vms', None)
+                else:
+                    slice_seleccionado['vms'] = vms_previas
+                for ip in ips:
+                    ipam.release_ip(ip)
+        if not guardado:
+            return _slice_desactualizado()
         from shared.data_store import guardar_vms
+        # guardar_vms asigna los puertos VNC libres
         guardar_vms(nuevas_vms)
         show_success(f"{cantidad} VM(s) agregada(s) exitosamente al slice")
+        return True
     except ValueError:
         print(f"\n{Colors.RED}  ❌ Valor inválido{Colors.ENDC}")
     except Exception as e:
         show_error(f"Error al agregar VMs: {str(e)}")
 
 
-def modificar_topologia_slice(slice_seleccionado, data, BASE_YAML):
+def modificar_topologia_slice(slice_seleccionado, original):
     """Modificar la topología de un slice existente"""
-    # Asegurar que BASE_JSON esté definido
-    if BASE_JSON is None or BASE_JSON == '':
-        BASE_JSON = os.path.join(os.path.dirname(__file__), '..', '..', 'base_de_datos.json')
     print(f"\n{Colors.CYAN}  MODIFICAR TOPOLOGÍA{Colors.ENDC}")
     print(f"\n{Colors.YELLOW}  Topología actual: {slice_seleccionado.get('topologia')}{Colors.ENDC}")
     print(f"\n  Seleccione nueva topología:")
@@ -193,20 +196,18 @@ def modificar_topologia_slice(slice_seleccionado, data, BASE_YAML):
     if choice in topologias:
         nueva_topologia = topologias[choice]
         slice_seleccionado['topologia'] = nueva_topologia
-        with open(BASE_JSON, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        if not reemplazar_slice(original, slice_seleccionado):
+            return _slice_desactualizado()
         show_success(f"Topología cambiada a '{nueva_topologia}'")
+        return True
     else:
         print(f"\n{Colors.RED}  ❌ Opción inválida{Colors.ENDC}")
 
 
-def eliminar_vms_de_slice(slice_seleccionado, data, VMS_JSON, BASE_YAML):
+def eliminar_vms_de_slice(slice_seleccionado, original):
     """Eliminar VMs de un slice existente"""
     print(f"\n{Colors.CYAN}  ELIMINAR VMs DEL SLICE{Colors.ENDC}")
     
-    # Asegurar que BASE_JSON esté definido
-    if not BASE_JSON:
-        BASE_JSON = os.path.join(os.path.dirname(__file__), '..', '..', 'base_de_datos.json')
     vms_actuales = slice_seleccionado.get('vms', [])
     if not vms_actuales:
         print(f"\n{Colors.YELLOW}  No hay VMs para eliminar en este slice{Colors.ENDC}")
@@ -226,17 +227,12 @@ def eliminar_vms_de_slice(slice_seleccionado, data, VMS_JSON, BASE_YAML):
             if confirm_action(f"¿Eliminar VM '{vm_a_eliminar.get('nombre')}'?"):
                 vms_actuales.pop(idx)
                 slice_seleccionado['vms'] = vms_actuales
-                with open(BASE_JSON, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-                if os.path.exists(VMS_JSON):
-                    with open(VMS_JSON, 'r', encoding='utf-8') as f:
-                        vms_data = json.load(f)
-                    vms_data['vms'] = [vm for vm in vms_data.get('vms', []) 
-                                       if vm.get('nombre') != vm_a_eliminar.get('nombre') 
-                                       or vm.get('ip') != vm_a_eliminar.get('ip')]
-                    with open(VMS_JSON, 'w', encoding='utf-8') as f:
-                        json.dump(vms_data, f, indent=2, ensure_ascii=False)
+                if not reemplazar_slice(original, slice_seleccionado):
+                    return _slice_desactualizado()
+                eliminar_vms(lambda vm: vm.get('nombre') == vm_a_eliminar.get('nombre')
+                             and vm.get('ip') == vm_a_eliminar.get('ip'))
                 show_success(f"VM '{vm_a_eliminar.get('nombre')}' eliminada exitosamente")
+                return True
             else:
                 print(f"\n{Colors.YELLOW}  Eliminación cancelada{Colors.ENDC}")
         else:
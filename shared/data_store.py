@@ -1,21 +1,131 @@
 import json
 import os
+from core.persistence import atomic_write_json
+from core.file_lock import DatabaseLock
+from core.pools import VNCPortAllocator, VLANAllocator
+from core.ipam import IPAM
+from core.snapshot_format import default_database_file, read_records, write_records
+from core.slice_manager.journal import SliceJournal
+from core.slice_manager.storage import apply_journal, record_ids
+from shared.topology.vlan_planner import traducir_conexiones
 
-BASE_JSON = os.path.join(os.path.dirname(__file__), '..', 'base_de_datos.json')
+# base_de_datos.json o, si ya se migró, base_de_datos.jsonl (ver core.snapshot_format).
+# Se lee y escribe siempre con registros en el formato legado.
+BASE_JSON = default_database_file()
 VMS_JSON = os.path.join(os.path.dirname(__file__), '..', 'vms.json')
+VNC_PORTS_JSON = os.path.join(os.path.dirname(__file__), '..', 'vnc_ports.json')
+
+# Locks entre procesos (API, CLI) para los read-modify-write de los archivos JSON
+base_lock = DatabaseLock(BASE_JSON)
+vms_lock = DatabaseLock(VMS_JSON)
+# Journal del SliceManager (SLICE_JOURNAL=1): mutaciones de la API que todavía
+# no están en el snapshot. Mismo archivo y mismo lock que usa JsonSliceStorage
+base_journal = SliceJournal(os.path.splitext(BASE_JSON)[0] + ".journal")
+
+# Puertos VNC libres/ocupados por host (reemplaza contar las VMs de vms.json)
+vnc_ports = VNCPortAllocator(VNC_PORTS_JSON)
+# Subred por slice e IPs de las VMs (ipam.json, compartido con la API)
+ipam = IPAM()
+# VLAN de cada slice, estable aunque se borren otros (vlans.json)
+vlan_pool = VLANAllocator()
+
+
+def _journal_pendiente() -> bool:
+    return os.path.exists(base_journal.path) and os.path.getsize(base_journal.path) > 0
+
+
+def _leer_registros():
+    """Snapshot con el journal pendiente aplicado encima; llamar con base_lock tomado"""
+    data = read_records(BASE_JSON)
+    if _journal_pendiente():
+        data = apply_journal(data, base_journal.replay())
+    return data
+
+
+def _escribir_registros(data):
+    """
+    Escribe el snapshot completo; llamar con base_lock exclusivo. `data` salió de
+    _leer_registros, así que ya incluye el journal: se vacía (queda compactado).
+    """
+    write_records(BASE_JSON, data)
+    if _journal_pendiente():
+        base_journal.reset()
+    base_lock.bump_version()
+
+
+def leer_base():
+    """Lee base_de_datos.json (más el journal pendiente) con lock compartido: nunca ve una escritura a medias"""
+    with base_lock.shared():
+        return _leer_registros()
+
+
+def modificar_base(fn):
+    """
+    Read-modify-write de base_de_datos.json con lock exclusivo: `fn` recibe la
+    lista de slices recién leída (journal incluido) y la modifica en el lugar.
+    Si devuelve False no se escribe nada.
+    """
+    with base_lock.exclusive():
+        data = _leer_registros()
+        resultado = fn(data)
+        if resultado is not False:
+            _escribir_registros(data)
+        return resultado
+
+
+def modificar_vms(fn):
+    """Read-modify-write de vms.json con lock exclusivo (ver modificar_base)"""
+    with vms_lock.exclusive():
+        if os.path.exists(VMS_JSON):
+            with open(VMS_JSON, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        else:
+            data = {"vms": []}
+        resultado = fn(data)
+        if resultado is not False:
+            atomic_write_json(VMS_JSON, data)
+            vms_lock.bump_version()
+        return resultado
+
+
+def reemplazar_slice(original, actualizado):
+    """
+    Reemplaza el registro `original` por `actualizado`. Si otra sesión cambió o
+    borró ese slice desde que se leyó, no se escribe y se devuelve False.
+    """
+    def aplicar(data):
+        for i, s in enumerate(data):
+            if s == original:
+                data[i] = actualizado
+                return True
+        return False
+    return modificar_base(aplicar)
 
 def guardar_slice(slice_data):
-    """Agrega un slice al archivo base_de_datos.json en el formato ejemplo (lista de objetos)"""
+    """
+    Agrega un slice al archivo base_de_datos.json en el formato ejemplo (lista de objetos).
+    Devuelve el id_slice asignado.
+    """
+    # El lock exclusivo evita que dos sesiones lean la misma lista y una pise a la otra
+    with base_lock.exclusive():
+        return _agregar_slice(slice_data)
+
+def _vlans_de_registro(registro):
+    """VLANs de un slice guardado: vlans_usadas ("101,102") o, si está vacío, vlans_separadas"""
+    vlans = []
+    for campo in ('vlans_usadas', 'vlans_separadas'):
+        vlans = [int(v) for v in str(registro.get(campo) or '').split(',') if v.strip().isdigit()]
+        if vlans:
+            break
+    return vlans
+
+def _agregar_slice(slice_data):
     import uuid
     # print("[DEBUG] guardar_slice llamado con:", slice_data)
     import sys
     sys.stdout.flush()
     try:
-        if os.path.exists(BASE_JSON):
-            with open(BASE_JSON, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        else:
-            data = []
+        data = _leer_registros()
     except Exception as e:
         print("[ERROR] Al leer base_de_datos.json:", e)
         data = []
@@ -24,16 +134,21 @@ def guardar_slice(slice_data):
     if data:
         # Buscar el mayor id_slice actual (ignorando los vacíos o no numéricos)
         ids = [int(s.get('id_slice')) for s in data if str(s.get('id_slice')).isdigit()]
-        new_id = str(max(ids) + 1) if ids else "1"
+        new_id = max(ids) + 1 if ids else 1
     else:
-        new_id = "1"
+        new_id = 1
+    # Si se borró el último slice su id vuelve a quedar libre, pero vlans.json o
+    # ipam.json pueden conservar lo que tenía: no heredarlo, saltar a un id limpio
+    while vlan_pool.get(str(new_id)) or ipam.has_subnet(str(new_id)):
+        print(f"[DEBUG] El id de slice {new_id} tiene VLANs o subred de un slice anterior, se usa el siguiente")
+        new_id += 1
+    new_id = str(new_id)
     # Esperar que slice_data['topologias'] sea una lista de topologías completas (cada una con su info y VMs)
     topologias = slice_data.get('topologias')
     if not topologias:
         # Compatibilidad: si no viene la lista, usar el flujo anterior (1 sola topología)
         vms_data = slice_data.get('vms', [])
         cantidad_vms = str(len(vms_data))
-        vlans_separadas = str(len(data) + 1)
         topologia_nombre = slice_data.get('topologia', 'lineal')
         salida_internet = slice_data.get('salida_internet', 'no')
         topologia_obj = {
@@ -59,13 +174,30 @@ def guardar_slice(slice_data):
     else:
         # Si viene la lista de topologías, calcular cantidad_vms sumando todas
         cantidad_vms = str(sum(int(t.get('cantidad_vms', len(t.get('vms', [])))) for t in topologias))
-        vlans_separadas = str(len(data) + 1)
+
+    # Los registros antiguos sin id_slice quedan con el id que les da el SliceManager
+    # (como al escribir él la base): es la clave de sus VLANs y su subred, y ya no
+    # cambia si se borra un slice anterior
+    for clave, registro in record_ids(data):
+        registro['id_slice'] = clave
+    # La primera vez que se usa vlans.json se reservan las VLANs que ya tienen los slices
+    def existentes():
+        return [(s.get('id_slice'), _vlans_de_registro(s)) for s in data]
+    # conexiones_vlans trae VLANs locales 1..n (plan del SliceBuilder): reservar n
+    # VLANs para el slice y reemplazarlas por los IDs reales
+    vms_topologias = [vm for t in topologias for vm in t.get('vms', [])]
+    locales = [int(p.rpartition(':')[2]) for vm in vms_topologias
+               for p in str(vm.get('conexiones_vlans') or '').split(',') if p.rpartition(':')[2].isdigit()]
+    vlans = vlan_pool.allocate(new_id, cantidad=max([1] + locales), existentes=existentes)
+    for vm in vms_topologias:
+        if vm.get('conexiones_vlans'):
+            vm['conexiones_vlans'] = traducir_conexiones(vm['conexiones_vlans'], vlans)
 
     new_slice = {
         "id_slice": new_id,
         "cantidad_vms": cantidad_vms,
-        "vlans_separadas": vlans_separadas,
-        "vlans_usadas": "",
+        "vlans_separadas": str(vlans[0]),
+        "vlans_usadas": ",".join(str(v) for v in vlans),
         "vncs_separadas": "",
         "conexión_topologias": slice_data.get('conexión_topologias', ''),
         "topologias": topologias,
@@ -84,19 +216,60 @@ def guardar_slice(slice_data):
             return obj
     data_clean = clean_surrogates(data)
     try:
-        with open(BASE_JSON, 'w', encoding='utf-8') as f:
-            json.dump(data_clean, f, indent=2, ensure_ascii=False)
+        _escribir_registros(data_clean)
     # print("[DEBUG] Slice guardado exitosamente en base_de_datos.json")
     except Exception as e:
         print("[ERROR] Al guardar base_de_datos.json:", e)
+        vlan_pool.release(new_id)
+    return new_id
+
+def _host_vnc(vm):
+    return vm.get('server') or 'default'
+
 
 def guardar_vms(vms_list):
-    """Agrega VMs al archivo vms.json (sobrescribe todo el array)"""
-    if os.path.exists(VMS_JSON):
-        with open(VMS_JSON, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    else:
-        data = {"vms": []}
-    data['vms'].extend(vms_list)
-    with open(VMS_JSON, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    """
+    Agrega VMs al archivo vms.json. Las que no traen puerto_vnc reciben uno libre
+    de su host, reservado con el lock de vms.json tomado (dos sesiones nunca
+    obtienen el mismo puerto).
+    """
+    def agregar(data):
+        existentes = data.setdefault('vms', [])
+        sin_puerto = {}
+        for vm in vms_list:
+            if not vm.get('puerto_vnc'):
+                sin_puerto.setdefault(_host_vnc(vm), []).append(vm)
+        for host, vms in sin_puerto.items():
+            usados = [e.get('puerto_vnc') for e in existentes if e.get('puerto_vnc') and _host_vnc(e) == host]
+            for vm, puerto in zip(vms, vnc_ports.reserve(len(vms), host, usados)):
+                vm['puerto_vnc'] = puerto
+        existentes.extend(vms_list)
+    modificar_vms(agregar)
+
+
+def eliminar_vms(predicado):
+    """Quita de vms.json las VMs para las que predicado(vm) es True y libera sus puertos VNC"""
+    quitadas = []
+
+    def quitar(data):
+        vms = data.get('vms', [])
+        quitadas.extend(vm for vm in vms if predicado(vm))
+        if not quitadas:
+            return False
+        data['vms'] = [vm for vm in vms if not predicado(vm)]
+    modificar_vms(quitar)
+    # Liberar recién cuando vms.json ya no las tiene: un puerto nunca queda asignado dos veces
+    por_host = {}
+    for vm in quitadas:
+        if vm.get('puerto_vnc'):
+            por_host.setdefault(_host_vnc(vm), []).append(vm['puerto_vnc'])
+    for host, puertos in por_host.items():
+        vnc_ports.release(puertos, host)
+    for vm in quitadas:
+        if vm.get('ip'):
+            try:
+                ipam.release_ip(vm['ip'])
+            except Exception:
+                # IPs antiguas fuera de la superred: no estaban en el IPAM
+                pass
+    return len(quitadas)
@@ -0,0 +1,213 @@
+"""
+Plan de VLANs de un slice: cada enlace entre dos VMs es un segmento con su
+propia VLAN, y dos enlaces de la misma VM nunca comparten VLAN. Es un
+coloreo de aristas del grafo de enlaces: se buscan los mínimos colores posibles.
+
+- Primero un coloreo greedy recorriendo los enlaces en orden BFS; si usa Δ
+  colores (Δ = grado máximo) ya es óptimo. Es el caso de lineal, árbol,
+  anillo par y estrella.
+- Si no, Misra-Gries, que garantiza como máximo Δ + 1 (anillo impar, grafos
+  manuales). La malla completa se resuelve directamente con el óptimo.
+
+Los colores se numeran desde 1: son VLANs locales del slice, que el backend
+traduce a los VLAN IDs reales que asigna al guardarlo (ver VLANAllocator).
+"""
+
+from collections import deque
+from typing import Dict, List, Sequence, Tuple
+
+Enlace = Tuple[int, int]
+
+
+def _normalizar(enlaces: Sequence[Enlace]) -> List[Enlace]:
+    """Quita enlaces repetidos (a-b y b-a son el mismo) y lazos, conservando el orden"""
+    vistos = set()
+    resultado = []
+    for a, b in enlaces:
+        if a == b:
+            continue
+        clave = (a, b) if a < b else (b, a)
+        if clave not in vistos:
+            vistos.add(clave)
+            resultado.append(clave)
+    return resultado
+
+
+def _lowest_free(mask: int) -> int:
+    """Menor color (bit) libre en la máscara de colores usados"""
+    libres = ~mask
+    return (libres & -libres).bit_length() - 1
+
+
+def _greedy(enlaces: List[Enlace], adyacencia: Dict[int, List[int]]) -> Dict[Enlace, int]:
+    """Greedy en orden BFS; cada VM lleva una máscara de bits con sus colores usados"""
+    usados: Dict[int, int] = {v: 0 for v in adyacencia}
+    colores: Dict[Enlace, int] = {}
+    visitados = set()
+    for raiz in adyacencia:
+        if raiz in visitados:
+            continue
+        visitados.add(raiz)
+        cola = deque([raiz])
+        while cola:
+            actual = cola.popleft()
+            for vecino in adyacencia[actual]:
+                clave = (actual, vecino) if actual < vecino else (vecino, actual)
+                if clave not in colores:
+                    color = _lowest_free(usados[actual] | usados[vecino])
+                    colores[clave] = color
+                    usados[actual] |= 1 << color
+                    usados[vecino] |= 1 << color
+                if vecino not in visitados:
+                    visitados.add(vecino)
+                    cola.append(vecino)
+    return colores
+
+
+def _misra_gries(enlaces: List[Enlace], adyacencia: Dict[int, List[int]], grado_max: int) -> Dict[Enlace, int]:
+    """Coloreo con a lo sumo Δ + 1 colores (algoritmo de Misra y Gries)"""
+    # en[v][color] = vecino unido a v por el enlace de ese color; color_enlace la inversa
+    en: Dict[int, Dict[int, int]] = {v: {} for v in adyacencia}
+    color_enlace: Dict[Enlace, int] = {}
+    total = grado_max + 1
+
+    def libre(v: int) -> int:
+        for color in range(total):
+            if color not in en[v]:
+                return color
+        raise RuntimeError("Sin colores libres")  # no ocurre: grado(v) <= Δ
+
+    def pintar(a: int, b: int, color: int):
+        en[a][color] = b
+        en[b][color] = a
+        color_enlace[(a, b) if a < b else (b, a)] = color
+
+    def despintar(a: int, b: int, color: int):
+        del en[a][color]
+        del en[b][color]
+        del color_enlace[(a, b) if a < b else (b, a)]
+
+    def color_de(a: int, b: int):
+        return color_enlace.get((a, b) if a < b else (b, a))
+
+    for u, v in enlaces:
+        # Abanico maximal de u que empieza en v
+        abanico = [v]
+        en_abanico = {v}
+        while True:
+            ultimo = abanico[-1]
+            siguiente = None
+            for color in range(total):
+                vecino = en[u].get(color)
+                if vecino is not None and vecino not in en_abanico and color not in en[ultimo]:
+                    siguiente = vecino
+                    break
+            if siguiente is None:
+                break
+            abanico.append(siguiente)
+            en_abanico.add(siguiente)
+
+        c = libre(u)
+        d = libre(abanico[-1])
+
+        # Invertir el camino alternante d/c que sale de u
+        if c != d:
+            camino = []
+            actual, color = u, d
+            while color in en[actual]:
+                siguiente = en[actual][color]
+                camino.append((actual, siguiente, color))
+                actual, color = siguiente, (c if color == d else d)
+            for a, b, color in camino:
+                despintar(a, b, color)
+            for a, b, color in camino:
+                pintar(a, b, c if color == d else d)
+
+        # Primer vértice w del abanico con d libre cuyo prefijo sigue siendo abanico
+        w = len(abanico) - 1
+        for i, vertice in enumerate(abanico):
+            if i > 0 and color_de(u, vertice) in en[abanico[i - 1]]:
+                w = i - 1
+                break
+            if d not in en[vertice]:
+                w = i
+                break
+
+        # Rotar el prefijo del abanico y pintar (u, w) con d
+        for i in range(w):
+            color = color_de(u, abanico[i + 1])
+            despintar(u, abanico[i + 1], color)
+            pintar(u, abanico[i], color)
+        pintar(u, abanico[w], d)
+
+    return color_enlace
+
+
+def _malla_completa(vertices: List[int]) -> Dict[Enlace, int]:
+    """
+    Coloreo óptimo de una malla completa (todos con todos), como el calendario
+    de un torneo round-robin: n colores si n es impar y n - 1 si es par.
+    """
+    n = len(vertices)
+    m = n if n % 2 else n - 1
+    colores = {}
+    for i in range(m):
+        for j in range(i + 1, m):
+            colores[(i, j)] = (i + j) % m
+    if m != n:
+        # El vértice extra ocupa en cada i el color que i no usa
+        for i in range(m):
+            colores[(i, m)] = (2 * i) % m
+    resultado = {}
+    for (i, j), color in colores.items():
+        a, b = vertices[i], vertices[j]
+        resultado[(a, b) if a < b else (b, a)] = color
+    return resultado
+
+
+def colorear_enlaces(enlaces: Sequence[Enlace]) -> Dict[Enlace, int]:
+    """
+    Asigna a cada enlace (a, b), con a < b, una VLAN local desde 1 de modo que
+    los enlaces de una misma VM tengan VLANs distintas.
+    """
+    enlaces = _normalizar(enlaces)
+    if not enlaces:
+        return {}
+    adyacencia: Dict[int, List[int]] = {}
+    for a, b in enlaces:
+        adyacencia.setdefault(a, []).append(b)
+        adyacencia.setdefault(b, []).append(a)
+    grado_max = max(len(vecinos) for vecinos in adyacencia.values())
+
+    n = len(adyacencia)
+    if len(enlaces) == n * (n - 1) // 2:
+        return {enlace: color + 1 for enlace, color in _malla_completa(sorted(adyacencia)).items()}
+
+    colores = _greedy(enlaces, adyacencia)
+    if max(colores.values()) + 1 > grado_max:
+        colores = _misra_gries(enlaces, adyacencia, grado_max)
+    return {enlace: color + 1 for enlace, color in colores.items()}
+
+
+def conexiones_por_vm(colores: Dict[Enlace, int], nombres: Sequence[str]) -> Dict[int, str]:
+    """
+    Texto de conexiones_vlans de cada VM: "vecino:vlan" separados por coma,
+    ordenados por VLAN (p. ej. "vm2:1,vm4:2").
+    """
+    por_vm: Dict[int, List[Tuple[int, str]]] = {}
+    for (a, b), vlan in colores.items():
+        por_vm.setdefault(a, []).append((vlan, nombres[b]))
+        por_vm.setdefault(b, []).append((vlan, nombres[a]))
+    return {vm: ",".join(f"{nombre}:{vlan}" for vlan, nombre in sorted(lista))
+            for vm, lista in por_vm.items()}
+
+
+def traducir_conexiones(texto: str, vlans: Sequence[int]) -> str:
+    """Cambia las VLANs locales (1..n) de un conexiones_vlans por los IDs reales vlans[n - 1]"""
+    partes = []
+    for parte in (texto or '').split(','):
+        if not parte:
+            continue
+        nombre, _, local = parte.rpartition(':')
+        partes.append(f"{nombre}:{vlans[int(local) - 1]}")
+    return ",".join(partes)
@@ -5,6 +5,7 @@ Constructor interactivo de slices paso a paso
 from shared.ui_helpers import print_header, pause, show_success, show_error, show_info, confirm_action
 from shared.colors import Colors
 from shared.services.flavor_service import select_flavor, get_flavor_specs
+from shared.topology.vlan_planner import colorear_enlaces, conexiones_por_vm
 from typing import List, Dict, Tuple
 
 
@@ -18,6 +19,7 @@ class SliceBuilder:
         self.enlaces = []  # Lista de tuplas: (vm_origen, vm_destino)
         self.topologias = []  # Lista de topologías: {"tipo": "lineal", "vms": [0, 1, 2]}
         self.vlan = None  # Se asignará automáticamente
+        self.vlans_enlaces = {}  # (vm_a, vm_b) -> VLAN local, calculado al generar el slice
         self.salida_internet = "no"
     
     def start(self) -> Tuple[str, str, List[Dict], str]:
@@ -402,6 +404,11 @@ class SliceBuilder:
         if not self.vms or not self.enlaces:
             return False
         n = len(self.vms)
+        # Lista de adyacencia: el BFS visita cada enlace una vez en lugar de recorrerlos todos por VM
+        vecinos = {}
+        for a, b in self.enlaces:
+            vecinos.setdefault(a, []).append(b)
+            vecinos.setdefault(b, []).append(a)
         visitados = set()
         from collections import deque
         q = deque()
@@ -411,11 +418,9 @@ class SliceBuilder:
             if actual in visitados:
                 continue
             visitados.add(actual)
-            for a, b in self.enlaces:
-                if a == actual and b not in visitados:
-                    q.append(b)
-                elif b == actual and a not in visitados:
-                    q.append(a)
+            for vecino in vecinos.get(actual, []):
+                if vecino not in visitados:
+                    q.append(vecino)
         return len(visitados) == n
 
     def _validar_configuracion(self) -> bool:
@@ -469,6 +474,11 @@ class SliceBuilder:
             enlaces_str = ';'.join(f"{self.vms[o]['nombre']}-{self.vms[d]['nombre']}" for o, d in enlaces)
         # Si hay 1 topología o no hay enlaces, queda vacío
 
+        # Plan de red: una VLAN local (1..n) por enlace, distinta entre los enlaces de
+        # una misma VM; el backend la traduce a los VLAN IDs que reserva para el slice
+        self.vlans_enlaces = colorear_enlaces(self.enlaces)
+        conexiones = conexiones_por_vm(self.vlans_enlaces, [vm['nombre'] for vm in self.vms])
+
         # Preparar lista de topologías para el JSON final
         topologias_json = []
         for topo in self.topologias:
@@ -482,7 +492,7 @@ class SliceBuilder:
                     "almacenamiento": f"{vm.get('disk', 1)}G",
                     "puerto_vnc": "",
                     "image": vm.get('imagen', ''),
-                    "conexiones_vlans": "",
+                    "conexiones_vlans": conexiones.get(idx, ""),
                     "acceso": vm.get('conexion_remota', 'no'),
                     "server": ""
                 })
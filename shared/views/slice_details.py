@@ -29,7 +29,7 @@ def ver_detalles_slice(slice_manager, user=None):
     print(f"Nombre: {s.name}")
     print(f"Topología: {s.topology.value}")
     # print(f"Propietario: {s.owner}")
-    print(f"Creado: {s.created_at}")
+    print(f"Creado: {s.created_at or 'desconocido'}")
     print(f"Estado: {getattr(s, 'status', 'N/A')}")
     print(f"VMs: {len(s.vms)}")
     print(f"CPU por VM: {s.vms[0].cpu if s.vms else 'N/A'}")
@@ -94,7 +94,7 @@ def show_slice_details_enhanced(slice_manager, user=None):
         topo_type = slice.topology.value if hasattr(slice.topology, 'value') else slice.topology
         draw_topology_graph(topo_type, len(slice.vms))
         input("\n  Presione Enter para continuar...")
-    print(f"  Creado: {slice.created_at}")
+    print(f"  Creado: {slice.created_at or 'desconocido'}")
     # Mostrar enlaces según la topología
     print(f"\n  Enlaces:")
     print("  +---------+---------+")
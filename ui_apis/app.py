@@ -1,14 +1,30 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Body
+from fastapi import FastAPI, HTTPException, Depends, status, Body, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from starlette.background import BackgroundTask
 from typing import Optional, List, Dict
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.slice_manager.models import SliceCreate, Slice, VM, TopologyType
 from core.slice_manager.manager import SliceManager
+from core.slice_manager.storage import DEFAULT_SQLITE_FILE
+from core.slice_manager.query import MAX_LIMIT, SliceQuery, parse_fields
+from core.warmup import ServiceUnavailable, Warmup
+from ui_apis.cache import SliceResponseCache, dumps
+from ui_apis.writes import WriteExecutor
+from ui_apis.jobs import JobManager, JobQueueFull
+from ui_apis.events import SliceEventBroker, TooManySubscribers
+from ui_apis import ratelimit
+from ui_apis.ratelimit import RateLimited
+from ui_apis.idempotency import (IdempotencyConflict, IdempotencyStore, MAX_KEY_LENGTH,
+                                 SQLiteIdempotencyStore, StoredResponse, fingerprint)
 
 # Modelos de respuesta simplificados
 class Token(BaseModel):
@@ -37,11 +53,23 @@ class SliceCreateAPI(BaseModel):
     flavor: str = "small"
     topology_segments: List[dict] = []
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Los servicios se inician en segundo plano: el proceso acepta conexiones
+    (y health checks) enseguida, y /api/ready responde 200 cuando ya puede
+    recibir tráfico. Al salir se terminan los trabajos y escrituras encolados.
+    """
+    warmup.start()
+    yield
+    await asyncio.get_running_loop().run_in_executor(None, shutdown_services)
+
 # Configuración de FastAPI
 app = FastAPI(
     title="PUCP Cloud Orchestrator API",
     description="API para gestión de slices en cloud privado",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS
@@ -56,8 +84,205 @@ app.add_middleware(
 # Autenticación
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Instancia del manager
-slice_manager = SliceManager()
+# Cantidad de workers de uvicorn (--workers toma su valor por defecto de WEB_CONCURRENCY)
+API_WORKERS = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+# Con varios workers todo el estado compartido vive en la base SQLite: slices,
+# registro de cambios, claves de idempotencia y trabajos. El backend json
+# guarda el estado en memoria de cada proceso y no sirve para eso.
+if API_WORKERS > 1 and os.getenv('SLICE_STORAGE', 'json').lower() != 'sqlite':
+    raise RuntimeError(f"WEB_CONCURRENCY={API_WORKERS} requiere SLICE_STORAGE=sqlite "
+                       f"(el backend json no se comparte entre procesos)")
+
+# Los servicios que dependen de la base se crean en init_services (segundo plano, ver lifespan)
+slice_manager: Optional[SliceManager] = None
+SHARED_STORE: Optional[str] = None
+# JSON ya serializado de los slices para los listados (se invalida con cada mutación)
+slice_cache: Optional[SliceResponseCache] = None
+# Aviso de cambios a los clientes de /api/slices/events
+slice_events: Optional[SliceEventBroker] = None
+# Creaciones pedidas con "Prefer: respond-async" (202 + GET /api/jobs/{id})
+slice_jobs: Optional[JobManager] = None
+# Respuestas ya enviadas por Idempotency-Key (los reintentos no repiten la operación)
+idempotency = None
+# Las mutaciones (escrituras a disco) se ejecutan en un hilo aparte; las lecturas
+# siguen en el loop y salen de memoria mientras una escritura está en curso
+slice_writes = WriteExecutor()
+# Presupuestos por usuario (RATE_READ_*, RATE_WRITE_*) y tope de creaciones en curso (MAX_INFLIGHT_CREATIONS);
+# con la base compartida mutaciones y creaciones valen para todos los workers juntos (ver ui_apis.ratelimit)
+read_limits = write_limits = creation_slots = None
+
+
+def init_services():
+    """Abre la base y arma índices y cachés; corre en el hilo de Warmup"""
+    global slice_manager, SHARED_STORE, slice_cache, slice_events, slice_jobs, idempotency
+    global read_limits, write_limits, creation_slots
+    manager = SliceManager()
+    shared = manager.storage.path if manager.storage.shared_changes else None
+    cache = SliceResponseCache(manager)
+    # Primer listado completo ya serializado: la primera petición no paga el armado
+    cache.listing()
+    events = SliceEventBroker(manager, cache)
+    jobs = JobManager(store_path=shared)
+    store = SQLiteIdempotencyStore(shared) if shared else IdempotencyStore()
+    read_limits, write_limits, creation_slots = ratelimit.from_env(shared, API_WORKERS)
+    slice_manager, SHARED_STORE, slice_cache, slice_events, slice_jobs, idempotency = (
+        manager, shared, cache, events, jobs, store)
+    # Con la base compartida, avisar también de los cambios hechos por los otros workers
+    manager.start_watcher()
+
+
+def shutdown_services():
+    """Terminar los trabajos y escrituras encolados y dejar la base en disco antes de salir"""
+    warmup.wait()  # si todavía está iniciando, dejar que termine antes de cerrar
+    if slice_jobs is not None:
+        slice_jobs.shutdown(wait=True)
+    slice_writes.shutdown(wait=True)
+    if slice_manager is not None:
+        slice_manager.stop_watcher()
+        slice_manager.flush()
+
+
+warmup = Warmup("UI-APIs", init_services)
+
+
+def json_bytes(body: bytes, status_code: int = 200) -> Response:
+    """Respuesta con un cuerpo JSON ya codificado (sin pasar por jsonable_encoder)"""
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+def wants_async(request: Request) -> bool:
+    """El cliente pidió procesamiento asíncrono (RFC 7240: Prefer: respond-async)"""
+    prefer = request.headers.get("prefer", "")
+    return any(p.strip().lower() == "respond-async" for p in prefer.split(","))
+
+
+def submit_job(kind: str, fn) -> Response:
+    """Encola fn() como trabajo y responde 202 con su id y dónde consultarlo"""
+    try:
+        job = slice_jobs.submit(kind, fn)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e),
+                            headers={"Retry-After": "5"})
+    status_url = f"/api/jobs/{job.id}"
+    body = dumps({"job_id": job.id, "status": job.status, "status_url": status_url})
+    return Response(content=body, status_code=status.HTTP_202_ACCEPTED, media_type="application/json",
+                    headers={"Location": status_url, "Preference-Applied": "respond-async"})
+
+
+async def run_creation(request: Request, kind: str, message: str, create,
+                       status_code: int = status.HTTP_200_OK) -> Response:
+    """
+    Ejecuta create() (devuelve el Slice creado) en el hilo de escrituras,
+    ocupando un lugar de creation_slots hasta que termina. Con "Prefer:
+    respond-async" se encola como trabajo y el lugar se libera al terminar este.
+    """
+    # Con la base compartida acquire/release son transacciones SQLite: fuera del loop
+    try:
+        await asyncio.to_thread(creation_slots.acquire)
+    except RateLimited as e:
+        raise rate_limited(e)
+    if wants_async(request):
+        def job() -> dict:
+            try:
+                return {"message": message, "slice": slice_writes.call(create).to_dict()}
+            finally:
+                creation_slots.release()
+        try:
+            return submit_job(kind, job)
+        except BaseException:
+            await asyncio.to_thread(creation_slots.release)
+            raise
+    try:
+        slice_obj = await slice_writes.run(create)
+    finally:
+        await asyncio.to_thread(creation_slots.release)
+    return json_bytes(dumps({"message": message, "slice": slice_obj.to_dict()}), status_code)
+
+
+def idempotency_scope(request: Request, current_user: dict) -> str:
+    """Ámbito de las claves: cada usuario y ruta tiene las suyas"""
+    return f"{current_user['username']} {request.method} {request.url.path}"
+
+
+async def idempotent(request: Request, current_user: dict, payload, fn) -> Response:
+    """
+    Ejecuta fn() (devuelve un Response) una sola vez por Idempotency-Key: un
+    reintento con la misma clave recibe la respuesta original con
+    "Idempotent-Replayed: true". Sin la cabecera se ejecuta siempre.
+    """
+    key = request.headers.get("idempotency-key")
+    if key is None:
+        return await fn()
+    if not 0 < len(key) <= MAX_KEY_LENGTH:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Idempotency-Key debe tener entre 1 y {MAX_KEY_LENGTH} caracteres")
+
+    async def ejecutar() -> StoredResponse:
+        response = await fn()
+        headers = {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+        return StoredResponse(response.status_code, response.body, response.media_type, headers)
+
+    try:
+        stored, replayed = await idempotency.run(idempotency_scope(request, current_user), key, fingerprint(payload), ejecutar)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    response = Response(content=stored.body, status_code=stored.status_code,
+                        media_type=stored.media_type, headers=stored.headers)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match con comparación débil (ignora el prefijo W/)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def conditional_json(request: Request, etag: str, build) -> Response:
+    """
+    304 sin cuerpo si el cliente ya tiene esta versión (If-None-Match); si no,
+    build() arma el cuerpo y se responde con el ETag. El ETag se calcula antes
+    que el cuerpo: si una mutación ocurre en medio, la próxima petición no
+    coincide y se vuelve a enviar.
+    """
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response = json_bytes(build())
+    response.headers["ETag"] = etag
+    return response
+
+
+def slice_listing(request: Request, owner: Optional[str], status_filter: Optional[str],
+                  topology: Optional[str], created_from: Optional[str], created_to: Optional[str], sort: Optional[str],
+                  limit: Optional[int], cursor: Optional[str], fields: Optional[str]) -> Response:
+    """
+    Listado de slices. Sin parámetros de consulta devuelve el listado completo
+    cacheado (formato de siempre); con filtros, orden, limit/cursor o fields
+    devuelve una página con "next_cursor". Responde 304 si If-None-Match
+    coincide con el ETag actual.
+    """
+    etag = slice_cache.etag(request.url.path, str(request.query_params))
+    if not any((status_filter, topology, created_from, created_to, sort, limit, cursor, fields)):
+        return conditional_json(request, etag, lambda: slice_cache.listing(owner))
+    try:
+        query = SliceQuery(owner=owner, status=status_filter, topology=topology,
+                           created_from=created_from, created_to=created_to, sort=sort)
+        fields_list = parse_fields(fields)
+        return conditional_json(request, etag,
+                                lambda: slice_cache.query(query, limit or MAX_LIMIT, cursor, fields_list))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 # Función para verificar token (simplificada)
 async def get_current_user(token: str = Depends(oauth2_scheme)):
@@ -69,6 +294,47 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         )
     return {"username": "admin", "role": "admin"}
 
+def not_ready(e: ServiceUnavailable) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e),
+                         headers={"Retry-After": "1"})
+
+def rate_limited(e: RateLimited) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e),
+                         headers={"Retry-After": e.retry_after_header})
+
+def admit(limiter: ratelimit.RateLimiter, current_user: dict, token: str, charge: bool = True):
+    # 503 hasta que los servicios terminen de iniciar (todos los endpoints de slices pasan por aquí)
+    try:
+        warmup.check()
+    except ServiceUnavailable as e:
+        raise not_ready(e)
+    if not charge:
+        return
+    # Mientras get_current_user no valide el JWT todos son "admin": el token distingue cada sesión
+    key = f"{current_user['username']}:{hashlib.sha256(token.encode()).hexdigest()[:16]}"
+    try:
+        limiter.check(key)
+    except RateLimited as e:
+        raise rate_limited(e)
+
+async def read_user(current_user: dict = Depends(get_current_user), token: str = Depends(oauth2_scheme)):
+    """Usuario autenticado, descontando una lectura de su presupuesto (429 si no le queda)"""
+    admit(read_limits, current_user, token)
+    return current_user
+
+def write_user(request: Request, current_user: dict = Depends(get_current_user),
+               token: str = Depends(oauth2_scheme)):
+    """
+    Usuario autenticado, descontando una mutación de su presupuesto (429 si no le queda).
+    Un reintento con la Idempotency-Key de una operación ya completada no se
+    descuenta: solo reenvía la respuesta guardada.
+    Es síncrona: FastAPI la corre en su pool de hilos y el check contra SQLite no frena el loop.
+    """
+    key = request.headers.get("idempotency-key")
+    replay = bool(key) and warmup.ready and idempotency.completed(idempotency_scope(request, current_user), key)
+    admit(write_limits, current_user, token, charge=not replay)
+    return current_user
+
 # === ENDPOINTS ===
 
 @app.get("/")
@@ -97,9 +363,10 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 @app.post("/api/slices", response_model=SliceResponse, status_code=status.HTTP_201_CREATED)
 async def create_slice(
     slice_data: SliceCreateAPI,
-    current_user: dict = Depends(get_current_user)
+    request: Request,
+    current_user: dict = Depends(write_user)
 ):
-    """Crear un nuevo slice"""
+    """Crear un nuevo slice (con "Prefer: respond-async" responde 202 y lo crea en segundo plano)"""
     try:
         # Convert Pydantic model to dataclass
         slice_create_dc = SliceCreate(
@@ -112,11 +379,16 @@ async def create_slice(
             flavor=slice_data.flavor,
             topology_segments=slice_data.topology_segments
         )
-        slice = await slice_manager.create_slice(slice_create_dc, current_user["username"])
-        return SliceResponse(
-            message="Slice creado exitosamente",
-            slice=slice
-        )
+        owner = current_user["username"]
+
+        async def crear() -> Response:
+            return await run_creation(request, "create_slice", "Slice creado exitosamente",
+                                      lambda: slice_manager.create_slice(slice_create_dc, owner),
+                                      status.HTTP_201_CREATED)
+
+        return await idempotent(request, current_user, slice_data.dict(), crear)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -125,137 +397,375 @@ async def create_slice(
 
 @app.get("/api/slices", response_model=SlicesListResponse)
 async def get_slices(
+    request: Request,
     owner: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    status_filter: Optional[str] = Query(None, alias="status"),
+    topology: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(read_user)
 ):
-    """Listar slices"""
-    slices = slice_manager.get_slices(owner)
-    return SlicesListResponse(
-        slices=slices,
-        total=len(slices)
-    )
+    """
+    Listar slices. Filtros: owner, status, topology, created_from/created_to
+    (ISO 8601). sort=campo o -campo; limit + cursor (next_cursor de la página
+    anterior) para paginar; fields=id,name,status,... (admite nombre_slice,
+    usuario, estado, timestamp) para traer solo esas columnas.
+    """
+    return slice_listing(request, owner, status_filter, topology, created_from, created_to, sort, limit, cursor, fields)
+
+# Declarados antes de /api/slices/{slice_id} para que "export"/"changes"/"events" no se tomen como un id
+@app.get("/api/slices/export")
+async def export_slices(
+    owner: Optional[str] = None,
+    current_user: dict = Depends(read_user)
+):
+    """
+    Exportar todos los slices como NDJSON (application/x-ndjson): un slice por
+    línea, con los mismos campos que en GET /api/slices. Se genera a medida que
+    se envía (el iterador síncrono corre fuera del loop), sin armar la lista completa.
+    """
+    return StreamingResponse(slice_cache.export_lines(owner), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="slices.ndjson"'})
+
+@app.get("/api/slices/changes")
+async def slice_changes(
+    since: int = Query(0, ge=0),
+    epoch: Optional[str] = None,
+    current_user: dict = Depends(read_user)
+):
+    """
+    Cambios desde la secuencia `since` (la "seq" de la respuesta anterior, con
+    su "epoch"): {"epoch", "seq", "full": false, "changes": [{"seq", "op", "id",
+    "slice"}]}, con op create/update/delete y un solo cambio por slice.
+    Si el servidor ya no tiene esos cambios (since=0, cursor muy viejo, otra
+    época o la base cambió desde otro proceso) responde "full": true con todos
+    los slices; aplicar después los cambios ya incluidos no altera el resultado.
+    """
+    seq, changes = slice_manager.changes_since(since)
+    if since == 0 or epoch != slice_manager.epoch:
+        changes = None
+    head = b'{"epoch":' + dumps(slice_manager.epoch) + b',"seq":' + str(seq).encode()
+    if changes is None:
+        # El listado completo ya está cacheado: '{"slices":[...],"total":N}' sin la llave inicial
+        return json_bytes(head + b',"full":true,' + slice_cache.listing()[1:])
+    items = []
+    for change_seq, evento, slice_id, _ in changes:
+        slice_obj = slice_manager.get_slice(slice_id) if evento != "delete" else None
+        prefix = b'{"seq":' + str(change_seq).encode() + b',"id":' + dumps(slice_id)
+        if slice_obj is None:
+            items.append(prefix + b',"op":"delete"}')
+        else:
+            op = b'"create"' if evento == "create" else b'"update"'
+            items.append(prefix + b',"op":' + op + b',"slice":' + slice_cache.fragment(slice_obj) + b'}')
+    return json_bytes(head + b',"full":false,"changes":[' + b",".join(items) + b"]}")
+
+@app.get("/api/slices/events")
+async def slice_events_stream(
+    request: Request,
+    owner: Optional[str] = None,
+    last_event_id: Optional[str] = None,
+    current_user: dict = Depends(read_user)
+):
+    """
+    Cambios de slices en vivo (text/event-stream). Eventos: "ready" al conectar,
+    "slice" con {"seq", "id", "op", "slice"} por cada cambio (op create/update/delete)
+    y "reset" si hay que volver a listar todo. owner filtra por usuario. Para
+    retomar se envía la cabecera Last-Event-ID (o ?last_event_id=) con el último id recibido.
+    """
+    try:
+        waiter = slice_events.subscribe()
+    except TooManySubscribers as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail=str(e), headers={"Retry-After": "30"})
+    resume = request.headers.get("last-event-id") or last_event_id
+    # stream() da de baja al suscriptor al terminar; la tarea de fondo cubre el
+    # caso en que la respuesta se corta antes de empezar a iterarlo
+    return StreamingResponse(slice_events.stream(waiter, owner, resume, request.is_disconnected),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                             background=BackgroundTask(slice_events.unsubscribe, waiter))
 
 @app.get("/api/slices/{slice_id}")
 async def get_slice(
     slice_id: str,
-    current_user: dict = Depends(get_current_user)
+    request: Request,
+    current_user: dict = Depends(read_user)
 ):
-    """Obtener detalles de un slice"""
-    slice = slice_manager.get_slice(slice_id)
-    if not slice:
+    """Obtener detalles de un slice (304 si If-None-Match coincide con el ETag)"""
+    # El ETag incluye la ruta: solo coincide si este slice existía en esta versión
+    etag = slice_cache.etag(request.url.path)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    body = slice_cache.detail(slice_id)
+    if body is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Slice no encontrado"
         )
-    return {"slice": slice}
+    response = json_bytes(body)
+    response.headers["ETag"] = etag
+    return response
 
 @app.delete("/api/slices/{slice_id}")
 async def delete_slice(
     slice_id: str,
-    current_user: dict = Depends(get_current_user)
+    request: Request,
+    current_user: dict = Depends(write_user)
 ):
-    """Eliminar un slice"""
-    if not slice_manager.delete_slice(slice_id):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Slice no encontrado"
-        )
-    return {"message": "Slice eliminado exitosamente"}
+    """Eliminar un slice (con Idempotency-Key un reintento devuelve la misma respuesta, no 404)"""
+    async def eliminar() -> Response:
+        if not await slice_writes.run(slice_manager.delete_slice, slice_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Slice no encontrado"
+            )
+        return json_bytes(dumps({"message": "Slice eliminado exitosamente"}))
+
+    return await idempotent(request, current_user, None, eliminar)
 
 @app.put("/api/slices/{slice_id}/status")
 async def update_slice_status(
     slice_id: str,
     status_update: SliceStatusUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(write_user)
 ):
     """Actualizar estado del slice"""
-    if not slice_manager.update_slice_status(slice_id, status_update.status):
+    if not await slice_writes.run(slice_manager.update_slice_status, slice_id, status_update.status):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Slice no encontrado"
         )
     return {"message": "Estado actualizado exitosamente"}
 
+@app.get("/api/admin/vms/stats")
+async def vm_stats(
+    by: Optional[str] = None,
+    owner: Optional[str] = None,
+    image: Optional[str] = None,
+    flavor: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    topology: Optional[str] = None,
+    cpu_min: Optional[int] = None,
+    memory_min: Optional[int] = None,
+    disk_min: Optional[int] = None,
+    include_vms: bool = False,
+    limit: int = 100,
+    current_user: dict = Depends(read_user)
+):
+    """
+    Totales de VMs, cores, RAM y disco de toda la flota, opcionalmente agrupados
+    (by=owner|image|flavor|status|topology) y filtrados. Solo administradores.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo disponible para administradores"
+        )
+    where = {
+        "owner": owner, "image": image, "flavor": flavor, "status": status_filter,
+        "topology": topology, "cpu_min": cpu_min, "memory_min": memory_min, "disk_min": disk_min
+    }
+    table = slice_manager.vm_table()
+    try:
+        result = {"by": by, "result": table.aggregate(by, where)}
+        if include_vms:
+            result["vms"] = table.select(where, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return result
+
+@app.get("/api/ready")
+async def readiness_check():
+    """
+    Readiness: 200 cuando los servicios terminaron de iniciar, 503 mientras
+    tanto (o si fallaron). Incluye cuánto tardó (o lleva) el arranque.
+    """
+    body = {"service": "UI-APIs", **warmup.status()}
+    if not warmup.ready:
+        return Response(content=dumps(body), status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        media_type="application/json", headers={"Retry-After": "1"})
+    return body
+
 @app.get("/api/health")
-async def health_check():
-    """Health check del servicio"""
+def health_check():
+    """
+    Health check del servicio (responde aunque los servicios sigan iniciando; ver /api/ready).
+    Es def: las estadísticas consultan la base compartida y FastAPI lo corre en el threadpool.
+    """
+    if not warmup.ready:
+        return {"status": "starting", "service": "UI-APIs", "pid": os.getpid(), "startup": warmup.status()}
     return {
         "status": "healthy",
         "service": "UI-APIs",
-        "slices_count": len(slice_manager.slices)
+        "startup": warmup.status(),
+        "slices_count": slice_manager.count(),
+        "pid": os.getpid(),
+        "pending_writes": slice_writes.pending,
+        "jobs": slice_jobs.stats(),
+        "idempotency": idempotency.stats(),
+        "events": slice_events.stats(),
+        "rate_limits": {
+            "reads": read_limits.stats(),
+            "writes": write_limits.stats(),
+            "creations": creation_slots.stats()
+        }
     }
 
+def solicitud_a_slice(nombre_slice: str, solicitud_json: dict):
+    """Convierte una solicitud del servicio externo en (SliceCreate, VMs)"""
+    # Extraer datos básicos
+    cantidad_vms = int(solicitud_json.get("cantidad_vms", 1))
+    topologias = solicitud_json.get("topologias", [])
+    # Tomar la primera topología como principal
+    topo = topologias[0] if topologias else {}
+    topology_name = topo.get("nombre", "lineal")
+    vms_data = topo.get("vms", [])
+    # Crear lista de VMs
+    vms = []
+    for vm in vms_data:
+        vms.append(VM(
+            id=vm.get("nombre", ""),
+            name=vm.get("nombre", ""),
+            cpu=int(vm.get("cores", "1")),
+            memory=int(vm.get("ram", "500M").replace("M", "")),
+            disk=int(float(vm.get("almacenamiento", "1G").replace("G", ""))),
+            flavor="small",
+            status="pending",
+            conexion_remota=vm.get("acceso", "no"),
+            imagen=vm.get("image", "")
+        ))
+    # Crear objeto SliceCreate
+    slice_create = SliceCreate(
+        name=nombre_slice,
+        topology=TopologyType(topology_name) if topology_name in TopologyType._value2member_map_ else TopologyType.LINEAR,
+        num_vms=cantidad_vms,
+        cpu=1,
+        memory=512,
+        disk=1,
+        flavor="small"
+    )
+    # Eliminar id_slice del json antes de guardar
+    if "id_slice" in solicitud_json:
+        solicitud_json["id_slice"] = ""
+    return slice_create, vms
+
 # Endpoint para crear slice desde servicio externo (formato especial)
 @app.post("/slices/solicitud_creacion")
-async def solicitud_creacion(payload: dict = Body(...), current_user: dict = Depends(get_current_user)):
+async def solicitud_creacion(request: Request, payload: dict = Body(...),
+                             current_user: dict = Depends(write_user)):
     """
     Recibe una solicitud de creación de slice en formato especial (nombre_slice y solicitud_json), lo guarda y lo hace visible en los listados estándar.
+    Con "Prefer: respond-async" responde 202 con el id del trabajo en lugar de esperar a que termine.
     """
     nombre_slice = payload.get("nombre_slice")
     solicitud_json = payload.get("solicitud_json")
-    # Mapear el JSON recibido a SliceCreate (adaptar según tu modelo)
-    try:
-        # Extraer datos básicos
-        cantidad_vms = int(solicitud_json.get("cantidad_vms", 1))
-        topologias = solicitud_json.get("topologias", [])
-        # Tomar la primera topología como principal
-        topo = topologias[0] if topologias else {}
-        topology_name = topo.get("nombre", "lineal")
-        internet = topo.get("internet", "no")
-        vms_data = topo.get("vms", [])
-        # Crear lista de VMs
-        from core.slice_manager.models import VM, SliceCreate, TopologyType
-        vms = []
-        for vm in vms_data:
-            vms.append(VM(
-                id=vm.get("nombre", ""),
-                name=vm.get("nombre", ""),
-                cpu=int(vm.get("cores", "1")),
-                memory=int(vm.get("ram", "500M").replace("M", "")),
-                disk=int(float(vm.get("almacenamiento", "1G").replace("G", ""))),
-                flavor="small",
-                status="pending",
-                conexion_remota=vm.get("acceso", "no"),
-                imagen=vm.get("image", "")
-            ))
-        # Crear objeto SliceCreate
-        slice_create = SliceCreate(
-            name=nombre_slice,
-            topology=TopologyType(topology_name) if topology_name in TopologyType._value2member_map_ else TopologyType.LINEAR,
-            num_vms=cantidad_vms,
-            cpu=1,
-            memory=512,
-            disk=1,
-            flavor="small"
-        )
-        # Eliminar id_slice del json antes de guardar
-        if "id_slice" in solicitud_json:
-            solicitud_json["id_slice"] = ""
+    owner = current_user["username"]
+
+    async def crear() -> Response:
+        # Mapear el JSON recibido a SliceCreate (adaptar según tu modelo)
+        slice_create, vms = solicitud_a_slice(nombre_slice, solicitud_json)
         # Crear el slice usando el manager
-        slice_obj = slice_manager.create_slice(slice_create, current_user["username"], vms_override=vms)
-        return {
-            "message": "Slice creado y guardado correctamente (servicio externo)",
-            "slice": slice_obj.to_dict() if hasattr(slice_obj, 'to_dict') else str(slice_obj)
-        }
+        return await run_creation(request, "solicitud_creacion",
+                                  "Slice creado y guardado correctamente (servicio externo)",
+                                  lambda: slice_manager.create_slice(slice_create, owner, vms_override=vms))
+
+    try:
+        # La huella se toma antes de crear: solicitud_a_slice limpia id_slice del payload
+        return await idempotent(request, current_user, payload, crear)
+    except HTTPException:
+        raise
     except Exception as e:
         return {"error": str(e), "message": "Error al crear el slice desde el servicio externo"}
 
+async def cambiar_estado_compat(request: Request, payload: dict, current_user: dict,
+                                nuevo_estado: str, mensaje: str) -> Response:
+    """Pausar/reanudar con el formato del servicio externo: {"slice_id": ...}"""
+    slice_id = str(payload.get("slice_id", ""))
+
+    async def cambiar() -> Response:
+        if not await slice_writes.run(slice_manager.update_slice_status, slice_id, nuevo_estado):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Slice no encontrado")
+        return json_bytes(dumps({"message": mensaje, "slice_id": slice_id, "estado": nuevo_estado}))
+
+    return await idempotent(request, current_user, payload, cambiar)
+
+# Endpoints de pausa, reanudación y eliminación (mismo formato que el servicio externo)
+@app.post("/slices/pausar_slice")
+async def pausar_slice(request: Request, payload: dict = Body(...),
+                       current_user: dict = Depends(write_user)):
+    """Pasa el slice a "inactiva" """
+    return await cambiar_estado_compat(request, payload, current_user, "inactiva", "Slice pausado correctamente")
+
+@app.post("/slices/reanudar_slice")
+async def reanudar_slice(request: Request, payload: dict = Body(...),
+                         current_user: dict = Depends(write_user)):
+    """Pasa el slice a "activa" """
+    return await cambiar_estado_compat(request, payload, current_user, "activa", "Slice reanudado correctamente")
+
+@app.post("/slices/eliminar_slice")
+async def eliminar_slice(request: Request, payload: dict = Body(...),
+                         current_user: dict = Depends(write_user)):
+    """Elimina el slice y libera su subred y sus VLANs"""
+    slice_id = str(payload.get("slice_id", ""))
+
+    async def eliminar() -> Response:
+        if not await slice_writes.run(slice_manager.delete_slice, slice_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Slice no encontrado")
+        return json_bytes(dumps({"message": "Slice eliminado correctamente", "slice_id": slice_id}))
+
+    return await idempotent(request, current_user, payload, eliminar)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60),
+    current_user: dict = Depends(read_user)
+):
+    """
+    Estado de un trabajo (queued, running, done con "result", failed con "error").
+    Con wait=N espera hasta N segundos a que termine antes de responder.
+    """
+    job = slice_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trabajo no encontrado")
+    if wait and not job.finished:
+        job = await slice_jobs.wait(job, wait)
+    return job.to_dict()
+
 # Endpoint alternativo para listar slices (compatibilidad)
 @app.get("/slices/listar_slices")
-async def listar_slices(current_user: dict = Depends(get_current_user)):
+async def listar_slices(
+    request: Request,
+    owner: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    topology: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(read_user)
+):
     """
-    Listar todos los slices (endpoint alternativo para compatibilidad)
+    Listar todos los slices (endpoint alternativo para compatibilidad).
+    Acepta los mismos parámetros de consulta que GET /api/slices.
     """
-    slices = slice_manager.get_slices()
-    return {
-        "slices": slices,
-        "total": len(slices)
-    }
+    return slice_listing(request, owner, status_filter, topology, created_from, created_to, sort, limit, cursor, fields)
 
 
 if __name__ == "__main__":
     import uvicorn
     print("=== PUCP Cloud Orchestrator API ===")
     print("Servidor iniciado en: https://localhost:8443")
-    # Run without reload to avoid import string requirement
-    uvicorn.run(app, host="0.0.0.0", port=8443)
\ No newline at end of file
+    if API_WORKERS > 1:
+        # Con varios workers uvicorn necesita la ruta de importación de la app
+        print(f"Workers: {API_WORKERS} (base compartida: {os.getenv('SLICE_SQLITE_PATH', DEFAULT_SQLITE_FILE)})")
+        uvicorn.run("ui_apis.app:app", host="0.0.0.0", port=8443, workers=API_WORKERS)
+    else:
+        # Run without reload to avoid import string requirement
+        uvicorn.run(app, host="0.0.0.0", port=8443)
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+Caché de respuestas JSON de slices para los endpoints de listado.
+
+Cada slice se serializa una sola vez a bytes (fragmento) y los listados se
+arman concatenando fragmentos. El cuerpo completo de cada listado también se
+guarda: mientras no haya mutaciones se sirve tal cual, sin volver a codificar.
+"""
+
+import json
+import threading
+import zlib
+from datetime import date, datetime
+from enum import Enum
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.slice_manager.query import SliceOrdering, SliceQuery, decode_cursor, encode_cursor, project
+
+
+def _default(obj):
+    # Mismas conversiones que jsonable_encoder para los campos de Slice/VM
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def dumps(data) -> bytes:
+    """JSON compacto en UTF-8, con el mismo formato que JSONResponse de FastAPI"""
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class SliceResponseCache:
+    """
+    Fragmentos JSON por slice y cuerpos de listados ya armados.
+
+    Se registra como listener del SliceManager: una mutación descarta el
+    fragmento del slice afectado y todos los listados armados. Si otro proceso
+    modificó la base (cambia storage.generation) se descarta todo.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self._lock = threading.Lock()
+        self._fragments: Dict[str, bytes] = {}
+        self._listings: Dict[Tuple, bytes] = {}
+        # Resultados ordenados de las consultas paginadas (ver query())
+        self._orderings: Dict[Tuple, SliceOrdering] = {}
+        self._generation = manager.storage.generation
+        # Se incrementa con cada invalidación: un cuerpo armado mientras ocurría
+        # una mutación no se guarda
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        manager.add_listener(self.on_change)
+
+    def on_change(self, evento: str, slice_obj):
+        with self._lock:
+            self._version += 1
+            self._fragments.pop(slice_obj.id, None)
+            self._listings.clear()
+            self._orderings.clear()
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._fragments.clear()
+            self._listings.clear()
+            self._orderings.clear()
+
+    def _check_generation(self):
+        storage = self.manager.storage
+        storage.refresh()
+        if storage.generation != self._generation:
+            self.clear()
+            self._generation = storage.generation
+
+    def etag(self, *parts) -> str:
+        """
+        ETag débil de una respuesta: cambia con cada mutación (manager.seq), con
+        cada recarga por cambios de otro proceso (generation) y con los
+        parámetros de la petición (`parts`).
+        """
+        self._check_generation()
+        digest = zlib.crc32(repr(parts).encode('utf-8'))
+        # Con el registro de cambios compartido la seq ya identifica el estado en
+        # todos los workers; generation es local a cada conexión y no se incluye
+        generation = 0 if self.manager.storage.shared_changes else self._generation
+        return f'W/"{generation}.{self.manager.seq}.{digest:08x}"'
+
+    def fragment(self, slice_obj, store: bool = True) -> bytes:
+        """
+        JSON de un slice, serializado solo la primera vez. Con store=False se usa
+        el fragmento guardado si existe pero no se guarda uno nuevo (exportación).
+        """
+        data = self._fragments.get(slice_obj.id)
+        if data is None and not store:
+            return dumps(slice_obj.to_dict())
+        if data is None:
+            version = self._version
+            data = dumps(slice_obj.to_dict())
+            with self._lock:
+                if version == self._version:
+                    self._fragments[slice_obj.id] = data
+        return data
+
+    def _assemble(self, slices: List) -> bytes:
+        fragments = b",".join(self.fragment(s) for s in slices)
+        return b'{"slices":[' + fragments + b'],"total":' + str(len(slices)).encode() + b"}"
+
+    def listing(self, owner: Optional[str] = None) -> bytes:
+        """Cuerpo de {"slices": [...], "total": N} para todos los slices o los de un owner"""
+        self._check_generation()
+        key = ("owner", owner)
+        body = self._listings.get(key)
+        if body is not None:
+            self.hits += 1
+            return body
+        self.misses += 1
+        version = self._version
+        body = self._assemble(self.manager.get_slices(owner))
+        with self._lock:
+            if version == self._version:
+                self._listings[key] = body
+        return body
+
+    def _ordering(self, query: SliceQuery) -> SliceOrdering:
+        key = query.ordering_key()
+        ordering = self._orderings.get(key)
+        if ordering is None:
+            version = self._version
+            ordering = SliceOrdering(query.candidates(self.manager.storage), query.sort_field)
+            with self._lock:
+                if version == self._version:
+                    self._orderings[key] = ordering
+        return ordering
+
+    def query(self, query: SliceQuery, limit: int, cursor: Optional[str] = None,
+              fields: Optional[List[str]] = None) -> bytes:
+        """
+        Cuerpo de {"slices": [...], "total": N, "next_cursor": ...} para una página.
+        Sin `fields` se reutilizan los fragmentos completos; con `fields` solo se
+        serializan esos campos. ValueError si el cursor no es válido.
+        """
+        self._check_generation()
+        after = decode_cursor(cursor, query)
+        ordering = self._ordering(query)
+        ids, next_after = ordering.page(after, limit, query.descending)
+        slices = [s for s in (self.manager.get_slice(slice_id) for slice_id in ids) if s is not None]
+        if fields is None:
+            items = b",".join(self.fragment(s) for s in slices)
+        else:
+            items = b",".join(dumps(project(s, fields)) for s in slices)
+        return (b'{"slices":[' + items + b'],"total":' + str(len(ordering)).encode()
+                + b',"next_cursor":' + dumps(encode_cursor(next_after, query)) + b"}")
+
+    def export_lines(self, owner: Optional[str] = None, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        NDJSON (un slice por línea) en bloques de ~chunk_size bytes. Los slices
+        se recorren y serializan de a uno, así la memoria no crece con la flota.
+        """
+        buffer, size = [], 0
+        for slice_obj in self.manager.iter_slices(owner):
+            line = self.fragment(slice_obj, store=False) + b"\n"
+            buffer.append(line)
+            size += len(line)
+            if size >= chunk_size:
+                yield b"".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield b"".join(buffer)
+
+    def detail(self, slice_id: str) -> Optional[bytes]:
+        """Cuerpo de {"slice": {...}} o None si el slice no existe"""
+        self._check_generation()
+        slice_obj = self.manager.get_slice(slice_id)
+        if slice_obj is None:
+            return None
+        return b'{"slice":' + self.fragment(slice_obj) + b"}"
@@ -0,0 +1,149 @@
+"""
+Stream de cambios de slices como Server-Sent Events (GET /api/slices/events).
+
+Cada mutación del SliceManager despierta a los clientes conectados, que leen
+lo nuevo del registro de cambios (manager.changes_since) desde su última
+secuencia. El id de cada evento es "<epoch>:<seq>": un cliente que se
+reconecta con Last-Event-ID retoma desde ahí; si esos cambios ya no están
+(otra época, registro desbordado) recibe un evento "reset" y debe volver a
+listar todo. Al conectar se envía "ready" con la seq desde la que siguen
+los eventos. Los eventos "slice" llevan el mismo objeto que un cambio de
+GET /api/slices/changes: {"seq", "id", "op", "slice"}.
+"""
+
+import asyncio
+import os
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Set, Tuple
+
+from ui_apis.cache import dumps
+
+RETRY_MS = 3000
+
+
+def _frame(event: str, data: bytes, event_id: Optional[str] = None) -> bytes:
+    head = b"id: " + event_id.encode() + b"\n" if event_id else b""
+    return head + b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+
+class TooManySubscribers(Exception):
+    """Se alcanzó SLICE_EVENTS_MAX_CLIENTS conexiones abiertas"""
+
+
+class SliceEventBroker:
+    """
+    Pub/sub en proceso sobre las mutaciones del SliceManager. Los listeners
+    del manager se llaman desde el hilo de escrituras, así que solo se marca
+    un asyncio.Event de cada suscriptor (call_soon_threadsafe); el evento en
+    sí se arma a partir del registro de cambios en el threadpool (leerlo y
+    buscar los slices puede consultar SQLite), no en el loop.
+    """
+
+    def __init__(self, manager, cache, heartbeat: float = None, max_clients: int = None):
+        self.manager = manager
+        self.cache = cache
+        self.heartbeat = heartbeat or float(os.getenv('SLICE_EVENTS_HEARTBEAT', '15'))
+        self.max_clients = max_clients or int(os.getenv('SLICE_EVENTS_MAX_CLIENTS', '100'))
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._lock = threading.Lock()
+        manager.add_listener(self._on_change)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._waiters)
+
+    def subscribe(self) -> Tuple[asyncio.AbstractEventLoop, asyncio.Event]:
+        """
+        Registra un suscriptor para stream(); TooManySubscribers si ya hay
+        SLICE_EVENTS_MAX_CLIENTS. El tope se controla y el suscriptor se agrega
+        bajo el mismo lock, así dos conexiones simultáneas no lo pasan.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            if len(self._waiters) >= self.max_clients:
+                raise TooManySubscribers("Demasiados clientes conectados")
+            self._waiters.add(waiter)
+        return waiter
+
+    def unsubscribe(self, waiter):
+        with self._lock:
+            self._waiters.discard(waiter)
+
+    def _on_change(self, evento, slice_obj):
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, wakeup in waiters:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                pass  # loop ya cerrado
+
+    def _event_id(self, seq: int) -> str:
+        return f"{self.manager.epoch}:{seq}"
+
+    def parse_last_event_id(self, value: Optional[str]) -> Optional[int]:
+        """Secuencia de un Last-Event-ID de esta época; None si no sirve para retomar"""
+        epoch, _, seq = (value or '').partition(':')
+        if epoch != self.manager.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _reset(self, seq: int) -> bytes:
+        return _frame("reset", dumps({"epoch": self.manager.epoch, "seq": seq}), self._event_id(seq))
+
+    def _changes(self, changes, owner: Optional[str]) -> Iterator[bytes]:
+        for change_seq, evento, slice_id, change_owner in changes:
+            if owner and change_owner != owner:
+                continue
+            slice_obj = self.manager.get_slice(slice_id) if evento != "delete" else None
+            body = b'{"seq":' + str(change_seq).encode() + b',"id":' + dumps(slice_id)
+            if slice_obj is None:
+                body += b',"op":"delete"}'
+            else:
+                op = b'"create"' if evento == "create" else b'"update"'
+                body += b',"op":' + op + b',"slice":' + self.cache.fragment(slice_obj) + b'}'
+            yield _frame("slice", body, self._event_id(change_seq))
+
+    def _poll(self, since: int, owner: Optional[str]) -> Tuple[int, List[bytes]]:
+        """(seq, frames) de lo nuevo desde since; bloquea (registro de cambios, get_slice)"""
+        seq, changes = self.manager.changes_since(since)
+        if changes is None:
+            return seq, [self._reset(seq)]
+        return seq, list(self._changes(changes, owner))
+
+    async def stream(self, waiter, owner: Optional[str], last_event_id: Optional[str],
+                     is_disconnected: Callable[[], Awaitable[bool]]) -> AsyncIterator[bytes]:
+        """Eventos para el suscriptor `waiter` (de subscribe()); termina cuando se desconecta"""
+        wakeup = waiter[1]
+        try:
+            yield b"retry: " + str(RETRY_MS).encode() + b"\n\n"
+            since = self.parse_last_event_id(last_event_id)
+            if since is None:
+                # Con la base compartida leer la seq es una consulta SQLite: fuera del loop
+                current = await asyncio.to_thread(lambda: self.manager.seq)
+            if since is None and last_event_id:
+                # No se puede retomar desde ese id: el cliente vuelve a listar
+                since = current
+                yield self._reset(since)
+            else:
+                # "ready" dice desde qué seq siguen los eventos (la actual, o la del Last-Event-ID)
+                if since is None:
+                    since = current
+                yield _frame("ready", dumps({"epoch": self.manager.epoch, "seq": since}),
+                             self._event_id(since))
+            while True:
+                wakeup.clear()
+                since, frames = await asyncio.to_thread(self._poll, since, owner)
+                for frame in frames:
+                    yield frame
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        return
+                    yield b": keepalive\n\n"
+        finally:
+            self.unsubscribe(waiter)
+
+    def stats(self) -> dict:
+        return {"subscribers": self.subscribers}
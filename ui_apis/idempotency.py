@@ -0,0 +1,242 @@
+"""
+Claves de idempotencia (cabecera Idempotency-Key) para las operaciones que
+no se deben repetir: crear, pausar, reanudar y eliminar slices.
+
+El cliente genera una clave por operación lógica y la reenvía en cada
+reintento. La primera petición con esa clave se ejecuta y su respuesta se
+guarda; un reintento devuelve la respuesta guardada sin volver a ejecutar
+nada, y si llega mientras la original sigue en curso espera a que termine.
+Con varios workers se usa SQLiteIdempotencyStore, en la base compartida.
+Solo se guardan respuestas completas: si la operación lanza una excepción
+(error 5xx, 404, etc.) la clave se libera y el reintento la ejecuta de nuevo.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(Exception):
+    """La clave ya se usó con otro cuerpo de petición"""
+
+
+class StoredResponse:
+    """Respuesta guardada: lo necesario para volver a enviarla tal cual"""
+
+    __slots__ = ('status_code', 'body', 'media_type', 'headers')
+
+    def __init__(self, status_code: int, body: bytes, media_type: Optional[str], headers: Dict[str, str]):
+        self.status_code = status_code
+        self.body = body
+        self.media_type = media_type
+        self.headers = headers
+
+
+class _Entry:
+    __slots__ = ('fingerprint', 'expires', 'future')
+
+    def __init__(self, fingerprint: str, expires: float, future: asyncio.Future):
+        self.fingerprint = fingerprint
+        self.expires = expires
+        self.future = future  # StoredResponse, o None si la operación falló
+
+
+def fingerprint(payload) -> str:
+    """Huella del cuerpo de la petición (JSON canónico)"""
+    data = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Clave -> respuesta, en memoria. Cada entrada vence a los IDEMPOTENCY_TTL
+    segundos (86400 por defecto) y se guardan a lo sumo IDEMPOTENCY_MAX
+    (10000); al pasarse se descartan las más antiguas. Las claves van por
+    ámbito (usuario y ruta) para que dos usuarios no compartan respuestas.
+    """
+
+    def __init__(self, ttl: float = None, max_entries: int = None):
+        self.ttl = ttl or float(os.getenv('IDEMPOTENCY_TTL', '86400'))
+        self.max_entries = max_entries or int(os.getenv('IDEMPOTENCY_MAX', '10000'))
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, now: float):
+        # Orden de inserción = orden de vencimiento (el TTL es fijo)
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            vigente = entry.expires > now
+            # Una operación en curso no se descarta por espacio hasta que termine
+            if vigente and (len(self._entries) <= self.max_entries or not entry.future.done()):
+                break
+            self._entries.popitem(last=False)
+
+    def completed(self, scope: str, key: str) -> bool:
+        """La clave tiene una respuesta guardada vigente (un reintento solo la reenvía)"""
+        entry = self._entries.get((scope, key))
+        return (entry is not None and entry.expires > time.monotonic()
+                and entry.future.done() and entry.future.result() is not None)
+
+    async def run(self, scope: str, key: str, huella: str,
+                  fn: Callable[[], Awaitable[StoredResponse]]) -> Tuple[StoredResponse, bool]:
+        """
+        Ejecuta fn() una sola vez por (scope, key). Devuelve (respuesta, repetida);
+        IdempotencyConflict si la clave ya se usó con otra huella.
+        """
+        clave = (scope, key)
+        while True:
+            now = time.monotonic()
+            self._evict(now)
+            entry = self._entries.get(clave)
+            if entry is None or entry.expires <= now:
+                break
+            if entry.fingerprint != huella:
+                raise IdempotencyConflict("La Idempotency-Key ya se usó con otra petición")
+            stored = await asyncio.shield(entry.future)
+            if stored is not None:
+                self.hits += 1
+                return stored, True
+            # La original falló y liberó la clave: este reintento la ejecuta
+
+        entry = _Entry(huella, now + self.ttl, asyncio.get_running_loop().create_future())
+        self._entries.pop(clave, None)  # vencida: la nueva va al final del orden
+        self._entries[clave] = entry
+        self._evict(now)
+        try:
+            stored = await fn()
+        except BaseException:
+            if self._entries.get(clave) is entry:
+                del self._entries[clave]
+            entry.future.set_result(None)
+            raise
+        entry.future.set_result(stored)
+        return stored, False
+
+    def stats(self) -> dict:
+        return {"keys": len(self._entries), "replays": self.hits}
+
+
+class SQLiteIdempotencyStore:
+    """
+    Misma interfaz que IdempotencyStore pero en una tabla de la base SQLite,
+    para que las claves valgan entre todos los workers de la API. Una petición
+    que encuentra la clave en curso (en este u otro worker) consulta la tabla
+    cada `poll` segundos hasta que la original termina. Una clave en curso por
+    más de IDEMPOTENCY_PENDING_TIMEOUT segundos (300) se da por abandonada
+    (el worker que la tenía se cayó) y el reintento la ejecuta.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS idempotencia (
+        scope      TEXT NOT NULL,
+        clave      TEXT NOT NULL,
+        huella     TEXT NOT NULL,
+        iniciada   REAL NOT NULL,
+        expira     REAL NOT NULL,
+        estado     TEXT NOT NULL,  -- pendiente | hecha
+        status     INTEGER,
+        body       BLOB,
+        media_type TEXT,
+        headers    TEXT,
+        PRIMARY KEY (scope, clave)
+    );
+    CREATE INDEX IF NOT EXISTS idx_idempotencia_expira ON idempotencia(expira);
+    """
+
+    def __init__(self, path: str, ttl: float = None, max_entries: int = None, poll: float = 0.1):
+        self.ttl = ttl or float(os.getenv('IDEMPOTENCY_TTL', '86400'))
+        self.max_entries = max_entries or int(os.getenv('IDEMPOTENCY_MAX', '10000'))
+        self.pending_timeout = float(os.getenv('IDEMPOTENCY_PENDING_TIMEOUT', '300'))
+        self.poll = poll
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                    timeout=float(os.getenv('SLICE_SQLITE_TIMEOUT', '30')))
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(self.SCHEMA)
+        self.hits = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM idempotencia").fetchone()[0]
+
+    def completed(self, scope: str, key: str) -> bool:
+        """La clave tiene una respuesta guardada vigente (un reintento solo la reenvía)"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM idempotencia WHERE scope = ? AND clave = ? AND estado = 'hecha' AND expira > ?",
+                (scope, key, time.time())).fetchone()
+        return row is not None
+
+    def _claim(self, scope: str, key: str, huella: str):
+        """(True, None) si esta petición toma la clave, o (False, fila) si ya existe"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM idempotencia WHERE expira <= ? OR (estado = 'pendiente' AND iniciada <= ?)",
+                                  (now, now - self.pending_timeout))
+                row = self.conn.execute(
+                    "SELECT huella, estado, status, body, media_type, headers FROM idempotencia "
+                    "WHERE scope = ? AND clave = ?", (scope, key)).fetchone()
+                if row is None:
+                    self.conn.execute(
+                        "INSERT INTO idempotencia (scope, clave, huella, iniciada, expira, estado) "
+                        "VALUES (?, ?, ?, ?, ?, 'pendiente')", (scope, key, huella, now, now + self.ttl))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return row is None, row
+
+    def _execute(self, sql: str, params: tuple):
+        with self._lock:
+            self.conn.execute(sql, params)
+
+    async def run(self, scope: str, key: str, huella: str,
+                  fn: Callable[[], Awaitable[StoredResponse]]) -> Tuple[StoredResponse, bool]:
+        # Las consultas bloquean (lock de escritura de SQLite, fsync): van al
+        # threadpool para no frenar el event loop
+        while True:
+            claimed, row = await asyncio.to_thread(self._claim, scope, key, huella)
+            if claimed:
+                break
+            if row[0] != huella:
+                raise IdempotencyConflict("La Idempotency-Key ya se usó con otra petición")
+            if row[1] == 'hecha':
+                self.hits += 1
+                return StoredResponse(row[2], row[3], row[4], json.loads(row[5] or '{}')), True
+            await asyncio.sleep(self.poll)  # la original sigue en curso
+
+        try:
+            stored = await fn()
+        except BaseException:
+            # Si la petición se cancela el DELETE igual se completa en su hilo
+            await asyncio.shield(asyncio.to_thread(
+                self._execute, "DELETE FROM idempotencia WHERE scope = ? AND clave = ?", (scope, key)))
+            raise
+        await asyncio.to_thread(self._finish, scope, key, stored)
+        return stored, False
+
+    def _finish(self, scope: str, key: str, stored: StoredResponse):
+        self._execute(
+            "UPDATE idempotencia SET estado = 'hecha', status = ?, body = ?, media_type = ?, headers = ? "
+            "WHERE scope = ? AND clave = ?",
+            (stored.status_code, stored.body, stored.media_type, json.dumps(stored.headers), scope, key))
+        # Las más próximas a vencer se descartan primero si hay demasiadas
+        self._execute(
+            "DELETE FROM idempotencia WHERE rowid IN (SELECT rowid FROM idempotencia ORDER BY expira "
+            "LIMIT MAX(0, (SELECT COUNT(*) FROM idempotencia) - ?))", (self.max_entries,))
+
+    def stats(self) -> dict:
+        return {"keys": len(self), "replays": self.hits}
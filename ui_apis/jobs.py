@@ -0,0 +1,207 @@
+"""
+Trabajos en segundo plano para la creación de slices.
+
+Con la cabecera "Prefer: respond-async" la API encola la creación, responde
+202 con el id del trabajo y el cliente consulta GET /api/jobs/{id} (opcionalmente
+esperando con ?wait=N) en lugar de mantener la conexión abierta hasta que termine.
+Con varios workers el estado de cada trabajo se guarda además en la base
+SQLite (JobTable), así cualquier worker puede responder por él.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+
+class JobQueueFull(Exception):
+    """Hay demasiados trabajos pendientes; reintentar más tarde"""
+
+
+class Job:
+    """Estado de un trabajo: queued -> running -> done | failed"""
+
+    __slots__ = ('id', 'kind', 'status', 'created_at', 'started_at', 'finished_at',
+                 'result', 'error', 'future')
+
+    def __init__(self, kind: str):
+        self.id = f"job_{uuid.uuid4().hex[:12]}"
+        self.kind = kind
+        self.status = "queued"
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.future: Optional[Future] = None
+
+    @classmethod
+    def from_row(cls, row) -> 'Job':
+        job = cls.__new__(cls)
+        job.id, job.kind, job.status = row[0], row[1], row[2]
+        job.created_at, job.started_at, job.finished_at = (
+            datetime.fromisoformat(value) if value else None for value in row[3:6])
+        job.result = json.loads(row[6]) if row[6] else None
+        job.error = row[7]
+        job.future = None  # lo ejecuta otro worker
+        return job
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> dict:
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+        if self.status == "done":
+            data["result"] = self.result
+        if self.status == "failed":
+            data["error"] = self.error
+        return data
+
+
+class JobTable:
+    """Estado de los trabajos en la base SQLite compartida por los workers"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS trabajos (
+        id          TEXT PRIMARY KEY,
+        kind        TEXT NOT NULL,
+        status      TEXT NOT NULL,
+        created_at  TEXT NOT NULL,
+        started_at  TEXT,
+        finished_at TEXT,
+        result      TEXT,
+        error       TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_trabajos_fin ON trabajos(finished_at);
+    """
+
+    def __init__(self, path: str, history: int):
+        self.history = history
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                    timeout=float(os.getenv('SLICE_SQLITE_TIMEOUT', '30')))
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def save(self, job: Job):
+        iso = [value.isoformat() if value else None for value in (job.created_at, job.started_at, job.finished_at)]
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO trabajos (id, kind, status, created_at, started_at, finished_at, result, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.kind, job.status, *iso,
+                 json.dumps(job.result) if job.result is not None else None, job.error))
+            if job.finished:
+                self.conn.execute(
+                    "DELETE FROM trabajos WHERE id IN (SELECT id FROM trabajos WHERE finished_at IS NOT NULL "
+                    "ORDER BY finished_at DESC LIMIT -1 OFFSET ?)", (self.history,))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id, kind, status, created_at, started_at, finished_at, result, error "
+                "FROM trabajos WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+
+class JobManager:
+    """
+    Pool acotado de hilos (SLICE_JOB_WORKERS, 4 por defecto) con una cola de a
+    lo sumo SLICE_JOB_QUEUE trabajos pendientes (100). Se conservan los
+    últimos SLICE_JOB_HISTORY trabajos terminados (1000) para consultarlos.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None, history: int = None,
+                 store_path: str = None):
+        self.workers = workers or int(os.getenv('SLICE_JOB_WORKERS', '4'))
+        self.max_pending = max_pending or int(os.getenv('SLICE_JOB_QUEUE', '100'))
+        self.history = history or int(os.getenv('SLICE_JOB_HISTORY', '1000'))
+        # Con store_path (base SQLite compartida) los demás workers también ven los trabajos
+        self.table = JobTable(store_path, self.history) if store_path else None
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="slice-jobs")
+        self._jobs: Dict[str, Job] = {}
+        self._finished = deque()  # ids en orden de finalización, para podar
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[[], dict]) -> Job:
+        """Encola fn() (debe devolver un dict serializable); JobQueueFull si no hay lugar"""
+        job = Job(kind)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"Hay {self._pending} trabajos pendientes")
+            # Se registra ya con su future: GET /api/jobs/{id} puede esperarlo enseguida
+            if self.table is not None:
+                self.table.save(job)
+            job.future = self._executor.submit(self._run, job, fn)
+            self._pending += 1
+            self._jobs[job.id] = job
+        return job
+
+    def _save(self, job: Job):
+        if self.table is not None:
+            try:
+                self.table.save(job)
+            except sqlite3.Error as e:
+                print(f"[ERROR] No se pudo guardar el estado del trabajo {job.id}: {e}")
+
+    def _run(self, job: Job, fn: Callable[[], dict]):
+        job.status = "running"
+        job.started_at = datetime.now()
+        self._save(job)
+        try:
+            job.result = fn()
+            job.status = "done"
+        except Exception as e:
+            print(f"[ERROR] Trabajo {job.id} ({job.kind}) falló: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = datetime.now()
+            self._save(job)
+            with self._lock:
+                self._pending -= 1
+                self._finished.append(job.id)
+                while len(self._finished) > self.history:
+                    self._jobs.pop(self._finished.popleft(), None)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None and self.table is not None:
+            job = self.table.get(job_id)
+        return job
+
+    async def wait(self, job: Job, timeout: float, poll: float = 0.25) -> Job:
+        """Espera hasta `timeout` segundos a que el trabajo termine (no lo cancela si se vence)"""
+        if job.future is not None:
+            await asyncio.wait({asyncio.wrap_future(job.future)}, timeout=timeout)
+            return job
+        # Lo ejecuta otro worker: consultar la tabla
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not job.finished and loop.time() < deadline:
+            await asyncio.sleep(min(poll, max(0, deadline - loop.time())))
+            job = self.table.get(job.id) or job
+        return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": self._pending, "workers": self.workers, "tracked": len(self._jobs)}
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
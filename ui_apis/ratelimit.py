@@ -0,0 +1,303 @@
+"""
+Control de admisión de la API: token bucket por usuario y límite de
+creaciones en curso.
+
+Cada usuario tiene dos presupuestos: uno para lecturas (baratas, salen de
+memoria) y otro para mutaciones (escriben a disco y una creación dispara el
+despliegue). Además hay un tope global de creaciones en curso. Lo que
+excede cualquiera de los tres se rechaza con 429 y Retry-After.
+
+Con varios workers el presupuesto de mutaciones y el contador de creaciones
+viven en la base SQLite compartida (SQLiteRateLimiter, SQLiteConcurrencyLimit)
+y valen para todo el servicio. Las lecturas no: abrir una transacción de
+escritura por cada GET haría que todos los workers se turnen el lock de
+SQLite. Cada worker lleva sus buckets de lectura en memoria con su parte del
+presupuesto (rate/workers); un cliente cuyas conexiones caen en varios workers
+puede llegar a sumar más ráfaga que RATE_READ_BURST, hasta el total configurado.
+Las comprobaciones contra SQLite bloquean: llamarlas fuera del loop.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimited(Exception):
+    """Petición rechazada; reintentar después de `retry_after` segundos"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """`rate` fichas por segundo, acumulables hasta `burst`"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1) -> float:
+        """Consume `cost` fichas; devuelve 0 si se pudo o los segundos a esperar si no"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Un TokenBucket por clave (usuario). Se guardan a lo sumo `max_keys`
+    buckets; el menos usado se descarta, que equivale a un bucket lleno.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, max_keys: int = 10000):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.rejected_by_key: "OrderedDict[str, int]" = OrderedDict()
+
+    def check(self, key: str):
+        """Descuenta una petición de `key`; RateLimited si no le quedan fichas"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.take(now)
+            if not wait:
+                self.allowed += 1
+                return
+            self.rejected += 1
+            self.rejected_by_key[key] = self.rejected_by_key.pop(key, 0) + 1
+            if len(self.rejected_by_key) > self.max_keys:
+                self.rejected_by_key.popitem(last=False)
+        raise RateLimited(f"Demasiadas peticiones ({self.name}): máximo {self.rate:g}/s", wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            top = sorted(self.rejected_by_key.items(), key=lambda item: -item[1])[:5]
+            return {"rate": self.rate, "burst": self.burst, "allowed": self.allowed,
+                    "rejected": self.rejected, "users": len(self._buckets), "top_rejected": dict(top)}
+
+
+class ConcurrencyLimit:
+    """Tope de operaciones simultáneas; acquire no espera"""
+
+    def __init__(self, name: str, limit: int, retry_after: float = 2):
+        self.name = name
+        self.limit = limit
+        self.retry_after = retry_after
+        self.inflight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Toma un lugar; RateLimited si ya hay `limit` en curso"""
+        with self._lock:
+            if self.inflight >= self.limit:
+                self.rejected += 1
+                raise RateLimited(f"Hay {self.inflight} {self.name} en curso (máximo {self.limit})",
+                                  self.retry_after)
+            self.inflight += 1
+
+    def release(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def stats(self) -> dict:
+        return {"inflight": self.inflight, "limit": self.limit, "rejected": self.rejected}
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                           timeout=float(os.getenv('SLICE_SQLITE_TIMEOUT', '30')))
+    conn.execute("PRAGMA journal_mode = WAL")
+    # Estado efímero: perder los últimos cambios en un corte no importa, no pagar fsync
+    conn.execute("PRAGMA synchronous = OFF")
+    return conn
+
+
+class SQLiteRateLimiter(RateLimiter):
+    """
+    Misma interfaz que RateLimiter, con los buckets en la tabla `limites` de
+    la base compartida: un usuario tiene un solo presupuesto aunque sus
+    peticiones caigan en distintos workers. Un bucket que pasa burst/rate
+    segundos sin uso ya está lleno y se borra (equivale a no tenerlo).
+    Los contadores de stats() son los de este worker.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS limites (
+        nombre      TEXT NOT NULL,
+        clave       TEXT NOT NULL,
+        fichas      REAL NOT NULL,
+        actualizado REAL NOT NULL,
+        PRIMARY KEY (nombre, clave)
+    );
+    """
+    PRUNE_EVERY = 1000
+
+    def __init__(self, name: str, path: str, rate: float, burst: float, max_keys: int = 10000):
+        super().__init__(name, rate, burst, max_keys)
+        self.conn = _connect(path)
+        self.conn.executescript(self.SCHEMA)
+        self._checks = 0
+
+    def check(self, key: str):
+        now = time.time()
+        with self._lock:
+            self._checks += 1
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._checks % self.PRUNE_EVERY == 0:
+                    self.conn.execute("DELETE FROM limites WHERE nombre = ? AND actualizado < ?",
+                                      (self.name, now - self.burst / self.rate))
+                row = self.conn.execute("SELECT fichas, actualizado FROM limites WHERE nombre = ? AND clave = ?",
+                                        (self.name, key)).fetchone()
+                bucket = TokenBucket(self.rate, self.burst, now)
+                if row is not None:
+                    bucket.tokens, bucket.updated = row[0], min(row[1], now)
+                wait = bucket.take(now)
+                self.conn.execute("INSERT OR REPLACE INTO limites (nombre, clave, fichas, actualizado) "
+                                  "VALUES (?, ?, ?, ?)", (self.name, key, bucket.tokens, bucket.updated))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            if not wait:
+                self.allowed += 1
+                return
+            self.rejected += 1
+            self.rejected_by_key[key] = self.rejected_by_key.pop(key, 0) + 1
+            if len(self.rejected_by_key) > self.max_keys:
+                self.rejected_by_key.popitem(last=False)
+        raise RateLimited(f"Demasiadas peticiones ({self.name}): máximo {self.rate:g}/s", wait)
+
+    def stats(self) -> dict:
+        data = super().stats()
+        with self._lock:
+            data["users"] = self.conn.execute("SELECT COUNT(*) FROM limites WHERE nombre = ?",
+                                              (self.name,)).fetchone()[0]
+        return data
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SQLiteConcurrencyLimit(ConcurrencyLimit):
+    """
+    ConcurrencyLimit para todos los workers: cada uno anota cuántas operaciones
+    tiene en curso en la tabla `en_curso` y el tope se compara con la suma.
+    Las filas de un worker que se cayó (pid inexistente) no cuentan y se borran.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS en_curso (
+        nombre   TEXT NOT NULL,
+        pid      INTEGER NOT NULL,
+        cantidad INTEGER NOT NULL,
+        PRIMARY KEY (nombre, pid)
+    );
+    """
+
+    def __init__(self, name: str, path: str, limit: int, retry_after: float = 2):
+        super().__init__(name, limit, retry_after)
+        self.conn = _connect(path)
+        self.conn.executescript(self.SCHEMA)
+        self.pid = os.getpid()
+        # Un pid reutilizado no hereda lo que dejó anotado otro proceso
+        self.conn.execute("DELETE FROM en_curso WHERE nombre = ? AND pid = ?", (self.name, self.pid))
+
+    def _total(self) -> int:
+        rows = self.conn.execute("SELECT pid, cantidad FROM en_curso WHERE nombre = ?", (self.name,)).fetchall()
+        total = 0
+        for pid, cantidad in rows:
+            if pid == self.pid or _alive(pid):
+                total += cantidad
+            else:
+                self.conn.execute("DELETE FROM en_curso WHERE nombre = ? AND pid = ?", (self.name, pid))
+        return total
+
+    def _add(self, delta: int):
+        self.conn.execute("INSERT INTO en_curso (nombre, pid, cantidad) VALUES (?, ?, ?) "
+                          "ON CONFLICT (nombre, pid) DO UPDATE SET cantidad = cantidad + excluded.cantidad",
+                          (self.name, self.pid, delta))
+
+    def acquire(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                total = self._total()
+                if total < self.limit:
+                    self._add(1)
+                    self.inflight += 1
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            if total >= self.limit:
+                self.rejected += 1
+                raise RateLimited(f"Hay {total} {self.name} en curso (máximo {self.limit})", self.retry_after)
+
+    def release(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._add(-1)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.inflight -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._total()
+        return {"inflight": total, "local": self.inflight, "limit": self.limit, "rejected": self.rejected}
+
+
+def from_env(store_path: str = None, workers: int = 1) -> tuple:
+    """
+    (lecturas, mutaciones, creaciones) con los límites de las variables de
+    entorno. Con store_path (base SQLite compartida por los workers) las
+    mutaciones y creaciones se cuentan en la base; las lecturas siempre en
+    memoria, repartidas entre los `workers`.
+    """
+    read_rate, read_burst = float(os.getenv('RATE_READ_PER_S', '20')), float(os.getenv('RATE_READ_BURST', '40'))
+    write_rate, write_burst = float(os.getenv('RATE_WRITE_PER_S', '1')), float(os.getenv('RATE_WRITE_BURST', '5'))
+    max_creations = int(os.getenv('MAX_INFLIGHT_CREATIONS', '8'))
+    reads = RateLimiter("lecturas", read_rate / workers, max(1.0, read_burst / workers))
+    if store_path:
+        return (reads, SQLiteRateLimiter("mutaciones", store_path, write_rate, write_burst),
+                SQLiteConcurrencyLimit("creaciones", store_path, max_creations))
+    return reads, RateLimiter("mutaciones", write_rate, write_burst), ConcurrencyLimit("creaciones", max_creations)
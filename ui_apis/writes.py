@@ -0,0 +1,68 @@
+"""
+Ejecución de las escrituras de slices fuera del event loop de FastAPI.
+
+Las mutaciones del SliceManager escriben a disco (snapshot, journal, ipam.json,
+vlans.json) de forma síncrona; si se llaman desde un endpoint async bloquean
+todas las peticiones en curso. Aquí se ejecutan en un único hilo dedicado:
+el loop solo espera el resultado y mientras tanto sigue atendiendo las
+lecturas, que salen del índice en memoria.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+
+class WriteExecutor:
+    """
+    Cola de escrituras atendida por un solo hilo: las mutaciones se aplican
+    en el orden en que llegan y nunca compiten entre sí por el lock de la base.
+    """
+
+    def __init__(self, name: str = "slice-writes"):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Escrituras encoladas o en ejecución"""
+        return self._pending
+
+    def _call(self, fn, *args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Ejecuta fn(*args, **kwargs) en el hilo de escrituras y espera su resultado"""
+        with self._lock:
+            self._pending += 1
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._executor, partial(self._call, fn, *args, **kwargs))
+        except RuntimeError:
+            # El executor ya se cerró (apagando el servicio)
+            with self._lock:
+                self._pending -= 1
+            raise
+        return await future
+
+    def call(self, fn, *args, **kwargs):
+        """Versión bloqueante de run() para hilos fuera del loop (p. ej. los trabajos en segundo plano)"""
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(self._call, fn, *args, **kwargs)
+        except RuntimeError:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return future.result()
+
+    def shutdown(self, wait: bool = True):
+        """Espera las escrituras encoladas y detiene el hilo"""
+        self._executor.shutdown(wait=wait)